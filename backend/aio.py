@@ -0,0 +1,123 @@
+from a2wsgi import WSGIMiddleware
+from flask import request
+from flask_cors.core import get_cors_options, set_cors_headers, FLASK_CORS_EVALUATED
+from werkzeug.exceptions import HTTPException
+from models import mongo, amongo
+from workers import worker_state
+from live import stock_events
+from logs import get_logger
+import asyncio
+import io
+import sys
+
+log = get_logger("aio")
+
+# Flask endpoint -> (async view, cross_origin options). Filled in by the blueprints' async ports.
+ASYNC_VIEWS = {}
+
+
+# Register an async port of a blueprint's GET view. It runs under a Flask request context, so it
+# shares the sync view's helpers (args parsing, url_for, jsonify, cache, sessions) and responses.
+def async_view(blueprint, endpoint, **cors):
+    def decorator(view):
+        ASYNC_VIEWS[f"{blueprint.name}.{endpoint}"] = (view, cors)
+        return view
+    return decorator
+
+
+# WSGI environ for an ASGI HTTP scope (the async views read no request body)
+def build_environ(scope):
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin-1").upper().replace("-", "_"), value.decode("latin-1")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+# ASGI entry point for the asyncio serving mode. GET requests for an endpoint with an async port
+# run on the event loop against the async Mongo client, so one worker keeps many slow reads in
+# flight; every other request goes to the unchanged Flask app on a small thread pool.
+class AsyncApp:
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WSGIMiddleware(app, workers=app.config["ASYNC_FALLBACK_THREADS"])
+        # /api/products/stream has no async port: its streams hold fallback threads
+        stock_events.limit_threads(app.config["ASYNC_FALLBACK_THREADS"])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] == "http" and scope["method"] == "GET":
+            environ = build_environ(scope)
+            try:
+                endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+            except HTTPException:
+                endpoint = None
+            if endpoint in ASYNC_VIEWS:
+                return await self.dispatch(environ, *ASYNC_VIEWS[endpoint], send)
+        return await self.wsgi(scope, receive, send)
+
+    # Flask's full_dispatch_request with the view awaited: before/after_request hooks
+    # (metrics, CORS) and error handlers run exactly as they do for the sync app
+    async def dispatch(self, environ, view, cors, send):
+        app = self.app
+        ctx = app.request_context(environ)
+        ctx.push()
+        error = None
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view(**request.view_args)
+                response = app.make_response(rv)
+                set_cors_headers(response, get_cors_options(app, cors))
+                setattr(response, FLASK_CORS_EVALUATED, True)
+            except Exception as e:
+                response = app.handle_user_exception(e)
+            response = app.finalize_request(response)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        try:
+            body = response.get_data()
+            headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()]
+            status = response.status_code
+            response.close()
+        finally:
+            ctx.pop(error)
+
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # The readiness probe reports on this worker's sync client; the async client
+                # connects on first use from the serving loop
+                await asyncio.to_thread(worker_state.warm_up, mongo)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await amongo.close()
+                mongo.reset()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -1,5 +1,4 @@
-
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from routes.auth import auth_bp
 from routes.farmer import farmer_bp
@@ -7,60 +6,256 @@ from routes.products import products_bp
 from routes.orders import orders_bp
 from routes.buyer import buyer_bp
 from routes.analytics import analytics_bp  # <-- ADD THIS LINE
-from models import init_app, mongo
+from routes.market import market_bp
+from models import init_app, mongo, amongo
+import cache
+import json_provider
+import live
+import market
+import metrics
+import outbox
+import parallel
+import passwords
+import profiles
 from config import Config
+from logs import configure_logging, get_logger
+from images import migrate_inline_images
+from indexes import ensure_indexes, verify_query_plans, missing_indexes
+from rollups import rebuild_rollups, check_rollups
+from inventory import rebuild_inventory, check_inventory
+from search import backfill_name_prefixes
+from workers import worker_state
+from collections.abc import Mapping
+import click
+import os
+import sys
 import datetime
 
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Enable CORS
-CORS(app)
-
-# Initialize Mongo
-init_app(app)
-app.mongo = mongo
-
-# Register Blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(farmer_bp)
-app.register_blueprint(products_bp)
-app.register_blueprint(orders_bp)
-app.register_blueprint(buyer_bp)
-app.register_blueprint(analytics_bp)  # <-- ADD THIS LINE
-
-# ✅ HEALTH CHECK ROUTE
-@app.route('/api/health')
-def health_check():
-    return jsonify({
-        "status": "healthy", 
-        "message": "Farm2Home Backend is running",
-        "timestamp": datetime.datetime.utcnow().isoformat(),
-        "service": "Farm2Home API"
-    })
-
-# ✅ Root endpoint
-@app.route('/')
-def home():
-    return jsonify({
-        "message": "Farm2Home API Server",
-        "version": "1.0",
-        "endpoints": {
-            "health": "/api/health",
-            "products": "/api/products",
-            "orders": "/api/orders",
-            "auth": "/api/auth",
-            "buyer": "/api/buyer",
-            "analytics": "/api/analytics"  # <-- ADD THIS ENDPOINT TOO
-        }
-    })
+log = get_logger("app")
+
+# Signs session tokens in debug and testing runs only; anyone could forge tokens signed with it
+DEV_SECRET_KEY = "dev-secret-change-me"
+
+
+# Build an app from a config class/object, or from a mapping of overrides on top of Config.
+# Nothing here opens a Mongo connection that a forked worker could inherit: clients are created
+# lazily per process (see models.Mongo), so the app can be built once in a prefork master.
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, Mapping):
+        app.config.update(config)
+    elif config is not Config:
+        app.config.from_object(config)
+    configure_logging(app)
+    check_secret_key(app)
+    json_provider.init_app(app)
+
+    # Enable CORS
+    CORS(app)
+
+    # Initialize Mongo
+    init_app(app)
+    app.mongo = mongo
+    metrics.init_app(app, mongo, amongo)
+    cache.init_app(app)
+    passwords.init_app(app)
+    market.init_app(app)
+    live.init_app(app)
+    outbox.init_app(app)
+    parallel.init_app(app)
+    profiles.init_app(app)
+
+    # Bootstrap indexes (idempotent); diagnostic mode refuses to start on any COLLSCAN
+    if app.config["CREATE_INDEXES_ON_STARTUP"]:
+        with app.app_context():
+            try:
+                ensure_indexes(mongo.db)
+            except Exception as e:
+                log.error("Index bootstrap failed", extra={"error": str(e)})
+            if app.config["VERIFY_QUERY_PLANS"]:
+                verify_query_plans(mongo.db)
+
+    # Register Blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(farmer_bp)
+    app.register_blueprint(products_bp)
+    app.register_blueprint(orders_bp)
+    app.register_blueprint(buyer_bp)
+    app.register_blueprint(analytics_bp)  # <-- ADD THIS LINE
+    app.register_blueprint(market_bp)
+
+    register_commands(app)
+    register_core_routes(app)
+    return app
+
+
+# Refuse to serve (and sign session tokens) with no SECRET_KEY, or the public development one,
+# outside debug/testing
+def check_secret_key(app):
+    if app.config["SECRET_KEY"] and app.config["SECRET_KEY"] != DEV_SECRET_KEY:
+        return
+    if not (app.debug or app.testing):
+        raise RuntimeError("SECRET_KEY is not set: export a long random SECRET_KEY before starting the server "
+                           "(only FLASK_DEBUG=1 or TESTING runs may use the development key)")
+    log.warning("SECRET_KEY is not set; signing session tokens with the development key")
+    app.config["SECRET_KEY"] = DEV_SECRET_KEY
+
+
+def register_commands(app):
+    # ✅ CLI: move legacy inline product images into the image store
+    @app.cli.command("migrate-images")
+    def migrate_images_command():
+        moved, failed = migrate_inline_images(mongo.db.products)
+        print(f"🖼️ Moved {moved} product images to the image store ({failed} skipped)")
+
+    # ✅ CLI: add search prefixes to products stored before /api/products/search existed
+    @app.cli.command("backfill-search")
+    def backfill_search_command():
+        updated = backfill_name_prefixes(mongo.db.products)
+        print(f"🔎 Added search prefixes to {updated} products")
+
+    # ✅ CLI: create indexes and explain() every route query
+    @app.cli.command("check-indexes")
+    def check_indexes_command():
+        ensure_indexes(mongo.db)
+        missing = missing_indexes(mongo.db)
+        if missing:
+            raise click.ClickException(f"Indexes not created (see the log): {', '.join(missing)}")
+        verify_query_plans(mongo.db)
+        print("✅ Every route query is served by an index")
+
+    # ✅ CLI: backfill / rebuild the per-farmer sales rollups from the orders collection
+    @app.cli.command("rebuild-rollups")
+    @click.option("--farmer", default=None, help="Only rebuild this farmer's rollups")
+    def rebuild_rollups_command(farmer):
+        count = rebuild_rollups(mongo.db, farmer)
+        print(f"📈 Rebuilt {count} rollup documents")
+
+    # ✅ CLI: report drift between the rollups and the orders collection
+    @app.cli.command("check-rollups")
+    @click.option("--farmer", default=None, help="Only check this farmer's rollups")
+    def check_rollups_command(farmer):
+        mismatches = check_rollups(mongo.db, farmer)
+        for mismatch in mismatches:
+            print("❌", mismatch)
+        if mismatches:
+            sys.exit(1)
+        print("✅ Rollups match the orders collection")
+
+    # ✅ CLI: backfill stock_status on products and rebuild the per-farmer inventory summaries
+    @app.cli.command("rebuild-inventory")
+    @click.option("--farmer", default=None, help="Only rebuild this farmer's inventory")
+    def rebuild_inventory_command(farmer):
+        count = rebuild_inventory(mongo.db, farmer)
+        print(f"📦 Rebuilt {count} inventory summaries")
+
+    # ✅ CLI: report drift between the inventory summaries / stock statuses and the products
+    @app.cli.command("check-inventory")
+    @click.option("--farmer", default=None, help="Only check this farmer's inventory")
+    def check_inventory_command(farmer):
+        mismatches = check_inventory(mongo.db, farmer)
+        for mismatch in mismatches:
+            print("❌", mismatch)
+        if mismatches:
+            sys.exit(1)
+        print("✅ Inventory matches the products collection")
+
+
+    # ✅ CLI: the outbox worker process (order side effects such as the sales rollups)
+    @app.cli.command("outbox-worker")
+    @click.option("--once", is_flag=True, help="Drain what is due and exit")
+    def outbox_worker_command(once):
+        if once:
+            print(f"📬 Processed {outbox.outbox.drain()} outbox events")
+            return
+        print("📬 Outbox worker running (Ctrl+C to stop)")
+        try:
+            outbox.outbox.run()
+        except KeyboardInterrupt:
+            pass
+
+
+def register_core_routes(app):
+    # ✅ HEALTH CHECK ROUTE
+    @app.route('/api/health')
+    def health_check():
+        return jsonify({
+            "status": "healthy", 
+            "message": "Farm2Home Backend is running",
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "service": "Farm2Home API",
+            "worker": worker_state.status()
+        })
+
+    # ✅ Readiness probe: 200 once this worker has its own Mongo client and a successful ping
+    @app.route('/api/health/ready')
+    def readiness_check():
+        ready = worker_state.status()["ready"] or worker_state.warm_up(mongo)
+        return jsonify({
+            "status": "ready" if ready else "starting",
+            "worker": worker_state.status(),
+            "timestamp": datetime.datetime.utcnow().isoformat()
+        }), 200 if ready else 503
+
+    # ✅ Mongo connection pool health (checkout wait times for pool sizing)
+    @app.route('/api/health/db')
+    def db_health_check():
+        return jsonify({
+            "status": "healthy",
+            "worker": worker_state.status(),
+            "pool": mongo.pool_stats(),
+            "timestamp": datetime.datetime.utcnow().isoformat()
+        })
+
+    # ✅ Outbox backlog: pending and failed events and the age of the oldest one (the processing lag)
+    @app.route('/api/health/outbox')
+    def outbox_health_check():
+        stats = outbox.outbox.stats()
+        return jsonify({
+            "status": "healthy" if not stats["failed"] else "degraded",
+            "outbox": stats,
+            "timestamp": datetime.datetime.utcnow().isoformat()
+        })
+
+    # ✅ Prometheus scrape endpoint (this worker's request, Mongo, pool, cache and outbox metrics)
+    @app.route('/api/metrics')
+    def metrics_endpoint():
+        try:
+            outbox_stats = outbox.outbox.stats()
+        except Exception as e:
+            log.warning("Could not read the outbox backlog", extra={"error": str(e)})
+            outbox_stats = None
+        body = metrics.render(mongo.pool_stats(), cache.catalog_cache.stats(), outbox_stats)
+        return Response(body, content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+    # ✅ Root endpoint
+    @app.route('/')
+    def home():
+        return jsonify({
+            "message": "Farm2Home API Server",
+            "version": "1.0",
+            "endpoints": {
+                "health": "/api/health",
+                "products": "/api/products",
+                "orders": "/api/orders",
+                "auth": "/api/auth",
+                "buyer": "/api/buyer",
+                "analytics": "/api/analytics",  # <-- ADD THIS ENDPOINT TOO
+                "market_prices": "/api/market-prices",
+                "metrics": "/api/metrics"
+            }
+        })
+
 
+# Development server only; production runs gunicorn (see gunicorn.conf.py and wsgi.py)
 if __name__ == "__main__":
+    debug = os.environ.get("FLASK_DEBUG", "1") == "1"
+    app = create_app({"DEBUG": debug})
     print("🚀 Starting Farm2Home Server on http://localhost:5000")
     print("✅ Health check available at: http://localhost:5000/api/health")
     print("✅ Products API available at: http://localhost:5000/api/products")
     print("✅ Orders API available at: http://localhost:5000/api/orders")
     print("✅ Buyer API available at: http://localhost:5000/api/buyer")
     print("✅ Analytics API available at: http://localhost:5000/api/analytics")  # <-- ADD THIS LINE
-    app.run(debug=True, port=5000)
-    
\ No newline at end of file
+    app.run(debug=debug, port=int(os.environ.get("PORT", 5000)))
@@ -0,0 +1,6 @@
+# ASGI entry point for the asyncio serving mode: uvicorn asgi:app --workers 4
+# Read routes with an async port run on the event loop; everything else is served by the Flask app.
+from app import create_app
+from aio import AsyncApp
+
+app = AsyncApp(create_app())
@@ -0,0 +1,111 @@
+"""Compare the Python-loop and rollup implementations of farmer analytics.
+
+Seeds one farmer with N orders, rebuilds the rollups with the aggregation
+pipelines, checks both implementations return the same payload, and reports
+their latency.
+
+    python -m bench.analytics_compare --orders 20000 --repeat 10
+    python -m bench.analytics_compare --in-process      # mongomock stand-in
+"""
+from collections import defaultdict
+import argparse
+import datetime
+import statistics
+
+from bench.common import connect, seed_farmer_sales, timed, percentile, DEFAULT_URI
+from routes.analytics import build_farmer_analytics
+from rollups import rebuild_rollups
+
+FARMER = "bench-farmer@example.com"
+
+
+# The original handler body: load everything, loop three times in Python
+def legacy_farmer_analytics(db, farmer_email):
+    orders = list(db.orders.find({"farmer_email": farmer_email}))
+    products = list(db.products.find({"farmer_email": farmer_email}))
+
+    monthly_sales = defaultdict(int)
+    monthly_revenue = defaultdict(float)
+    for order in orders:
+        month_year = order["created_at"].strftime("%b %Y")
+        monthly_sales[month_year] += order["quantity"]
+        monthly_revenue[month_year] += order["total_price"]
+    sorted_months = sorted(monthly_sales.keys(), key=lambda x: datetime.datetime.strptime(x, "%b %Y"))
+
+    product_performance = defaultdict(lambda: {"quantity": 0, "revenue": 0})
+    for order in orders:
+        product_performance[order["product_name"]]["quantity"] += order["quantity"]
+        product_performance[order["product_name"]]["revenue"] += order["total_price"]
+
+    week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
+    return {
+        "farmer_email": farmer_email,
+        "total_sales": len(orders),
+        "total_revenue": sum(o["total_price"] for o in orders),
+        "total_quantity_sold": sum(o["quantity"] for o in orders),
+        "current_stock": sum(p["quantity"] for p in products),
+        "total_products_listed": len(products),
+        "stock_summary": {
+            "out": sum(1 for p in products if p["quantity"] == 0),
+            "low": sum(1 for p in products if 0 < p["quantity"] <= 5),
+            "good": sum(1 for p in products if p["quantity"] > 5),
+        },
+        "recent_orders_7days": len([o for o in orders if o["created_at"] > week_ago]),
+        "monthly_sales": {
+            "labels": sorted_months[-6:],
+            "quantities": [monthly_sales[m] for m in sorted_months[-6:]],
+            "revenues": [monthly_revenue[m] for m in sorted_months[-6:]],
+        },
+        "product_performance": [
+            {"name": name, "quantity": d["quantity"], "revenue": d["revenue"]}
+            for name, d in product_performance.items()
+        ],
+        "stock_distribution": [
+            {"name": p["name"], "quantity": p["quantity"],
+             "status": "Out of Stock" if p["quantity"] == 0 else "Low Stock" if p["quantity"] <= 5 else "Good Stock"}
+            for p in products
+        ],
+    }
+
+
+# Same payload up to float summation order and product ordering
+def same_payload(a, b):
+    def norm(d):
+        d = dict(d)
+        d["total_revenue"] = round(d["total_revenue"], 2)
+        d["monthly_sales"] = {**d["monthly_sales"], "revenues": [round(r, 2) for r in d["monthly_sales"]["revenues"]]}
+        d["product_performance"] = sorted(
+            ({**p, "revenue": round(p["revenue"], 2)} for p in d["product_performance"]), key=lambda p: p["name"])
+        return d
+    return norm(a) == norm(b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--in-process", action="store_true", help="use mongomock instead of a mongod")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    db = connect(args.uri, args.in_process)
+    seed_farmer_sales(db, FARMER, products=args.products, orders=args.orders)
+
+    samples = timed(lambda: rebuild_rollups(db, FARMER), 1)
+    print(f"  rebuild: {samples[0]:8.1f} ms (aggregation backfill, once)")
+
+    if not same_payload(legacy_farmer_analytics(db, FARMER), build_farmer_analytics(db, FARMER)):
+        raise SystemExit("Implementations disagree on the seeded dataset")
+
+    for label, fn in (("python", legacy_farmer_analytics), ("rollups", build_farmer_analytics)):
+        samples = timed(lambda: fn(db, FARMER), args.repeat)
+        print(f"{label:>9}: median {statistics.median(samples):8.1f} ms | p95 {percentile(samples, 95):8.1f} ms "
+              f"| {args.orders} orders")
+
+    if not args.in_process:
+        db.client.drop_database(db.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Concurrency benchmark: the sync serving mode (gunicorn + gthread, wsgi:app) against the
+asyncio serving mode (uvicorn, asgi:app) on the same database and the same read mix.
+
+Seeds a reproducible marketplace, starts both servers with the same number of worker
+processes, checks that every URL in the mix answers identically in both modes, then
+drives each one at several client concurrency levels with httpx and reports throughput
+and p50/p95/p99 latency. The catalog cache is off so every request reaches Mongo.
+
+    python -m bench.async_concurrency --workers 2 --threads 8 --concurrency 16,64,256
+    python -m bench.async_concurrency --requests 5000 --mode async
+
+Needs a mongod (the servers are separate processes, so the mongomock stand-in cannot be
+shared with them) and httpx. A scratch database (farm2home_bench) is created and dropped.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.common import seed_dataset, percentile, auth_header, BENCH_ADMIN, DEFAULT_URI
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def server_command(mode, port, args):
+    if mode == "sync":
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    return [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--no-access-log", "--log-level", "warning"]
+
+
+def start_server(mode, port, args, image_store):
+    env = dict(os.environ,
+               MONGO_URI=args.uri, IMAGE_STORE_DIR=image_store, LOG_LEVEL="WARNING",
+               CATALOG_CACHE_ENABLED="0", CREATE_INDEXES_ON_STARTUP="0", METRICS_ENABLED="1",
+               BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads),
+               MONGO_MAX_POOL_SIZE=str(args.pool_size))
+    return subprocess.Popen(server_command(mode, port, args), cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL)
+
+
+async def wait_ready(client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/api/health/ready")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"{client.base_url} did not become ready")
+
+
+# The read routes that have an async port, weighted roughly like the storefront's traffic, as
+# (url, headers) pairs; single orders are read with the bench admin's token (data["admin_headers"])
+def build_urls(data, rng, n):
+    def pick():
+        kind = rng.choices(("catalog", "search", "farmer", "product", "buyer", "sales", "order", "analytics"),
+                           weights=(4, 3, 2, 4, 2, 1, 1, 1))[0]
+        farmer, buyer = rng.choice(data["farmers"]), rng.choice(data["buyers"])
+        return {
+            "catalog": "/api/products/?limit=50",
+            "search": f"/api/products/search?q={rng.choice(('tom', 'pot', 'on', 'ma', 'organic'))}&limit=20",
+            "farmer": f"/api/products/farmer/{farmer}?limit=50",
+            "product": f"/api/products/{rng.choice(data['product_ids'])}",
+            "buyer": f"/api/orders/buyer/{buyer}?limit=50",
+            "sales": f"/api/orders/farmer/{farmer}?limit=50",
+            "order": f"/api/orders/{rng.choice(data['order_ids'])}",
+            "analytics": f"/api/analytics/farmer/{farmer}",
+        }[kind], data["admin_headers"] if kind == "order" else None
+    return [pick() for _ in range(n)]
+
+
+# Absolute image URLs carry the server's host:port; everything else must match byte for byte
+async def check_parity(clients, urls):
+    mismatches = 0
+    for url, headers in sorted(dict(urls).items()):
+        bodies = []
+        for client in clients:
+            response = await client.get(url, headers=headers)
+            bodies.append((response.status_code, response.text.replace(str(client.base_url).rstrip("/"), "")))
+        if bodies[0] != bodies[1]:
+            mismatches += 1
+            print(f"  response differs between modes: {url}")
+    return mismatches
+
+
+async def drive(client, urls, concurrency):
+    latencies, errors = [], 0
+    queue = iter(urls)
+
+    async def worker():
+        nonlocal errors
+        for url, headers in queue:
+            t0 = time.perf_counter()
+            try:
+                status = (await client.get(url, headers=headers)).status_code
+            except Exception:
+                status = None
+            latencies.append((time.perf_counter() - t0) * 1000)
+            errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run(args, data, ports):
+    import httpx
+
+    rng = random.Random(args.seed)
+    urls = build_urls(data, rng, args.requests)
+    limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+    clients = {mode: httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60)
+               for mode, port in ports.items()}
+    try:
+        for client in clients.values():
+            await wait_ready(client)
+        if len(clients) == 2:
+            mismatches = await check_parity(list(clients.values()), urls[:200])
+            print(f"parity: {mismatches} of {len(dict(urls[:200]))} URLs differ")
+            if mismatches:
+                raise SystemExit(1)
+
+        print(f"{'mode':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} errors")
+        for concurrency in args.levels:
+            for mode, client in clients.items():
+                await drive(client, urls[:args.warmup], concurrency)
+                latencies, errors, elapsed = await drive(client, urls, concurrency)
+                print(f"{mode:<6} {concurrency:>7} {len(urls) / elapsed:9.1f} {percentile(latencies, 50):9.2f} "
+                      f"{percentile(latencies, 95):9.2f} {percentile(latencies, 99):9.2f} {errors}")
+    finally:
+        for client in clients.values():
+            await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--mode", choices=("both", "sync", "async"), default="both")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes per server")
+    parser.add_argument("--threads", type=int, default=8, help="gthread threads per sync worker")
+    parser.add_argument("--pool-size", type=int, default=100, help="MONGO_MAX_POOL_SIZE per worker")
+    parser.add_argument("--concurrency", default="16,64,256", help="comma-separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=3000, help="timed requests per mode and level")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--port", type=int, default=5810, help="sync server port; async uses the next one")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=50000)
+    args = parser.parse_args()
+    args.levels = [int(level) for level in args.concurrency.split(",")]
+
+    image_store = tempfile.mkdtemp(prefix="farm2home-bench-images-")
+    os.environ.update({"MONGO_URI": args.uri, "IMAGE_STORE_DIR": image_store, "LOG_LEVEL": "WARNING",
+                       "ADMIN_EMAILS": BENCH_ADMIN})
+    from app import create_app
+    app = create_app()
+    from models import mongo
+    db = mongo.db
+
+    modes = ("sync", "async") if args.mode == "both" else (args.mode,)
+    ports = {mode: args.port + i for i, mode in enumerate(("sync", "async")) if mode in modes}
+    servers = []
+    try:
+        with app.app_context():
+            t0 = time.perf_counter()
+            data = seed_dataset(db, products=args.products, orders=args.orders, seed=args.seed)
+            data["admin_headers"] = auth_header(BENCH_ADMIN, "buyer")
+            print(f"seeded in {time.perf_counter() - t0:.1f} s")
+        servers = [start_server(mode, port, args, image_store) for mode, port in ports.items()]
+        asyncio.run(run(args, data, ports))
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait(timeout=30)
+        mongo.cx.drop_database(db.name)
+        shutil.rmtree(image_store, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Bulk product import: throughput and peak memory for growing uploads.
+
+Writes CSV (or NDJSON) files of N rows to a temp directory, some of them invalid,
+streams each through imports.import_products the way the route does (a binary
+stream read line by line) and reports rows/s, write batches and the peak Python
+heap during the import. The heap should stay roughly flat as N grows.
+
+    python -m bench.bulk_import --rows 10000 100000 500000 --format csv
+    python -m bench.bulk_import --mode upsert        # second pass updates every row
+    python -m bench.bulk_import --in-process         # mongomock stand-in (keeps rows in memory)
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench.common import connect, DEFAULT_URI
+from imports import import_products
+
+FARMER = "bench-import@example.com"
+
+
+def write_upload(path, rows, fmt, bad_every):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            f.write("name,price,quantity,farmer_name\n")
+        for i in range(rows):
+            price = -1 if bad_every and i % bad_every == 0 else i % 90 + 10
+            if fmt == "csv":
+                f.write(f"Crop {i},{price},{i % 40},Bench Farmer\n")
+            else:
+                f.write(json.dumps({"name": f"Crop {i}", "price": price, "quantity": i % 40}) + "\n")
+    return os.path.getsize(path)
+
+
+def run(db, path, fmt, mode, batch_size):
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(path, "rb") as stream:
+        summary = import_products(db.products, stream, fmt, mode, FARMER, "Bench Farmer", batch_size)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summary, elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--in-process", action="store_true", help="use mongomock instead of a mongod")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    parser.add_argument("--mode", choices=("insert", "upsert"), default="insert")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--bad-every", type=int, default=1000, help="make every Nth row invalid (0: none)")
+    args = parser.parse_args()
+
+    db = connect(args.uri, args.in_process)
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            db.products.delete_many({"farmer_email": FARMER})
+            path = os.path.join(tmp, f"products-{rows}.{args.format}")
+            size = write_upload(path, rows, args.format, args.bad_every)
+            if args.mode == "upsert":
+                run(db, path, args.format, "insert", args.batch_size)  # every row exists: all updates
+            summary, elapsed, peak = run(db, path, args.format, args.mode, args.batch_size)
+            print(f"{rows:>8} rows {size / 1e6:7.1f} MB | {elapsed:7.2f} s | {rows / elapsed:9.0f} rows/s "
+                  f"| peak heap {peak:7.2f} MB | inserted {summary['inserted']} updated {summary['updated']} "
+                  f"failed {summary['failed']}")
+    db.products.delete_many({"farmer_email": FARMER})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Shared helpers for the benchmark scripts."""
+from pymongo import MongoClient
+import base64
+import datetime
+import io
+import random
+import os
+import resource
+import sys
+import time
+
+DEFAULT_URI = "mongodb://localhost:27017/farm2home_bench"
+# The apps (and servers) the benchmarks start need a key to sign session tokens with
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+# Listed in ADMIN_EMAILS for the all-orders list, the export and any single order
+BENCH_ADMIN = "admin@bench.example.com"
+
+
+# Authorization header with a session token for a seeded user (inside an app context)
+def auth_header(email, role):
+    from sessions import issue_token
+    return {"Authorization": f"Bearer {issue_token({'_id': email, 'email': email, 'role': role})}"}
+
+
+# A scratch database on a real mongod, or an in-process mongomock stand-in
+def connect(uri=DEFAULT_URI, in_process=False):
+    if in_process:
+        import mongomock
+        _patch_mongomock_bulk()
+        return mongomock.MongoClient()["farm2home_bench"]
+    client = MongoClient(uri)
+    return client.get_default_database("farm2home_bench")
+
+
+# mongomock's bulk builder predates the sort= argument pymongo 4.9+ passes for UpdateOne/ReplaceOne
+def _patch_mongomock_bulk():
+    from mongomock.collection import BulkOperationBuilder
+    if getattr(BulkOperationBuilder, "_accepts_sort", False):
+        return
+    add_update, add_replace = BulkOperationBuilder.add_update, BulkOperationBuilder.add_replace
+    BulkOperationBuilder.add_update = lambda self, *a, sort=None, **kw: add_update(self, *a, **kw)
+    BulkOperationBuilder.add_replace = lambda self, *a, sort=None, **kw: add_replace(self, *a, **kw)
+    BulkOperationBuilder._accepts_sort = True
+
+
+# Seed one farmer's products and orders spread over the last `months` months
+def seed_farmer_sales(db, farmer_email, products=20, orders=10000, months=12, seed=42):
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    db.products.delete_many({"farmer_email": farmer_email})
+    db.orders.delete_many({"farmer_email": farmer_email})
+    db.inventory.delete_many({"_id": farmer_email})
+
+    catalog = [
+        {
+            "name": f"Crop {i}",
+            "price": float(rng.randint(10, 200)),
+            "quantity": rng.randint(0, 100),
+            "farmer_email": farmer_email,
+            "farmer_name": "Bench Farmer",
+            "created_at": now - datetime.timedelta(days=rng.randint(0, months * 30)),
+        }
+        for i in range(products)
+    ]
+    db.products.insert_many(catalog)
+
+    batch = []
+    for _ in range(orders):
+        product = rng.choice(catalog)
+        quantity = rng.randint(1, 10)
+        batch.append({
+            "product_id": str(product["_id"]),
+            "product_name": product["name"],
+            "buyer_email": f"buyer{rng.randint(1, 500)}@example.com",
+            "buyer_name": "Bench Buyer",
+            "farmer_email": farmer_email,
+            "farmer_name": "Bench Farmer",
+            "quantity": quantity,
+            "total_price": product["price"] * quantity,
+            "status": "confirmed",
+            "created_at": now - datetime.timedelta(minutes=rng.randint(0, months * 30 * 24 * 60)),
+        })
+        if len(batch) == 1000:
+            db.orders.insert_many(batch)
+            batch = []
+    if batch:
+        db.orders.insert_many(batch)
+
+
+# A photo-sized JPEG as the browser would upload it (FileReader data URL). Smooth gradients plus
+# sensor-like noise compress roughly like real produce photos (~100 KB - 1 MB).
+def make_image_data_url(rng, width, height):
+    from PIL import Image
+    base = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    tint = Image.new("RGB", (width, height), (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    noise = Image.effect_noise((width, height), rng.randint(20, 60)).convert("RGB")
+    image = Image.blend(Image.blend(base, tint, 0.5), noise, 0.25)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+PHOTO_SIZES = ((640, 480), (1024, 768), (1600, 1200))
+CROPS = ("Tomato", "Potato", "Onion", "Carrot", "Spinach", "Mango", "Banana", "Rice", "Wheat", "Okra",
+         "Brinjal", "Cabbage", "Cauliflower", "Chilli", "Garlic", "Ginger", "Apple", "Guava", "Papaya", "Lemon")
+BENCH_PASSWORD = "bench-password"
+
+
+# Seed a whole marketplace: farmers and buyers (with profiles), products with stored photos,
+# and orders spread over `months` months. Must run inside an app context (image store config).
+# Returns the emails and ids the route benchmarks pick from.
+def seed_dataset(db, farmers=20, buyers=200, products=500, orders=20000, months=12, images=12, seed=42):
+    from werkzeug.security import generate_password_hash
+    from images import store_image
+    from search import name_prefixes
+    from rollups import rebuild_rollups
+    from inventory import rebuild_inventory
+
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    for collection in ("users", "products", "orders", "sales_rollups", "rollup_events", "inventory", "outbox"):
+        db[collection].delete_many({})
+
+    # One hash for everyone: hashing thousands of passwords would dominate seeding time
+    password = generate_password_hash(BENCH_PASSWORD)
+    farmer_emails = [f"farmer{i}@bench.example.com" for i in range(farmers)]
+    buyer_emails = [f"buyer{i}@bench.example.com" for i in range(buyers)]
+    db.users.insert_many(
+        [{"name": f"Farmer {i}", "email": e, "password": password, "role": "farmer",
+          "phone": f"98{i:08d}", "crops": rng.sample(CROPS, 3), "location": "Bench Village"}
+         for i, e in enumerate(farmer_emails)]
+        + [{"name": f"Buyer {i}", "email": e, "password": password, "role": "buyer",
+            "phone": f"97{i:08d}", "business_name": f"Shop {i}", "location": "Bench Town"}
+           for i, e in enumerate(buyer_emails)]
+    )
+
+    # A small pool of photos shared by many products, as the content-addressed store dedupes them
+    photos = [store_image(make_image_data_url(rng, *rng.choice(PHOTO_SIZES))) for _ in range(images)]
+    catalog = []
+    for i in range(products):
+        farmer = rng.choice(farmer_emails)
+        name = f"{rng.choice(('Organic', 'Fresh', 'Local', 'Farm'))} {rng.choice(CROPS)} {i}"
+        catalog.append({
+            "name": name,
+            "price": float(rng.randint(10, 400)),
+            "quantity": rng.randint(0, 500),
+            "farmer_email": farmer,
+            "farmer_name": f"Farmer {farmer_emails.index(farmer)}",
+            "name_prefixes": name_prefixes(name),
+            "created_at": now - datetime.timedelta(minutes=rng.randint(0, months * 30 * 24 * 60)),
+            **rng.choice(photos),
+        })
+    db.products.insert_many(catalog)
+
+    batch = []
+    for _ in range(orders):
+        product = rng.choice(catalog)
+        buyer = rng.choice(buyer_emails)
+        quantity = rng.randint(1, 10)
+        created_at = product["created_at"] + datetime.timedelta(minutes=rng.randint(0, 30 * 24 * 60))
+        batch.append({
+            "product_id": str(product["_id"]),
+            "product_name": product["name"],
+            "buyer_email": buyer,
+            "buyer_name": f"Buyer {buyer_emails.index(buyer)}",
+            "farmer_email": product["farmer_email"],
+            "farmer_name": product["farmer_name"],
+            "quantity": quantity,
+            "total_price": product["price"] * quantity,
+            "status": "cancelled" if rng.random() < 0.05 else rng.choice(("confirmed", "shipped", "delivered")),
+            "created_at": min(created_at, now),
+        })
+        if len(batch) == 1000:
+            db.orders.insert_many(batch)
+            batch = []
+    if batch:
+        db.orders.insert_many(batch)
+    rebuild_rollups(db)
+    rebuild_inventory(db)
+
+    return {
+        "farmers": farmer_emails,
+        "buyers": buyer_emails,
+        "product_ids": [str(p["_id"]) for p in catalog],
+        "order_ids": [str(o["_id"]) for o in db.orders.find({}, {"_id": 1}).limit(5000)],
+    }
+
+
+# Peak resident set size of this process so far, in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Run fn `repeat` times and return the per-call latencies in milliseconds
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
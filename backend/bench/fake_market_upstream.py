@@ -0,0 +1,107 @@
+"""A local stand-in for the data.gov.in commodity price resource.
+
+Answers GET /?api-key=&format=json&limit=&filters[commodity]=&filters[state]=&filters[market]=
+with deterministic records shaped like the real ones, after an optional delay, and can be
+told to fail. Counts the calls it receives so benchmarks can check request coalescing.
+
+    python -m bench.fake_market_upstream --port 5901 --delay 0.3
+    MARKET_PRICES_API_URL=http://127.0.0.1:5901/ python app.py
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import random
+import threading
+import time
+
+STATES = {
+    "Maharashtra": ("Pune", "Nashik", "Lasalgaon"),
+    "Karnataka": ("Bangalore", "Hubli", "Mysore"),
+    "Uttar Pradesh": ("Agra", "Kanpur", "Lucknow"),
+    "Telangana": ("Bowenpally", "Warangal"),
+}
+
+
+def fake_records(filters, limit):
+    rng = random.Random(json.dumps(filters, sort_keys=True))
+    commodity = filters.get("commodity", "Onion")
+    records = []
+    for state, markets in STATES.items():
+        if filters.get("state") not in (None, state):
+            continue
+        for market in markets:
+            if filters.get("market") not in (None, market):
+                continue
+            for day in range(1, 4):
+                low = rng.randint(800, 2500)
+                records.append({
+                    "state": state, "district": market, "market": market, "commodity": commodity,
+                    "variety": "Other", "grade": "FAQ", "arrival_date": f"0{day}/06/2025",
+                    "min_price": str(low), "max_price": str(low + rng.randint(200, 900)),
+                    "modal_price": str(low + rng.randint(50, 200)), "arrivals_in_qtl": str(rng.randint(10, 900)),
+                })
+    return records[:limit]
+
+
+class FakeUpstream:
+    def __init__(self, port=0, delay=0.0):
+        self.delay = delay
+        self.failing = False
+        self.calls = 0
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with upstream._lock:
+                    upstream.calls += 1
+                time.sleep(upstream.delay)
+                if upstream.failing:
+                    self._send(503, {"status": "error", "message": "Service Unavailable"})
+                    return
+                query = parse_qs(urlparse(self.path).query)
+                filters = {key[8:-1]: values[0] for key, values in query.items() if key.startswith("filters[")}
+                limit = int(query.get("limit", ["10"])[0])
+                records = fake_records(filters, limit)
+                self._send(200, {"status": "ok", "count": len(records), "records": records})
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5901)
+    parser.add_argument("--delay", type=float, default=0.3, help="seconds before each answer")
+    args = parser.parse_args()
+    upstream = FakeUpstream(args.port, args.delay)
+    print(f"Fake data.gov.in upstream on {upstream.url}")
+    try:
+        upstream.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Response serialization: per-document serializers + stdlib json vs projected documents + orjson.
+
+Builds a page of N product and order documents shaped like the projection fetch_page
+returns, then times producing the response body three ways and checks they decode
+to the same JSON:
+
+  legacy        serialize_product/serialize_order per document, Flask's stdlib provider
+  shaped+flask  shape_page in place, MongoJSONProvider (stdlib json) encodes ObjectId/datetime
+  shaped+orjson shape_page in place, OrjsonProvider
+
+    python -m bench.json_serialization --docs 200 1000 5000 --repeat 50
+
+No Mongo needed.
+"""
+import argparse
+import copy
+import datetime
+import json
+import os
+import random
+import time
+
+from bson import ObjectId
+from flask import jsonify
+
+from bench.common import percentile
+
+PRODUCT_NAMES = ("Tomato", "Onion", "Potato", "Chili", "Carrot", "Brinjal", "Okra", "Spinach")
+
+
+def make_products(n, rng):
+    now = datetime.datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "name": f"{rng.choice(PRODUCT_NAMES)} {i}",
+        "price": float(rng.randint(10, 200)),
+        "quantity": rng.randint(0, 100),
+        "farmer_email": f"farmer{i % 20}@example.com",
+        "farmer_name": f"Farmer {i % 20}",
+        "created_at": now - datetime.timedelta(minutes=i),
+        **({"image_id": os.urandom(16).hex()} if i % 3 else {}),
+    } for i in range(n)]
+
+
+def make_orders(n, rng):
+    now = datetime.datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "product_id": str(ObjectId()),
+        "product_name": rng.choice(PRODUCT_NAMES),
+        "buyer_email": f"buyer{i % 200}@example.com",
+        "buyer_name": f"Buyer {i % 200}",
+        "farmer_email": f"farmer{i % 20}@example.com",
+        "farmer_name": f"Farmer {i % 20}",
+        "quantity": rng.randint(1, 10),
+        "total_price": float(rng.randint(10, 2000)),
+        "status": "confirmed",
+        "created_at": now - datetime.timedelta(minutes=i),
+    } for i in range(n)]
+
+
+def time_body(app, build, docs, repeat):
+    # build() mutates the shaped documents, so each run gets its own copy (made outside the timing)
+    copies = [copy.deepcopy(docs) for _ in range(repeat)]
+    samples, body = [], None
+    for page in copies:
+        with app.test_request_context("/api/products"):
+            started = time.perf_counter()
+            body = build(page).get_data()
+            samples.append((time.perf_counter() - started) * 1000)
+    return samples, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    os.environ.update({"LOG_LEVEL": "ERROR", "CREATE_INDEXES_ON_STARTUP": "0"})
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app
+    from json_provider import MongoJSONProvider, OrjsonProvider
+    from pagination import shape_page
+    from routes.products import serialize_product, shape_products, PRODUCT_FIELDS
+    from routes.orders import serialize_order, ORDER_FIELDS, ORDER_DEFAULTS
+
+    apps = {}
+    for name, provider in (("legacy", DefaultJSONProvider), ("shaped+flask", MongoJSONProvider),
+                           ("shaped+orjson", OrjsonProvider)):
+        apps[name] = create_app()
+        apps[name].json = provider(apps[name])
+        apps[name].json.sort_keys = False
+
+    def order_defaults():
+        return {**ORDER_DEFAULTS, "created_at": datetime.datetime.utcnow()}
+
+    paths = {
+        "products": {
+            "legacy": lambda docs: jsonify([serialize_product(p, PRODUCT_FIELDS) for p in docs]),
+            "shaped+flask": lambda docs: jsonify(shape_products(docs, PRODUCT_FIELDS)),
+            "shaped+orjson": lambda docs: jsonify(shape_products(docs, PRODUCT_FIELDS)),
+        },
+        "orders": {
+            "legacy": lambda docs: jsonify([serialize_order(o, ORDER_FIELDS) for o in docs]),
+            "shaped+flask": lambda docs: jsonify(shape_page(docs, ORDER_FIELDS, order_defaults())),
+            "shaped+orjson": lambda docs: jsonify(shape_page(docs, ORDER_FIELDS, order_defaults())),
+        },
+    }
+
+    rng = random.Random(42)
+    failures = []
+    for n in args.docs:
+        for kind, make in (("products", make_products), ("orders", make_orders)):
+            docs = make(n, rng)
+            baseline, expected = None, None
+            for name, build in paths[kind].items():
+                samples, body = time_body(apps[name], build, docs, args.repeat)
+                p50 = percentile(samples, 50)
+                baseline = baseline or p50
+                if expected is None:
+                    expected = json.loads(body)
+                elif json.loads(body) != expected:
+                    failures.append(f"{name} {kind} x{n} does not match the legacy body")
+                print(f"{kind:<9} {n:>6} docs | {name:<14} | p50 {p50:8.2f} ms | p95 {percentile(samples, 95):8.2f} ms "
+                      f"| {baseline / p50:5.2f}x | {len(body) / 1024:8.1f} KiB")
+    if failures:
+        raise SystemExit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
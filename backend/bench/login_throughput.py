@@ -0,0 +1,108 @@
+"""Login throughput under concurrency: PBKDF2 on the request thread vs the password pool.
+
+Seeds buyers sharing one password hash, then fires concurrent POST /api/auth/login
+requests in each mode while a probe thread measures GET /api/auth/session (token
+verification) to show how much the storm slows cheap requests on the same worker.
+
+    python -m bench.login_throughput --logins 400 --concurrency 32 --pool-workers 4
+    python -m bench.login_throughput --in-process      # mongomock stand-in
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import threading
+import time
+
+from bench.common import connect, percentile, BENCH_PASSWORD, DEFAULT_URI
+
+BUYERS = 50
+
+
+def seed_buyers(db):
+    from werkzeug.security import generate_password_hash
+    password = generate_password_hash(BENCH_PASSWORD)
+    db.users.delete_many({})
+    db.users.insert_many([{"name": f"Buyer {i}", "email": f"buyer{i}@bench.example.com", "password": password,
+                           "role": "buyer"} for i in range(BUYERS)])
+
+
+def run(label, client, token, args):
+    latencies, statuses, probes = [], [], []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login(i):
+        body = {"email": f"buyer{i % BUYERS}@bench.example.com", "password": BENCH_PASSWORD, "role": "buyer"}
+        t0 = time.perf_counter()
+        status = client.post("/api/auth/login", json=body).status_code
+        with lock:
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses.append(status)
+
+    def probe():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            client.get("/api/auth/session", headers={"Authorization": f"Bearer {token}"})
+            probes.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.005)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    ok = statuses.count(200)
+    print(f"{label:>7}: {ok / elapsed:8.1f} logins/s | p50 {percentile(latencies, 50):7.1f} ms "
+          f"| p95 {percentile(latencies, 95):7.1f} ms | {statuses.count(503)} shed (503) "
+          f"| session check p95 {percentile(probes, 95):6.2f} ms during the storm")
+    return ok + statuses.count(503) == args.logins
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--in-process", action="store_true", help="use mongomock instead of a mongod")
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    os.environ.update({"MONGO_URI": args.uri, "LOG_LEVEL": "WARNING",
+                       "CREATE_INDEXES_ON_STARTUP": "0" if args.in_process else "1"})
+    from app import create_app
+    app = create_app()
+    from models import mongo
+    import passwords
+
+    if args.in_process:
+        mongo.use_client(connect(in_process=True).client)
+    db = mongo.db
+    seed_buyers(db)
+    client = app.test_client()
+    token = client.post("/api/auth/login", json={"email": "buyer0@bench.example.com", "password": BENCH_PASSWORD,
+                                                 "role": "buyer"}).get_json()["token"]
+
+    healthy = True
+    try:
+        for label, workers in (("inline", 0), ("pool", args.pool_workers)):
+            app.config.update(PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_MAX_PENDING=args.max_pending)
+            passwords.init_app(app)
+            if workers:
+                passwords.hasher.verify(db.users.find_one()["password"], BENCH_PASSWORD)  # start the workers
+            healthy &= run(label, client, token, args)
+    finally:
+        passwords.hasher.shutdown()
+        if not args.in_process:
+            mongo.cx.drop_database(db.name)
+
+    if not healthy:
+        raise SystemExit("Some logins failed with something other than 200 or 503")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Market price proxy: request coalescing, cache hits and stale serving against a local fake
+data.gov.in upstream (bench/fake_market_upstream.py) with a configurable delay.
+
+    python -m bench.market_prices --concurrency 64 --delay 0.3
+
+Phases: a burst of identical lookups (must cost one upstream call), repeat lookups
+(cache hits), a burst over distinct filter sets, then the upstream fails: cached
+filter sets keep answering stale, uncached ones get 502. No Mongo needed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import time
+
+from bench.common import percentile
+from bench.fake_market_upstream import FakeUpstream, STATES
+
+CROPS = ("Onion", "Tomato", "Potato", "Wheat", "Rice", "Maize")
+
+
+def burst(client, urls, concurrency):
+    def get(url):
+        t0 = time.perf_counter()
+        response = client.get(url)
+        return (time.perf_counter() - t0) * 1000, response.status_code, response.headers.get("X-Cache")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(get, urls))
+
+
+def phase(label, client, urls, concurrency, upstream):
+    calls_before = upstream.calls
+    results = burst(client, urls, concurrency)
+    return results, report(label, results, upstream.calls - calls_before)
+
+
+def report(label, results, calls):
+    latencies = [r[0] for r in results]
+    states = {}
+    for _, status, state in results:
+        key = f"{status} {state}" if state else str(status)
+        states[key] = states.get(key, 0) + 1
+    print(f"{label:<22} {len(results):>5} requests | {calls:>4} upstream calls | p50 {percentile(latencies, 50):8.2f} ms "
+          f"| p95 {percentile(latencies, 95):8.2f} ms | {', '.join(f'{k}: {v}' for k, v in sorted(states.items()))}")
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--delay", type=float, default=0.3, help="fake upstream latency in seconds")
+    parser.add_argument("--requests", type=int, default=256, help="requests per phase")
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(delay=args.delay).start()
+    os.environ.update({"LOG_LEVEL": "ERROR", "CREATE_INDEXES_ON_STARTUP": "0"})
+    from app import create_app
+    app = create_app({"MARKET_PRICES_API_URL": upstream.url, "MARKET_PRICES_API_KEY": "bench-key",
+                      "MARKET_PRICES_TTL": 60, "MARKET_PRICES_RETRY_AFTER": 5})
+    from market import market_prices
+    client = app.test_client()
+
+    failures = []
+    try:
+        same = ["/api/market-prices?commodity=Onion&state=Maharashtra"] * args.requests
+        _, calls = phase("identical burst", client, same, args.concurrency, upstream)
+        if calls != 1:
+            failures.append(f"identical burst cost {calls} upstream calls, expected 1")
+
+        phase("repeat (cached)", client, same, args.concurrency, upstream)
+
+        distinct = [f"/api/market-prices?commodity={crop}&state={state}"
+                    for crop in CROPS for state in STATES]
+        mixed = [distinct[i % len(distinct)] for i in range(args.requests)]
+        _, calls = phase("distinct filter sets", client, mixed, args.concurrency, upstream)
+        if calls > len(distinct) - 1:  # Onion/Maharashtra is already cached
+            failures.append(f"{len(distinct)} filter sets cost {calls} upstream calls")
+
+        # Expire every entry's freshness but keep it servable, then take the upstream down
+        upstream.failing = True
+        market_prices.expire()
+        results, _ = phase("upstream down, cached", client, mixed, args.concurrency, upstream)
+        if any(status != 200 for _, status, _ in results):
+            failures.append("cached filter sets were not served stale while the upstream was down")
+
+        results, _ = phase("upstream down, new", client, ["/api/market-prices?commodity=Garlic"] * 16, 16, upstream)
+        if any(status != 502 for _, status, _ in results):
+            failures.append("uncached lookups did not fail with 502 while the upstream was down")
+    finally:
+        upstream.stop()
+
+    print(market_prices.stats())
+    if failures:
+        raise SystemExit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
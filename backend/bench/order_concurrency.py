@@ -0,0 +1,104 @@
+"""Concurrency load test for order placement.
+
+Fires many parallel orders at a single low-stock product and checks that stock
+never goes negative, for both the legacy read-check-$inc-insert flow and the
+current POST /api/orders path. Needs a running mongod; a scratch database is
+created and dropped. tests/test_order_concurrency.py asserts the same invariants under pytest.
+
+    python -m bench.order_concurrency --orders 500 --stock 50 --workers 64
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import datetime
+import os
+import sys
+import time
+
+
+# The pre-change flow: find_one, check in Python, unconditional $inc, insert_one
+def legacy_place_order(db, product_id, buyer_email, quantity):
+    product = db.products.find_one({"_id": product_id})
+    if product["quantity"] < quantity:
+        return 400
+    db.products.update_one({"_id": product_id}, {"$inc": {"quantity": -quantity}})
+    db.orders.insert_one({
+        "product_id": str(product_id),
+        "product_name": product["name"],
+        "buyer_email": buyer_email,
+        "farmer_email": product["farmer_email"],
+        "quantity": quantity,
+        "total_price": product["price"] * quantity,
+        "status": "confirmed",
+        "created_at": datetime.datetime.utcnow()
+    })
+    return 201
+
+
+def seed_product(db, stock):
+    db.products.delete_many({})
+    db.orders.delete_many({})
+    return db.products.insert_one({
+        "name": "Bench Tomatoes",
+        "price": 40.0,
+        "quantity": stock,
+        "farmer_email": "bench-farmer@example.com",
+        "farmer_name": "Bench Farmer",
+        "created_at": datetime.datetime.utcnow()
+    }).inserted_id
+
+
+def run(label, place, db, product_id, args):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        statuses = list(pool.map(lambda i: place(f"buyer{i}@example.com"), range(args.orders)))
+    elapsed = time.perf_counter() - start
+
+    stock = db.products.find_one({"_id": product_id})["quantity"]
+    placed = db.orders.count_documents({"product_id": str(product_id)})
+    sold = placed * args.quantity
+    print(f"{label:>8}: {args.orders / elapsed:8.1f} orders/s | "
+          f"{statuses.count(201)} accepted, {statuses.count(400)} rejected | "
+          f"stock left {stock}, sold {sold} of {args.stock}")
+    return stock >= 0 and sold <= args.stock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/farm2home_bench")
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=64)
+    args = parser.parse_args()
+
+    os.environ["MONGO_URI"] = args.uri
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    from app import create_app
+    app = create_app()
+    from models import mongo
+
+    client = app.test_client()
+    with app.app_context():
+        db = mongo.db
+
+        product_id = seed_product(db, args.stock)
+        legacy_ok = run("before", lambda buyer: legacy_place_order(db, product_id, buyer, args.quantity),
+                        db, product_id, args)
+
+        product_id = seed_product(db, args.stock)
+        payload = {"product_id": str(product_id), "buyer_name": "Bench Buyer", "quantity": args.quantity}
+        current_ok = run("after", lambda buyer: client.post("/api/orders/", json={**payload, "buyer_email": buyer}).status_code,
+                         db, product_id, args)
+
+        mongo.cx.drop_database(db.name)
+
+    if not legacy_ok:
+        print("before: oversold (expected for the legacy flow)")
+    if not current_ok:
+        print("after: OVERSOLD - stock went negative")
+        sys.exit(1)
+    print("after: no oversell")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""Latency/throughput benchmark for every route in the auth, farmer, buyer, products,
+orders and analytics blueprints.
+
+Seeds a reproducible marketplace (users, products with photo-sized images, orders
+spread over months), then drives each endpoint through the Flask test client and
+reports p50/p95/p99 latency, throughput and the process's peak RSS after each
+endpoint. Results can be written to JSON and compared with a stored baseline;
+the exit status is 1 when any endpoint regressed.
+
+    python -m bench.routes_suite --requests 200 --output bench/results.json
+    python -m bench.routes_suite --baseline bench/baseline.json --tolerance 0.2
+    python -m bench.routes_suite --in-process --only products   # mongomock stand-in
+
+Against a mongod a scratch database (farm2home_bench) is created and dropped.
+In-process runs skip index creation and text search (mongomock supports neither).
+"""
+from collections import namedtuple
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from bson import ObjectId
+from bench.common import (connect, seed_dataset, make_image_data_url, peak_rss_mb, percentile, auth_header,
+                          BENCH_ADMIN, BENCH_PASSWORD, DEFAULT_URI)
+
+# prepare(ctx, n) -> n (method, path, body[, headers]) tuples, built before the clock starts; the body
+# is sent as JSON, or as is when it is bytes (uploads)
+Scenario = namedtuple("Scenario", ["name", "prepare", "expect"])
+
+# Differences below this many milliseconds are noise, whatever the ratio
+NOISE_FLOOR_MS = 1.0
+
+
+class Context:
+    def __init__(self, app, db, data, rng):
+        self.app, self.client, self.db, self.data, self.rng = app, app.test_client(), db, data, rng
+        self.counter = itertools.count()
+
+    # Authorization header carrying a session token for this user
+    def auth(self, email, role):
+        with self.app.app_context():
+            return auth_header(email, role)
+
+    def admin(self):
+        return self.auth(BENCH_ADMIN, "buyer")
+
+    def farmer(self):
+        return self.rng.choice(self.data["farmers"])
+
+    def buyer(self):
+        return self.rng.choice(self.data["buyers"])
+
+    def product_id(self):
+        return self.rng.choice(self.data["product_ids"])
+
+    def order_id(self):
+        return self.rng.choice(self.data["order_ids"])
+
+    def unique(self, prefix):
+        return f"{prefix}-{next(self.counter)}"
+
+    # Throwaway documents for the destructive scenarios, created through the API as `farmer`
+    def new_products(self, n, farmer):
+        ids = []
+        for _ in range(n):
+            body = {"name": self.unique("Spare Crop"), "price": 10, "quantity": 1000,
+                    "farmer_email": farmer, "farmer_name": "Bench Farmer"}
+            ids.append(self.client.post("/api/products/", json=body,
+                                        headers=self.auth(farmer, "farmer")).get_json()["_id"])
+        return ids
+
+    def new_orders(self, n, farmer):
+        product_id = self.new_products(1, farmer)[0]
+        return [
+            self.client.post("/api/orders/", json={"product_id": product_id, "buyer_email": self.buyer(),
+                                                   "quantity": 1}).get_json()["_id"]
+            for _ in range(n)
+        ]
+
+
+def repeat(method, make_path, make_body=None, make_headers=None):
+    return lambda ctx, n: [(method, make_path(ctx), make_body(ctx) if make_body else None,
+                            make_headers(ctx) if make_headers else None) for _ in range(n)]
+
+
+def second_page(path):
+    def prepare(ctx, n):
+        token = ctx.client.get(path).headers.get("X-Next-Cursor")
+        return [("GET", f"{path}&next={token}" if token else path, None)] * n
+    return prepare
+
+
+def signup(ctx, n):
+    return [("POST", "/api/auth/signup", {"name": "New Buyer", "email": ctx.unique("signup") + "@bench.example.com",
+                                          "password": BENCH_PASSWORD, "role": "buyer"}) for _ in range(n)]
+
+
+def add_product_with_photo(ctx, n):
+    photos = [make_image_data_url(ctx.rng, 1024, 768) for _ in range(3)]
+    farmer = ctx.farmer()
+    return [("POST", "/api/products/", {"name": ctx.unique("Fresh Mango"), "price": 120, "quantity": 40,
+                                        "farmer_email": farmer, "farmer_name": "Bench Farmer",
+                                        "image": photos[i % len(photos)]}, ctx.auth(farmer, "farmer"))
+            for i in range(n)]
+
+
+def update_product(ctx, n):
+    farmer = ctx.farmer()
+    return [("PUT", f"/api/products/{pid}", {"name": ctx.unique("Renamed Crop"), "price": 15, "quantity": 900},
+             ctx.auth(farmer, "farmer")) for pid in ctx.new_products(n, farmer)]
+
+
+def delete_product(ctx, n):
+    farmer = ctx.farmer()
+    return [("DELETE", f"/api/products/{pid}", None, ctx.auth(farmer, "farmer"))
+            for pid in ctx.new_products(n, farmer)]
+
+
+def create_order(ctx, n):
+    product_id = ctx.new_products(1, ctx.farmer())[0]
+    return [("POST", "/api/orders/", {"product_id": product_id, "buyer_email": ctx.buyer(),
+                                      "buyer_name": "Bench Buyer", "quantity": 1}) for _ in range(n)]
+
+
+def create_batch(ctx, n):
+    ids = ctx.new_products(5, ctx.farmer())
+    return [("POST", "/api/orders/batch", {"buyer_email": ctx.buyer(), "buyer_name": "Bench Buyer",
+                                           "items": [{"product_id": pid, "quantity": 1} for pid in ids]})
+            for _ in range(n)]
+
+
+# Each order fetched by its own buyer
+def get_order(ctx, n):
+    calls = []
+    for _ in range(n):
+        order_id = ctx.order_id()
+        buyer = ctx.db.orders.find_one({"_id": ObjectId(order_id)}, {"buyer_email": 1})["buyer_email"]
+        calls.append(("GET", f"/api/orders/{order_id}", None, ctx.auth(buyer, "buyer")))
+    return calls
+
+
+def update_order(ctx, n):
+    farmer = ctx.farmer()
+    return [("PUT", f"/api/orders/{oid}", {"status": "shipped"}, ctx.auth(farmer, "farmer"))
+            for oid in ctx.new_orders(n, farmer)]
+
+
+def delete_order(ctx, n):
+    farmer = ctx.farmer()
+    return [("DELETE", f"/api/orders/{oid}", None, ctx.auth(farmer, "farmer")) for oid in ctx.new_orders(n, farmer)]
+
+
+# A cart whose last line wants more than its product has: the whole batch is rolled back
+def abort_batch(ctx, n):
+    farmer = ctx.farmer()
+    ids = ctx.new_products(4, farmer)
+    short = ctx.client.post("/api/products/", json={"name": ctx.unique("Scarce Crop"), "price": 10, "quantity": 1,
+                                                    "farmer_email": farmer, "farmer_name": "Bench Farmer"},
+                            headers=ctx.auth(farmer, "farmer")).get_json()["_id"]
+    items = [{"product_id": pid, "quantity": 1} for pid in ids] + [{"product_id": short, "quantity": 5}]
+    return [("POST", "/api/orders/batch", {"buyer_email": ctx.buyer(), "buyer_name": "Bench Buyer",
+                                           "items": items}) for _ in range(n)]
+
+
+# Each call moves five fresh orders of one farmer to shipped
+def bulk_status(ctx, n):
+    farmer = ctx.farmer()
+    order_ids = ctx.new_orders(5 * n, farmer)
+    return [("PUT", "/api/orders/status/bulk", {"farmer_email": farmer, "status": "shipped",
+                                                "order_ids": order_ids[i:i + 5]}, ctx.auth(farmer, "farmer"))
+            for i in range(0, 5 * n, 5)]
+
+
+# A 100-row CSV catalog per call, new names each time
+def import_products(ctx, n):
+    farmer = ctx.farmer()
+    calls = []
+    for _ in range(n):
+        rows = "".join(f"{ctx.unique('Imported Crop')},{ctx.rng.randint(10, 200)},{ctx.rng.randint(0, 500)}\n"
+                       for _ in range(100))
+        calls.append(("POST", f"/api/products/farmer/{farmer}/import?format=csv&farmer_name=Bench+Farmer",
+                      ("name,price,quantity\n" + rows).encode(), ctx.auth(farmer, "farmer")))
+    return calls
+
+
+def dashboard(ctx, n):
+    calls = []
+    for _ in range(n):
+        farmer = ctx.farmer()
+        calls.append(("GET", f"/api/farmer/{farmer}/dashboard", None, ctx.auth(farmer, "farmer")))
+    return calls
+
+
+def image(ctx, n):
+    product_id = ctx.product_id()
+    return [("GET", f"/api/products/{product_id}/image?size=320", None)] * n
+
+
+SCENARIOS = [
+    # auth
+    Scenario("auth.signup", signup, 201),
+    Scenario("auth.login", repeat("POST", lambda c: "/api/auth/login",
+                                  lambda c: {"email": c.buyer(), "password": BENCH_PASSWORD, "role": "buyer"}), 200),
+    Scenario("auth.session", repeat("GET", lambda c: "/api/auth/session",
+                                    make_headers=lambda c: c.auth(c.buyer(), "buyer")), 200),
+    # farmer
+    Scenario("farmer.get", repeat("GET", lambda c: f"/api/farmer/{c.farmer()}"), 200),
+    Scenario("farmer.save", repeat("POST", lambda c: "/api/farmer",
+                                   lambda c: {"email": c.farmer(), "name": "Farmer", "crops": ["Rice"]}), 200),
+    Scenario("farmer.dashboard", dashboard, 200),
+    # buyer
+    Scenario("buyer.get", repeat("GET", lambda c: f"/api/buyer/{c.buyer()}"), 200),
+    Scenario("buyer.save", repeat("POST", lambda c: "/api/buyer",
+                                  lambda c: {"email": c.buyer(), "name": "Buyer", "phone": "1"}), 200),
+    # products
+    Scenario("products.health", repeat("GET", lambda c: "/api/products/health"), 200),
+    Scenario("products.add", add_product_with_photo, 201),
+    Scenario("products.list", repeat("GET", lambda c: "/api/products/?limit=50"), 200),
+    Scenario("products.list_page2", second_page("/api/products/?limit=50"), 200),
+    Scenario("products.search", repeat("GET", lambda c: f"/api/products/search?q={c.rng.choice(('to', 'man', 'fresh+o'))}"
+                                                        "&in_stock=1&sort=price_asc&limit=20"), 200),
+    Scenario("products.export", repeat("GET", lambda c: f"/api/products/export?farmer={c.farmer()}"), 200),
+    Scenario("products.low_stock", repeat("GET", lambda c: "/api/products/low-stock?limit=50"), 200),
+    Scenario("products.stream", repeat("GET", lambda c: f"/api/products/stream?ids={c.product_id()}"), 200),
+    Scenario("products.import", import_products, 201),
+    Scenario("products.farmer", repeat("GET", lambda c: f"/api/products/farmer/{c.farmer()}?limit=50"), 200),
+    Scenario("products.get", repeat("GET", lambda c: f"/api/products/{c.product_id()}"), 200),
+    Scenario("products.update", update_product, 200),
+    Scenario("products.delete", delete_product, 200),
+    Scenario("products.image", image, 200),
+    Scenario("products.cache_stats", repeat("GET", lambda c: "/api/products/cache-stats"), 200),
+    # orders
+    Scenario("orders.health", repeat("GET", lambda c: "/api/orders/health"), 200),
+    Scenario("orders.create", create_order, 201),
+    Scenario("orders.batch", create_batch, 201),
+    Scenario("orders.batch_abort", abort_batch, 409),
+    Scenario("orders.status_bulk", bulk_status, 200),
+    Scenario("orders.export", repeat("GET", lambda c: f"/api/orders/export?farmer={c.farmer()}&format=csv",
+                                     make_headers=Context.admin), 200),
+    Scenario("orders.list", repeat("GET", lambda c: "/api/orders/?limit=50", make_headers=Context.admin), 200),
+    Scenario("orders.buyer", repeat("GET", lambda c: f"/api/orders/buyer/{c.buyer()}?limit=50"), 200),
+    Scenario("orders.farmer", repeat("GET", lambda c: f"/api/orders/farmer/{c.farmer()}?limit=50"), 200),
+    Scenario("orders.get", get_order, 200),
+    Scenario("orders.update", update_order, 200),
+    Scenario("orders.delete", delete_order, 200),
+    # analytics
+    Scenario("analytics.farmer", repeat("GET", lambda c: f"/api/analytics/farmer/{c.farmer()}"), 200),
+    Scenario("analytics.health", repeat("GET", lambda c: "/api/analytics/health"), 200),
+]
+
+
+def run_scenario(ctx, scenario, requests, warmup):
+    calls = scenario.prepare(ctx, warmup + requests)
+    samples, errors = [], 0
+    started = None
+    for i, (method, path, body, *headers) in enumerate(calls):
+        if i == warmup:
+            started = time.perf_counter()
+        t0 = time.perf_counter()
+        payload = {"data": body} if isinstance(body, bytes) else {"json": body}
+        response = ctx.client.open(path, method=method, headers=headers[0] if headers else None, **payload)
+        if response.mimetype == "text/event-stream":
+            # An event stream never ends on its own: time its first chunk, then hang up
+            next(response.response, None)
+            response.close()
+        else:
+            response.get_data()  # drain streaming responses
+        elapsed = (time.perf_counter() - t0) * 1000
+        if i >= warmup:
+            samples.append(elapsed)
+            errors += response.status_code != scenario.expect
+    total = time.perf_counter() - started if started else 0.0
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "throughput_rps": round(len(samples) / total, 1) if total else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+# Endpoints whose p95 or p99 grew by more than `tolerance` (and the noise floor), or that now error
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, now in results["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if now[key] > before[key] * (1 + tolerance) and now[key] - before[key] > NOISE_FLOOR_MS:
+                regressions.append(f"{name}: {key} {before[key]} -> {now[key]}")
+        if now["errors"] > before.get("errors", 0):
+            regressions.append(f"{name}: errors {before.get('errors', 0)} -> {now['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--in-process", action="store_true", help="use mongomock instead of a mongod")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--farmers", type=int, default=20)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", default=None, help="run endpoints whose name starts with this prefix")
+    parser.add_argument("--no-cache", action="store_true", help="disable the catalog response cache")
+    parser.add_argument("--output", default=None, help="write the results JSON here")
+    parser.add_argument("--baseline", default=None, help="compare with a results JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative p95/p99 growth")
+    args = parser.parse_args()
+
+    image_store = tempfile.mkdtemp(prefix="farm2home-bench-images-")
+    os.environ.update({
+        "MONGO_URI": args.uri,
+        "IMAGE_STORE_DIR": image_store,
+        "LOG_LEVEL": "WARNING",
+        "CATALOG_CACHE_ENABLED": "0" if args.no_cache else "1",
+        "CREATE_INDEXES_ON_STARTUP": "0" if args.in_process else "1",
+        "ADMIN_EMAILS": BENCH_ADMIN,
+    })
+    from app import create_app
+    app = create_app()
+    from models import mongo
+
+    if args.in_process:
+        mongo.use_client(connect(in_process=True).client)
+    db = mongo.db
+
+    scenarios = [s for s in SCENARIOS if not args.only or s.name.startswith(args.only)]
+    results = {
+        "meta": {"in_process": args.in_process, "seed": args.seed, "requests": args.requests,
+                 "orders": args.orders, "products": args.products, "python": platform.python_version()},
+        "endpoints": {},
+    }
+    try:
+        with app.app_context():
+            t0 = time.perf_counter()
+            data = seed_dataset(db, farmers=args.farmers, buyers=args.buyers, products=args.products,
+                                orders=args.orders, months=args.months, seed=args.seed)
+            print(f"seeded in {time.perf_counter() - t0:.1f} s | peak RSS {peak_rss_mb():.1f} MB")
+
+        ctx = Context(app, db, data, random.Random(args.seed))
+        print(f"{'endpoint':<22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'RSS MB':>8} errors")
+        for scenario in scenarios:
+            stats = run_scenario(ctx, scenario, args.requests, args.warmup)
+            results["endpoints"][scenario.name] = stats
+            print(f"{scenario.name:<22} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} "
+                  f"{stats['throughput_rps']:9.1f} {stats['peak_rss_mb']:8.1f} {stats['errors']}")
+    finally:
+        if not args.in_process:
+            mongo.cx.drop_database(db.name)
+        shutil.rmtree(image_store, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
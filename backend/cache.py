@@ -0,0 +1,204 @@
+from flask import request, g, current_app, Response
+from collections import OrderedDict, defaultdict, namedtuple
+from functools import wraps
+import hashlib
+import threading
+import time
+
+CacheEntry = namedtuple("CacheEntry", ["body", "headers", "etag", "expires", "tags"])
+
+# Response headers worth replaying from the cache (pagination tokens)
+REPLAYED_HEADERS = ("X-Next-Cursor", "Link")
+
+
+# In-process LRU + TTL cache of rendered responses, invalidated by tag. Invalidations reach this
+# process only; the TTL bounds how stale another worker's copy can get (see CATALOG_CACHE_TTL).
+class ResponseCache:
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024, ttl=5, enabled=True):
+        self.configure(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl, enabled=enabled)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags = defaultdict(set)
+        self._bytes = 0
+        # Bumped by every invalidation and clear(); a response rendered across one is not stored
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def configure(self, max_entries=None, max_bytes=None, ttl=None, enabled=None):
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if ttl is not None:
+            self.ttl = ttl
+        if enabled is not None:
+            self.enabled = enabled
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, body, headers, tags, generation=None):
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        entry = CacheEntry(body, headers, etag, time.monotonic() + self.ttl, frozenset(tags))
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            for tag in entry.tags:
+                self._tags[tag].add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    # Drop every cached response carrying any of the given tags
+    def invalidate(self, *tags):
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._tags.pop(tag, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+catalog_cache = ResponseCache()
+
+
+def init_app(app):
+    catalog_cache.configure(
+        max_entries=app.config["CATALOG_CACHE_MAX_ENTRIES"],
+        max_bytes=app.config["CATALOG_CACHE_MAX_BYTES"],
+        ttl=app.config["CATALOG_CACHE_TTL"],
+        enabled=app.config["CATALOG_CACHE_ENABLED"],
+    )
+
+
+# Tags used by the products blueprint
+def product_tag(product_id):
+    return f"product:{product_id}"
+
+
+def list_head_tag(farmer_email=None):
+    # First page of a listing: the only page a newly added product can land on
+    return f"list-head:farmer:{farmer_email}" if farmer_email else "list-head:all"
+
+
+# Search results are sorted by more than created_at, so any added, edited or restocked
+# product can land on any search page; those entries share one tag
+SEARCH_TAG = "search"
+
+
+def invalidate_products(*product_ids):
+    catalog_cache.invalidate(*(product_tag(pid) for pid in product_ids))
+
+
+def invalidate_new_product(farmer_email):
+    catalog_cache.invalidate(list_head_tag(), list_head_tag(farmer_email), SEARCH_TAG)
+
+
+def invalidate_search():
+    catalog_cache.invalidate(SEARCH_TAG)
+
+
+# Serve GET responses from catalog_cache; the view declares what it depends on via g.cache_tags.
+# Every response gets a strong ETag, so repeat clients revalidate with If-None-Match and get a 304.
+def cached_response(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not catalog_cache.enabled:
+            return view(*args, **kwargs)
+
+        key = _cache_key()
+        entry = catalog_cache.get(key)
+        if entry is not None:
+            return _replay(entry, "HIT")
+        generation = catalog_cache.generation
+        return _store(key, view(*args, **kwargs), generation)
+    return wrapper
+
+
+# cached_response for the asyncio serving mode's views (see aio.py); same cache, same keys
+def cached_response_async(view):
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        if not catalog_cache.enabled:
+            return await view(*args, **kwargs)
+
+        key = _cache_key()
+        entry = catalog_cache.get(key)
+        if entry is not None:
+            return _replay(entry, "HIT")
+        generation = catalog_cache.generation
+        return _store(key, await view(*args, **kwargs), generation)
+    return wrapper
+
+
+def _cache_key():
+    # Image URLs in the payload are absolute, so the host is part of the key
+    return request.host + request.full_path
+
+
+def _store(key, rv, generation):
+    response = current_app.make_response(rv)
+    if response.status_code != 200 or "cache_tags" not in g:
+        return response
+    headers = [(h, response.headers[h]) for h in REPLAYED_HEADERS if h in response.headers]
+    entry = catalog_cache.set(key, response.get_data(), headers, g.cache_tags, generation)
+    return _replay(entry, "MISS")
+
+
+def _replay(entry, state):
+    response = Response(entry.body, mimetype="application/json", headers=entry.headers)
+    response.set_etag(entry.etag)
+    response.cache_control.no_cache = True
+    response.headers["X-Cache"] = state
+    return response.make_conditional(request)
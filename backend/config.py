@@ -2,3 +2,136 @@ import os
 
 class Config:
     MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/farm2home")
+
+    # One lazily created, fork-safe MongoClient per process (see models.Mongo)
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 60000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", 20000))
+    MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+    MONGO_READ_CONCERN = os.environ.get("MONGO_READ_CONCERN") or None   # e.g. "majority"
+    MONGO_WRITE_CONCERN = os.environ.get("MONGO_WRITE_CONCERN") or None  # e.g. "majority" or "1"
+
+    # List endpoints return keyset pages of at most MAX_PAGE_SIZE documents
+    DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", 50))
+    MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 200))
+
+    # JSON encoder for responses: "orjson" (fast, C) or "flask" (stdlib json); both encode ObjectId and
+    # datetime themselves, so list endpoints send the projected documents as they come from Mongo
+    JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "orjson")
+
+    # Documents fetched per round-trip by the streaming export endpoints
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 500))
+
+    # POST /api/products/farmer/<email>/import: rows per unordered insert_many/bulk_write, error rows
+    # reported back, and limits on one line and on the whole upload (the body is read line by line)
+    IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+    IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", 100))
+    IMPORT_MAX_LINE_BYTES = int(os.environ.get("IMPORT_MAX_LINE_BYTES", 64 * 1024))
+    IMPORT_MAX_BYTES = int(os.environ.get("IMPORT_MAX_BYTES", 64 * 1024 * 1024))
+
+    # Order events go to the outbox collection with the order write and are processed (sales rollups, ...)
+    # by a drainer: a thread in each web worker when OUTBOX_WORKER_THREAD=1, else run `flask outbox-worker`.
+    # A claimed batch is redelivered after OUTBOX_LEASE_SECONDS; events are parked after OUTBOX_MAX_ATTEMPTS.
+    OUTBOX_WORKER_THREAD = os.environ.get("OUTBOX_WORKER_THREAD", "1") == "1"
+    OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 100))
+    OUTBOX_POLL_SECONDS = float(os.environ.get("OUTBOX_POLL_SECONDS", 1))
+    OUTBOX_LEASE_SECONDS = float(os.environ.get("OUTBOX_LEASE_SECONDS", 30))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 10))
+
+    # Threads per worker process for running a request's independent queries side by side
+    # (GET /api/farmer/<email>/dashboard); 0 runs them one after another
+    QUERY_POOL_THREADS = int(os.environ.get("QUERY_POOL_THREADS", 8))
+    QUERY_POOL_TIMEOUT = float(os.environ.get("QUERY_POOL_TIMEOUT", 10))
+    # Orders in the dashboard's first page (the rest via /api/orders/farmer/<email>?next=)
+    DASHBOARD_ORDERS_LIMIT = int(os.environ.get("DASHBOARD_ORDERS_LIMIT", 200))
+
+    # Upper bound on cart lines accepted by POST /api/orders/batch
+    MAX_BATCH_LINES = int(os.environ.get("MAX_BATCH_LINES", 100))
+    # Orders one PUT /api/orders/status/bulk call may change (a filter matching more reports "more")
+    MAX_BULK_STATUS_ORDERS = int(os.environ.get("MAX_BULK_STATUS_ORDERS", 500))
+
+    # Create indexes at startup; VERIFY_QUERY_PLANS=1 also explain()s every route query and fails on COLLSCAN
+    CREATE_INDEXES_ON_STARTUP = os.environ.get("CREATE_INDEXES_ON_STARTUP", "1") == "1"
+    VERIFY_QUERY_PLANS = os.environ.get("VERIFY_QUERY_PLANS", "0") == "1"
+
+    # In-process response cache for the products blueprint. Writes invalidate by tag, but only in the
+    # worker that handled them: other workers (and other hosts) keep serving their copy, and answering
+    # 304 to its ETag, for up to CATALOG_CACHE_TTL seconds. Keep the TTL short, or set
+    # CATALOG_CACHE_ENABLED=0 where every read must see the latest stock.
+    CATALOG_CACHE_ENABLED = os.environ.get("CATALOG_CACHE_ENABLED", "1") == "1"
+    CATALOG_CACHE_TTL = float(os.environ.get("CATALOG_CACHE_TTL", 5))
+    CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get("CATALOG_CACHE_MAX_ENTRIES", 1024))
+    CATALOG_CACHE_MAX_BYTES = int(os.environ.get("CATALOG_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+    # Per-worker cache of farmer/buyer profiles (profile saves write through; other workers' saves
+    # show up within PROFILE_CACHE_TTL). Unknown users are remembered for PROFILE_CACHE_NEGATIVE_TTL.
+    PROFILE_CACHE_ENABLED = os.environ.get("PROFILE_CACHE_ENABLED", "1") == "1"
+    PROFILE_CACHE_TTL = float(os.environ.get("PROFILE_CACHE_TTL", 300))
+    PROFILE_CACHE_NEGATIVE_TTL = float(os.environ.get("PROFILE_CACHE_NEGATIVE_TTL", 30))
+    PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get("PROFILE_CACHE_MAX_ENTRIES", 10000))
+
+    # Signed session tokens issued at login/signup; every worker verifies them with SECRET_KEY alone.
+    # REQUIRE_SESSION_TOKENS=1 rejects per-user requests that carry no token. The app refuses to start
+    # without SECRET_KEY unless it runs in debug or testing mode, which fall back to a development key.
+    SECRET_KEY = os.environ.get("SECRET_KEY", "")
+    SESSION_TOKEN_MAX_AGE = int(os.environ.get("SESSION_TOKEN_MAX_AGE", 12 * 60 * 60))
+    REQUIRE_SESSION_TOKENS = os.environ.get("REQUIRE_SESSION_TOKENS", "0") == "1"
+    # Comma-separated accounts allowed on the all-orders list and export; empty means nobody
+    ADMIN_EMAILS = frozenset(e.strip().lower() for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip())
+
+    # PBKDF2 hashing/checking runs on a process pool (per web worker); beyond MAX_PENDING jobs sign-ins get 503
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 10))
+
+    # Structured logs (LOG_FORMAT json or text); LOG_SAMPLE_RATE keeps that fraction of records below WARNING
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+    LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+
+    # Per-endpoint latency and Mongo command metrics, served at /api/metrics in Prometheus text format
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+    # /api/market-prices proxies data.gov.in's daily mandi prices; the key stays on the server
+    # (MARKET_PRICES_API_KEY is required: without one the endpoint answers 503).
+    # Answers are cached per filter set for MARKET_PRICES_TTL seconds and served stale (for up to
+    # MARKET_PRICES_STALE_TTL) while the upstream is failing, retried every MARKET_PRICES_RETRY_AFTER.
+    MARKET_PRICES_API_URL = os.environ.get(
+        "MARKET_PRICES_API_URL", "https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070"
+    )
+    MARKET_PRICES_API_KEY = os.environ.get("MARKET_PRICES_API_KEY", "")
+    MARKET_PRICES_TIMEOUT = float(os.environ.get("MARKET_PRICES_TIMEOUT", 5))
+    MARKET_PRICES_TTL = float(os.environ.get("MARKET_PRICES_TTL", 15 * 60))
+    MARKET_PRICES_STALE_TTL = float(os.environ.get("MARKET_PRICES_STALE_TTL", 24 * 60 * 60))
+    MARKET_PRICES_RETRY_AFTER = float(os.environ.get("MARKET_PRICES_RETRY_AFTER", 30))
+    MARKET_PRICES_CACHE_MAX_ENTRIES = int(os.environ.get("MARKET_PRICES_CACHE_MAX_ENTRIES", 512))
+    MARKET_PRICES_MAX_LIMIT = int(os.environ.get("MARKET_PRICES_MAX_LIMIT", 100))
+
+    # /api/products/stream (Server-Sent Events). Each open stream holds a serving thread for at most
+    # LIVE_STREAM_MAX_SECONDS before the browser reconnects, so on thread-per-request workers (gthread, and
+    # asgi.py's ASYNC_FALLBACK_THREADS pool) streams may only take LIVE_SERVING_THREADS - LIVE_RESERVED_THREADS
+    # threads per worker and the rest stay free for ordinary requests. LIVE_MAX_SUBSCRIBERS is the cap for
+    # greenlet workers (GUNICORN_WORKER_CLASS=gevent), where a stream costs no thread: run those when many
+    # clients watch stock. LIVE_CHANGE_STREAMS=0 never watches Mongo.
+    LIVE_CHANGE_STREAMS = os.environ.get("LIVE_CHANGE_STREAMS", "1") == "1"
+    LIVE_MAX_SUBSCRIBERS = int(os.environ.get("LIVE_MAX_SUBSCRIBERS", 64))
+    LIVE_SERVING_THREADS = (int(os.environ.get("GUNICORN_THREADS", 4))
+                            if os.environ.get("GUNICORN_WORKER_CLASS", "gthread") == "gthread" else 0)
+    LIVE_RESERVED_THREADS = int(os.environ.get("LIVE_RESERVED_THREADS", 2))
+    LIVE_QUEUE_SIZE = int(os.environ.get("LIVE_QUEUE_SIZE", 256))
+    LIVE_HISTORY_SIZE = int(os.environ.get("LIVE_HISTORY_SIZE", 1000))
+    LIVE_HEARTBEAT_SECONDS = float(os.environ.get("LIVE_HEARTBEAT_SECONDS", 15))
+    LIVE_STREAM_MAX_SECONDS = float(os.environ.get("LIVE_STREAM_MAX_SECONDS", 300))
+
+    # asyncio serving mode (asgi.py): threads serving the routes that have no async port
+    ASYNC_FALLBACK_THREADS = int(os.environ.get("ASYNC_FALLBACK_THREADS", 10))
+
+    # Content-addressed product image store (originals + fixed-size thumbnails)
+    IMAGE_STORE_DIR = os.environ.get(
+        "IMAGE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_store")
+    )
+    MAX_IMAGE_BYTES = int(os.environ.get("MAX_IMAGE_BYTES", 5 * 1024 * 1024))
@@ -0,0 +1,71 @@
+from flask import Response, current_app, stream_with_context
+import csv
+import datetime
+import io
+import json
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime")
+
+
+# Build the Mongo filter from ?farmer=&buyer=&status=&from=&to= (only the keys in `allowed`)
+def export_query(args, allowed):
+    query = {}
+    for param, field in (("farmer", "farmer_email"), ("buyer", "buyer_email"), ("status", "status")):
+        if param in allowed and args.get(param):
+            query[field] = args[param]
+
+    created_at = {}
+    if args.get("from"):
+        created_at["$gte"] = _parse_date(args["from"], "from")
+    if args.get("to"):
+        created_at["$lt"] = _parse_date(args["to"], "to")
+    if created_at:
+        query["created_at"] = created_at
+    return query
+
+
+def export_format(args):
+    fmt = (args.get("format") or "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+
+# Stream a cursor as NDJSON or CSV; memory stays flat however many documents match
+def stream_export(cursor, serialize, columns, fmt, filename):
+    cursor = cursor.batch_size(current_app.config.get("EXPORT_BATCH_SIZE", 500))
+
+    def ndjson_rows():
+        for doc in cursor:
+            yield json.dumps(serialize(doc), default=str) + "\n"
+
+    def csv_rows():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for doc in cursor:
+            writer.writerow(serialize(doc))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate():
+        try:
+            yield from (csv_rows() if fmt == "csv" else ndjson_rows())
+        finally:
+            cursor.close()
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return response
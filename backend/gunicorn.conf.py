@@ -0,0 +1,46 @@
+# Production server settings, all overridable from the environment:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# WEB_CONCURRENCY worker processes (default: 2 per core + 1), each running GUNICORN_THREADS threads
+# (gthread) or GUNICORN_WORKER_CONNECTIONS greenlets (GUNICORN_WORKER_CLASS=gevent, needs gevent).
+# A gthread worker keeps LIVE_RESERVED_THREADS threads away from /api/products/stream, so it holds at most
+# GUNICORN_THREADS - LIVE_RESERVED_THREADS live streams (503 + Retry-After beyond that); use gevent workers,
+# or a separate pool of them behind the proxy for /api/products/stream, to serve many live clients.
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+# Build the app (and bootstrap indexes) once in the master; workers share its memory copy-on-write
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+# Anything the master connected to (index bootstrap) must not be reused across fork:
+# drop the inherited Mongo client and password pool so each worker creates its own
+def post_fork(server, worker):
+    from models import mongo
+    from passwords import hasher
+    mongo.reset()
+    hasher.shutdown()
+
+
+# Connect and ping before taking traffic, so /api/health/ready reflects this worker; start its
+# outbox drainer unless a separate `flask outbox-worker` process does that job
+def post_worker_init(worker):
+    from models import mongo
+    from workers import worker_state
+    from outbox import outbox
+    worker_state.warm_up(mongo)
+    if outbox.in_process:
+        outbox.ensure_thread()  # drain events left over from before a restart
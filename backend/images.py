@@ -0,0 +1,176 @@
+from flask import current_app, url_for
+from logs import get_logger
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are skipped and the original is served instead
+    Image = None
+
+log = get_logger("images")
+
+# Fixed thumbnail widths served by GET /api/products/<id>/image?size=
+THUMBNAIL_SIZES = (128, 320, 640)
+ORIGINAL = "original"
+
+ALLOWED_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+
+DATA_URL_RE = re.compile(r"^data:(?P<mime>[\w/+.-]+);base64,(?P<data>.+)$", re.DOTALL)
+
+
+# Split a browser data URL (FileReader.readAsDataURL) into (mime, bytes)
+def decode_data_url(data_url):
+    match = DATA_URL_RE.match(data_url or "")
+    if not match:
+        raise ValueError("Image must be a base64 data URL")
+    mime = match.group("mime").lower()
+    if mime not in ALLOWED_TYPES:
+        raise ValueError(f"Unsupported image type: {mime}")
+    try:
+        raw = base64.b64decode(match.group("data"), validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError("Image data is not valid base64")
+    if not raw:
+        raise ValueError("Image is empty")
+    max_bytes = current_app.config.get("MAX_IMAGE_BYTES")
+    if max_bytes and len(raw) > max_bytes:
+        raise ValueError(f"Image is larger than {max_bytes} bytes")
+    return mime, raw
+
+
+def _store_root():
+    return current_app.config["IMAGE_STORE_DIR"]
+
+
+# Content-addressed layout: <root>/<aa>/<sha256>/original | <width>.jpg
+def _blob_dir(image_id):
+    if not re.fullmatch(r"[0-9a-f]{64}", image_id or ""):
+        raise ValueError("Invalid image id")
+    return os.path.join(_store_root(), image_id[:2], image_id)
+
+
+def _blob_path(image_id, size):
+    name = ORIGINAL if size == ORIGINAL else f"{size}.jpg"
+    return os.path.join(_blob_dir(image_id), name)
+
+
+# Write via a temp file + rename so concurrent uploads of the same image never see a partial file
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _make_thumbnail(raw, width):
+    with Image.open(io.BytesIO(raw)) as img:
+        img.thumbnail((width, width))
+        if img.mode not in ("RGB", "L"):
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            rgba = img.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            img = background
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=82, optimize=True)
+        return out.getvalue()
+
+
+# Store an uploaded data URL once by content hash; returns the reference kept on the product
+def store_image(data_url):
+    mime, raw = decode_data_url(data_url)
+    image_id = hashlib.sha256(raw).hexdigest()
+
+    original_path = _blob_path(image_id, ORIGINAL)
+    if not os.path.exists(original_path):
+        _write_atomic(original_path, raw)
+
+    if Image is not None:
+        for width in THUMBNAIL_SIZES:
+            thumb_path = _blob_path(image_id, width)
+            if os.path.exists(thumb_path):
+                continue
+            try:
+                _write_atomic(thumb_path, _make_thumbnail(raw, width))
+            except Exception as e:
+                log.warning("Could not build thumbnail", extra={"image_id": image_id, "width": width, "error": str(e)})
+                break
+
+    return {"image_id": image_id, "image_type": mime}
+
+
+# Parse ?size= into ORIGINAL or one of THUMBNAIL_SIZES
+def parse_size(value):
+    if value in (None, "", ORIGINAL):
+        return ORIGINAL
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError("size must be an integer")
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f"size must be one of {', '.join(map(str, THUMBNAIL_SIZES))}")
+    return size
+
+
+# Resolve a stored image to (path, mimetype, size served); falls back to the original when a thumbnail is missing
+def open_image(image_id, image_type, size):
+    if size != ORIGINAL:
+        thumb_path = _blob_path(image_id, size)
+        if os.path.exists(thumb_path):
+            return thumb_path, "image/jpeg", size
+    original_path = _blob_path(image_id, ORIGINAL)
+    if not os.path.exists(original_path):
+        return None, None, None
+    return original_path, image_type or "application/octet-stream", ORIGINAL
+
+
+# Absolute URL for a product image; the content hash in ?v= makes the URL immutable
+def image_url(product_id, image_id, size=None):
+    if not image_id:
+        return None
+    params = {"product_id": str(product_id), "v": image_id[:16]}
+    if size:
+        params["size"] = size
+    return url_for("products.get_product_image", _external=True, **params)
+
+
+# image_url for a whole page of products: one url_for, then plain string joins per product
+# (ObjectIds and hex content hashes never need escaping)
+def image_url_builder():
+    template = url_for("products.get_product_image", _external=True, product_id="__id__", v="__v__")
+    head, rest = template.split("__id__", 1)
+    middle, tail = rest.split("__v__", 1)
+
+    def build(product_id, image_id):
+        return f"{head}{product_id}{middle}{image_id[:16]}{tail}" if image_id else None
+    return build
+
+
+# Move legacy inline data-URL images out of product documents into the store
+def migrate_inline_images(products):
+    moved = failed = 0
+    for product in products.find({"image": {"$type": "string"}}, {"image": 1}):
+        try:
+            ref = store_image(product["image"])
+        except ValueError as e:
+            log.warning("Skipping product image", extra={"product_id": str(product["_id"]), "error": str(e)})
+            failed += 1
+            continue
+        products.update_one(
+            {"_id": product["_id"]},
+            {"$set": ref, "$unset": {"image": ""}}
+        )
+        moved += 1
+    return moved, failed
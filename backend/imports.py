@@ -0,0 +1,250 @@
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from search import name_prefixes
+from inventory import stock_status, DUPLICATE_KEY
+import csv
+import datetime
+import json
+import math
+
+IMPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "application/jsonl", "application/json"),
+    "csv": ("text/csv", "application/csv"),
+}
+IMPORT_MODES = ("insert", "upsert")
+
+
+# ?format= wins; otherwise the upload's Content-Type decides
+def import_format(args, mimetype):
+    fmt = (args.get("format") or "").lower()
+    if not fmt:
+        fmt = next((name for name, types in IMPORT_FORMATS.items() if mimetype in types), "")
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(IMPORT_FORMATS)} (or send a matching Content-Type)")
+    return fmt
+
+
+def import_mode(args):
+    mode = (args.get("mode") or "insert").lower()
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"mode must be one of {', '.join(IMPORT_MODES)}")
+    return mode
+
+
+class RowError(ValueError):
+    pass
+
+
+# Decoded lines of the upload, read one at a time. A line longer than max_line is skipped (and
+# reported) rather than buffered, and reading stops after max_bytes.
+def _lines(stream, max_line, max_bytes, errors):
+    read, number = 0, 0
+    while True:
+        raw = stream.readline(max_line + 1)
+        if not raw:
+            return
+        number += 1
+        read += len(raw)
+        if read > max_bytes:
+            errors.append((None, f"Upload exceeds {max_bytes} bytes; the remaining rows were not read"))
+            return
+        if len(raw) > max_line and not raw.endswith(b"\n"):
+            errors.append((number, f"Row is longer than {max_line} bytes"))
+            while raw and not raw.endswith(b"\n"):  # drain the rest of the oversized line
+                raw = stream.readline(max_line + 1)
+                read += len(raw)
+            yield number, "\n"
+            continue
+        try:
+            line = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            errors.append((number, "Row is not valid UTF-8"))
+            line = "\n"
+        yield number, line.lstrip("\ufeff") if number == 1 else line
+
+
+# (line, record or None) per data row; records that cannot be parsed are reported as errors
+def read_records(stream, fmt, max_line, max_bytes, errors):
+    lines = _lines(stream, max_line, max_bytes, errors)
+    if fmt == "ndjson":
+        for number, line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                errors.append((number, "Row is not valid JSON"))
+                continue
+            if not isinstance(record, dict):
+                errors.append((number, "Row must be a JSON object"))
+                continue
+            yield number, record
+        return
+
+    # csv.reader pulls further lines itself for quoted fields that span lines
+    numbers = []
+    def text():
+        for number, line in lines:
+            numbers.append(number)
+            yield line
+    reader = csv.reader(text())
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [c.strip().lower() for c in header]
+    if "name" not in columns:
+        raise ValueError("CSV header must include a name column")
+    for values in reader:
+        number = numbers[-1] if numbers else None
+        del numbers[:-1]
+        if not any(v.strip() for v in values):
+            continue
+        if len(values) > len(columns):
+            errors.append((number, f"Row has {len(values)} fields, the header has {len(columns)}"))
+            continue
+        yield number, dict(zip(columns, values))
+
+
+# Validate one record into a product document (same shape add_product writes)
+def parse_product_row(record, farmer_email, farmer_name):
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise RowError("name is required")
+    try:
+        price = float(record.get("price"))
+    except (TypeError, ValueError):
+        raise RowError("price must be a number")
+    if not math.isfinite(price) or price <= 0:
+        raise RowError("price must be greater than 0")
+    try:
+        quantity = float(record.get("quantity"))
+    except (TypeError, ValueError):
+        raise RowError("quantity must be a whole number")
+    if not quantity.is_integer() or quantity < 0:
+        raise RowError("quantity must be a whole number, 0 or more")
+    row_email = str(record.get("farmer_email") or "").strip()
+    if row_email and row_email != farmer_email:
+        raise RowError("farmer_email does not match the farmer importing")
+    return {
+        "name": name,
+        "price": price,
+        "quantity": int(quantity),
+        "farmer_email": farmer_email,
+        "farmer_name": str(record.get("farmer_name") or "").strip() or farmer_name,
+        "name_prefixes": name_prefixes(name),
+        "stock_status": stock_status(int(quantity)),
+    }
+
+
+# Writes validated rows in unordered batches: insert_many, or upserts keyed on (farmer_email, name).
+# Only one batch is held at a time, so memory is bounded by batch_size whatever the upload size.
+class ProductImport:
+    def __init__(self, collection, mode, batch_size=500, max_errors=100):
+        self.collection = collection
+        self.mode = mode
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.rows = self.inserted = self.updated = self.failed = 0
+        self.errors = []
+        self.errors_truncated = False
+        # The upload went past max_bytes: rows after the limit were never read
+        self.truncated = False
+        self._batch, self._lines = [], []
+
+    def fail(self, line, message):
+        self.failed += line is not None
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": message})
+        else:
+            self.errors_truncated = True
+
+    def truncate(self, message):
+        self.truncated = True
+        self.fail(None, message)
+
+    def add(self, line, product):
+        self._batch.append(product)
+        self._lines.append(line)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        batch, lines = self._batch, self._lines
+        self._batch, self._lines = [], []
+        now = datetime.datetime.utcnow()
+        try:
+            if self.mode == "insert":
+                for product in batch:
+                    product["created_at"] = now
+                result = self.collection.insert_many(batch, ordered=False)
+                self.inserted += len(result.inserted_ids)
+            else:
+                result = self.collection.bulk_write([self._upsert(product, now) for product in batch], ordered=False)
+                self.inserted += result.upserted_count
+                self.updated += result.matched_count
+        except BulkWriteError as e:
+            # Unordered: every other row in the batch was still written
+            details = e.details
+            self.inserted += details.get("nInserted", 0) + details.get("nUpserted", 0)
+            self.updated += details.get("nMatched", 0)
+            for error in details.get("writeErrors", []):
+                if error.get("code") == DUPLICATE_KEY:
+                    message = "This farmer already has a product with this name (import with ?mode=upsert to update it)"
+                else:
+                    message = error.get("errmsg", "Write failed")
+                self.fail(lines[error["index"]], message)
+
+    @staticmethod
+    def _upsert(product, now):
+        key = {"farmer_email": product["farmer_email"], "name": product["name"]}
+        fields = {k: v for k, v in product.items() if k not in key}
+        return UpdateOne(key, {"$set": fields, "$setOnInsert": {"created_at": now}}, upsert=True)
+
+    def run(self, records, farmer_email, farmer_name):
+        for line, record in records:
+            self.rows += 1
+            try:
+                self.add(line, parse_product_row(record, farmer_email, farmer_name))
+            except RowError as e:
+                self.fail(line, str(e))
+        self.flush()
+
+    def summary(self):
+        return {
+            "mode": self.mode,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+            "truncated": self.truncated,
+        }
+
+
+# Stream `stream` (the raw request body) into products; returns the import summary
+def import_products(collection, stream, fmt, mode, farmer_email, farmer_name=None, batch_size=500,
+                    max_errors=100, max_line=64 * 1024, max_bytes=64 * 1024 * 1024):
+    job = ProductImport(collection, mode, batch_size, max_errors)
+    read_errors = []
+
+    # Read errors carry a line number, except the one saying the upload was cut off at max_bytes
+    def report(line, message):
+        if line is None:
+            job.truncate(message)
+        else:
+            job.rows += 1
+            job.fail(line, message)
+
+    def records():
+        for line, record in read_records(stream, fmt, max_line, max_bytes, read_errors):
+            while read_errors:
+                report(*read_errors.pop(0))
+            yield line, record
+        for line, message in read_errors:
+            report(line, message)
+
+    job.run(records(), farmer_email, farmer_name)
+    return job.summary()
@@ -0,0 +1,176 @@
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from logs import get_logger
+import datetime
+
+log = get_logger("indexes")
+
+# Keyset pages sort on (created_at, _id) newest first, see pagination.KEYSET_SORT
+NEWEST_FIRST = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# Every index the routes rely on, per collection (create_indexes is a no-op for existing ones)
+INDEXES = {
+    "products": [
+        IndexModel(NEWEST_FIRST, name="created_at_id"),
+        IndexModel([("farmer_email", ASCENDING)] + NEWEST_FIRST, name="farmer_created_at_id"),
+        # GET /api/products/search: prefix autocomplete, whole-word text search and price sorts
+        IndexModel([("name_prefixes", ASCENDING)] + NEWEST_FIRST, name="name_prefixes_created_at_id"),
+        IndexModel([("name", TEXT)], name="name_text"),
+        IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_id"),
+        # A farmer lists each product name once; upserting imports match on (farmer_email, name)
+        IndexModel([("farmer_email", ASCENDING), ("name", ASCENDING)], name="farmer_email_name", unique=True),
+        # GET /api/products/low-stock, and per-farmer status counts for the inventory summary
+        IndexModel([("stock_status", ASCENDING)] + NEWEST_FIRST, name="stock_status_created_at_id"),
+        IndexModel([("farmer_email", ASCENDING), ("stock_status", ASCENDING)] + NEWEST_FIRST,
+                   name="farmer_stock_status_created_at_id"),
+    ],
+    "orders": [
+        IndexModel(NEWEST_FIRST, name="created_at_id"),
+        IndexModel([("farmer_email", ASCENDING)] + NEWEST_FIRST, name="farmer_created_at_id"),
+        IndexModel([("buyer_email", ASCENDING)] + NEWEST_FIRST, name="buyer_created_at_id"),
+    ],
+    "sales_rollups": [
+        IndexModel([("farmer_email", ASCENDING)], name="farmer"),
+    ],
+    "rollup_events": [
+        # Markers only need to outlive redelivery of their (long since processed) outbox events
+        IndexModel([("applied_at", ASCENDING)], name="applied_at_ttl", expireAfterSeconds=7 * 24 * 60 * 60),
+    ],
+    "outbox": [
+        # Claiming due events in order, the backlog gauge, finding a worker's lease
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING), ("_id", ASCENDING)], name="status_available_id"),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="status_id"),
+        IndexModel([("lease", ASCENDING)], name="lease", sparse=True),
+        # Processed events are kept a week for inspection
+        IndexModel([("processed_at", ASCENDING)], name="processed_at_ttl", expireAfterSeconds=7 * 24 * 60 * 60),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING), ("role", ASCENDING)], name="email_role", unique=True),
+    ],
+}
+
+SAMPLE_EMAIL = "explain@example.com"
+
+# The query shape behind each route: (label, collection, filter, sort)
+ROUTE_QUERIES = [
+    ("GET /api/products", "products", {}, NEWEST_FIRST),
+    ("GET /api/products/farmer/<email>", "products", {"farmer_email": SAMPLE_EMAIL}, NEWEST_FIRST),
+    ("GET /api/products/search?q=", "products", {"name_prefixes": "tom"}, NEWEST_FIRST),
+    ("GET /api/products/search?match=text", "products", {"$text": {"$search": "tomato"}}, None),
+    ("GET /api/products/search?sort=price_asc", "products", {"price": {"$gte": 10}},
+     [("price", ASCENDING), ("_id", ASCENDING)]),
+    ("POST /api/products/farmer/<email>/import?mode=upsert", "products",
+     {"farmer_email": SAMPLE_EMAIL, "name": "Tomato"}, None),
+    ("GET /api/products/low-stock", "products", {"stock_status": {"$in": ["out", "low"]}}, NEWEST_FIRST),
+    ("GET /api/products/low-stock?farmer=", "products", {"farmer_email": SAMPLE_EMAIL, "stock_status": "low"},
+     NEWEST_FIRST),
+    ("GET /api/orders", "orders", {}, NEWEST_FIRST),
+    ("GET /api/orders/buyer/<email>", "orders", {"buyer_email": SAMPLE_EMAIL}, NEWEST_FIRST),
+    ("GET /api/orders/farmer/<email>", "orders", {"farmer_email": SAMPLE_EMAIL}, NEWEST_FIRST),
+    ("PUT /api/orders/status/bulk (filter)", "orders",
+     {"farmer_email": SAMPLE_EMAIL, "status": {"$in": ["confirmed", None]}}, [("created_at", ASCENDING),
+                                                                             ("_id", ASCENDING)]),
+    ("GET /api/analytics/farmer/<email> (rollups)", "sales_rollups", {"farmer_email": SAMPLE_EMAIL}, None),
+    ("GET /api/analytics/farmer/<email> (last 7 days)", "orders",
+     {"farmer_email": SAMPLE_EMAIL, "created_at": {"$gt": datetime.datetime(2000, 1, 1)}}, None),
+    ("GET /api/analytics/farmer/<email> (products)", "products", {"farmer_email": SAMPLE_EMAIL}, None),
+    ("outbox worker (claim)", "outbox",
+     {"status": "pending", "available_at": {"$lte": datetime.datetime(2000, 1, 1)}}, [("available_at", ASCENDING),
+                                                                                      ("_id", ASCENDING)]),
+    ("GET /api/metrics (outbox backlog)", "outbox", {"status": "pending"}, [("_id", ASCENDING)]),
+    ("POST /api/auth/login", "users", {"email": SAMPLE_EMAIL, "role": "buyer"}, None),
+    ("GET /api/buyer/<email>", "users", {"email": SAMPLE_EMAIL, "role": "buyer"}, None),
+    ("GET /api/farmer/<email>", "users", {"email": SAMPLE_EMAIL, "role": "farmer"}, None),
+]
+
+
+class CollectionScanError(RuntimeError):
+    pass
+
+
+# Documents sharing a unique index's key, as [{_id: {field: value}, count}] (at most `sample` of them)
+def find_duplicates(db, collection, model, sample=5):
+    fields = list(model.document["key"])
+    pipeline = [
+        {"$group": {"_id": {field: f"${field}" for field in fields}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": sample},
+    ]
+    return list(db[collection].aggregate(pipeline, allowDiskUse=True))
+
+
+# Unique indexes not built yet are checked for duplicates first: an index the stored documents
+# would violate is reported and left out (the collection's other indexes are still created), and
+# a non-unique index of the same name from an earlier release is replaced
+def _buildable(db, collection, models):
+    existing = db[collection].index_information()
+    buildable = []
+    for model in models:
+        name = model.document["name"]
+        info = existing.get(name)
+        if model.document.get("unique") and not (info and info.get("unique")):
+            duplicates = find_duplicates(db, collection, model)
+            if duplicates:
+                log.error("Duplicate documents block a unique index; merge or rename them and rerun check-indexes",
+                          extra={"collection": collection, "index": name,
+                                 "duplicates": [{**d["_id"], "count": d["count"]} for d in duplicates]})
+                continue
+            if info:
+                db[collection].drop_index(name)
+        buildable.append(model)
+    return buildable
+
+
+# Idempotently create all declared indexes; returns {collection: [index names]}
+def ensure_indexes(db):
+    created = {}
+    for collection, models in INDEXES.items():
+        try:
+            models = _buildable(db, collection, models)
+            created[collection] = db[collection].create_indexes(models) if models else []
+        except OperationFailure as e:
+            # e.g. duplicates stored while this ran; keep serving but say so loudly
+            log.error("Could not create indexes", extra={"collection": collection, "error": str(e)})
+    return created
+
+
+# Declared indexes the database does not have (or has without their unique constraint), as
+# ["collection.index"]
+def missing_indexes(db):
+    missing = []
+    for collection, models in INDEXES.items():
+        existing = db[collection].index_information()
+        for model in models:
+            info = existing.get(model.document["name"])
+            if info is None or (model.document.get("unique") and not info.get("unique")):
+                missing.append(f"{collection}.{model.document['name']}")
+    return missing
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+# explain() every route query and raise CollectionScanError if any winning plan is a COLLSCAN
+def verify_query_plans(db):
+    offenders = []
+    for label, collection, query, sort in ROUTE_QUERIES:
+        cursor = db[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = set(_plan_stages(winning_plan))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        log.info("Query plan", extra={"route": label, "status": status, "stages": sorted(stages)})
+        if status == "COLLSCAN":
+            offenders.append(label)
+
+    if offenders:
+        raise CollectionScanError(f"Collection scans in: {'; '.join(offenders)}")
@@ -0,0 +1,194 @@
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+import datetime
+
+# Every product carries a stock_status derived from its quantity, written by the same update that
+# changes the quantity; per-farmer totals live in INVENTORY, one document per farmer:
+#   {_id: farmer_email, farmer_email, products: <listed>, stock: <sum of quantities>, version, rebuilt_at}
+# Writers $inc the totals (and the version) in the transaction that changes the products. A farmer
+# without a built summary gets one from the products collection on first read (see read_inventory).
+INVENTORY = "inventory"
+DUPLICATE_KEY = 11000
+# How many times rebuild_inventory recounts a farmer whose summary keeps changing under it
+REBUILD_ATTEMPTS = 5
+LOW_STOCK_THRESHOLD = 5
+STOCK_STATUSES = ("out", "low", "good")
+STOCK_LABELS = {"out": "Out of Stock", "low": "Low Stock", "good": "Good Stock"}
+# What GET /api/products/low-stock lists unless ?status= says otherwise
+ALERT_STATUSES = ("out", "low")
+
+
+def stock_status(quantity):
+    if quantity <= 0:
+        return "out"
+    if quantity <= LOW_STOCK_THRESHOLD:
+        return "low"
+    return "good"
+
+
+# ?status=low,out -> ("low", "out"); ALERT_STATUSES when absent
+def parse_statuses(value):
+    if not value:
+        return ALERT_STATUSES
+    statuses = tuple(dict.fromkeys(s.strip() for s in value.split(",") if s.strip()))
+    if not statuses or any(s not in STOCK_STATUSES for s in statuses):
+        raise ValueError(f"status must be a comma-separated subset of {', '.join(STOCK_STATUSES)}")
+    return statuses
+
+
+# stock_status as an aggregation expression over the document's (already updated) quantity
+STATUS_EXPRESSION = {"$switch": {
+    "branches": [
+        {"case": {"$lte": ["$quantity", 0]}, "then": "out"},
+        {"case": {"$lte": ["$quantity", LOW_STOCK_THRESHOLD]}, "then": "low"},
+    ],
+    "default": "good",
+}}
+
+
+# Pipeline update adding `delta` to a product's quantity and re-deriving its stock_status in the
+# same single-document write, so the two never disagree
+def adjust_stock(delta):
+    return [{"$set": {"quantity": {"$add": ["$quantity", delta]}}}, {"$set": {"stock_status": STATUS_EXPRESSION}}]
+
+
+# Re-derive stock_status after a bulk $inc (a bulk_write has no per-document results to go by)
+def refresh_stock_status(collection, product_ids, session=None):
+    if product_ids:
+        collection.update_many({"_id": {"$in": list(product_ids)}}, [{"$set": {"stock_status": STATUS_EXPRESSION}}],
+                               session=session)
+
+
+# Apply {farmer_email: (products delta, stock delta)} to the summaries. Summaries that were never
+# built are left alone: their first read builds them from the products, this write included. The
+# version bump tells a rebuild in flight that its count is already out of date.
+def apply_inventory(db, changes, session=None):
+    now = datetime.datetime.utcnow()
+    requests = [
+        UpdateOne({"_id": farmer_email},
+                  {"$inc": {"products": products, "stock": stock, "version": 1}, "$set": {"updated_at": now}})
+        for farmer_email, (products, stock) in changes.items() if products or stock
+    ]
+    if requests:
+        db[INVENTORY].bulk_write(requests, ordered=False, session=session)
+
+
+def _totals_pipeline(scope):
+    return [{"$match": scope},
+            {"$group": {"_id": "$farmer_email", "products": {"$sum": 1}, "stock": {"$sum": "$quantity"}}}]
+
+
+# A summary counts once a rebuild has written it; a placeholder only carries the $incs since
+def is_built(summary):
+    return summary is not None and "rebuilt_at" in summary
+
+
+# Backfill / rebuild: stock_status on every product, then the per-farmer totals. Each summary is
+# replaced in place, and only if its version is the one read before the recount: an $inc landing in
+# between bumps it, and that farmer is counted again. Without transactions a product write and its
+# $inc are separate writes, so a recount falling between the two still counts that write twice;
+# check-inventory reports such drift.
+def rebuild_inventory(db, farmer_email=None, attempts=REBUILD_ATTEMPTS, batch_size=1000):
+    scope = {"farmer_email": farmer_email} if farmer_email else {}
+    ranges = {
+        "out": {"$lte": 0},
+        "low": {"$gt": 0, "$lte": LOW_STOCK_THRESHOLD},
+        "good": {"$gt": LOW_STOCK_THRESHOLD},
+    }
+    for status, quantity in ranges.items():
+        db.products.update_many({**scope, "quantity": quantity, "stock_status": {"$ne": status}},
+                                {"$set": {"stock_status": status}})
+
+    if farmer_email:
+        pending = [farmer_email]
+    else:
+        # Farmers whose products are all gone keep a zeroed summary, as stale rollups do
+        pending = sorted(e for e in set(db.products.distinct("farmer_email")) | set(db[INVENTORY].distinct("_id")) if e)
+    rebuilt = 0
+    for _ in range(attempts):
+        if not pending:
+            break
+        conflicts = []
+        for start in range(0, len(pending), batch_size):
+            conflicts += _rebuild_batch(db, pending[start:start + batch_size])
+        rebuilt += len(pending) - len(conflicts)
+        pending = conflicts
+    return rebuilt
+
+
+# One recount of `emails`; returns those whose summary changed under it
+def _rebuild_batch(db, emails):
+    # Placeholders first, so writes made during the recount have a version to bump
+    placeholders = [UpdateOne({"_id": email}, {"$setOnInsert": {"farmer_email": email, "products": 0, "stock": 0,
+                                                                "version": 0}}, upsert=True) for email in emails]
+    try:
+        db[INVENTORY].bulk_write(placeholders, ordered=False)
+    except BulkWriteError as e:
+        # Two first reads racing to create the same placeholder: either one will do
+        if any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+            raise
+    versions = {doc["_id"]: doc.get("version", 0)
+                for doc in db[INVENTORY].find({"_id": {"$in": emails}}, {"version": 1})}
+    totals = {row["_id"]: row for row in
+              db.products.aggregate(_totals_pipeline({"farmer_email": {"$in": emails}}), allowDiskUse=True)}
+    rebuilt_at = datetime.datetime.utcnow()
+    requests = []
+    for email in emails:
+        row = totals.get(email, {"products": 0, "stock": 0})
+        version = versions.get(email, 0)
+        doc = {"_id": email, "farmer_email": email, "products": row["products"], "stock": row["stock"],
+               "version": version + 1, "rebuilt_at": rebuilt_at}
+        # A version that moved on makes the upsert collide with the existing _id: recount that farmer
+        requests.append(ReplaceOne({"_id": email, "version": version}, doc, upsert=True))
+    try:
+        db[INVENTORY].bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+        return [emails[error["index"]] for error in errors]
+    return []
+
+
+# Compare stored summaries with a recomputation; returns a list of human-readable mismatches
+def check_inventory(db, farmer_email=None):
+    scope = {"farmer_email": farmer_email} if farmer_email else {}
+    mismatches = [f"{p['_id']}: stock_status {p.get('stock_status')!r} for quantity {p['quantity']}"
+                  for p in db.products.find(scope, {"quantity": 1, "stock_status": 1})
+                  if p.get("stock_status") != stock_status(p["quantity"])]
+    expected = {row["_id"]: row for row in db.products.aggregate(_totals_pipeline(scope), allowDiskUse=True)}
+    stored = {doc["_id"]: doc for doc in db[INVENTORY].find({"_id": farmer_email} if farmer_email else {})}
+    for email in sorted(set(expected) & set(stored)):
+        want, have = expected[email], stored[email]
+        if (want["products"], want["stock"]) != (have["products"], have["stock"]):
+            mismatches.append(f"{email}: stored products={have['products']} stock={have['stock']}, "
+                              f"expected products={want['products']} stock={want['stock']}")
+    return mismatches
+
+
+def status_pipeline(farmer_email):
+    return [{"$match": {"farmer_email": farmer_email}}, {"$group": {"_id": "$stock_status", "products": {"$sum": 1}}}]
+
+
+# {products, stock, statuses: {out, low, good}} from a summary document and the status counts
+def summarize_inventory(summary, status_rows):
+    statuses = {status: 0 for status in STOCK_STATUSES}
+    for row in status_rows:
+        if row["_id"] in statuses:
+            statuses[row["_id"]] = row["products"]
+    summary = summary or {}
+    return {"products": summary.get("products", 0), "stock": summary.get("stock", 0), "statuses": statuses}
+
+
+# One farmer's inventory: the summary document plus per-status counts off the
+# (farmer_email, stock_status) index
+def read_inventory(db, farmer_email):
+    summary = db[INVENTORY].find_one({"_id": farmer_email})
+    if not is_built(summary) and db.products.find_one({"farmer_email": farmer_email}, {"_id": 1}):
+        # First visit since the backfill: build this farmer's summary once
+        rebuild_inventory(db, farmer_email)
+        summary = db[INVENTORY].find_one({"_id": farmer_email})
+        if not is_built(summary):
+            # Still racing writers after every attempt: answer from the products this time
+            summary = next(db.products.aggregate(_totals_pipeline({"farmer_email": farmer_email})), None)
+    return summarize_inventory(summary, db.products.aggregate(status_pipeline(farmer_email)))
@@ -0,0 +1,56 @@
+from flask.json.provider import DefaultJSONProvider
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+import datetime
+import orjson
+
+
+# Flask's provider, taught the Mongo types: ObjectId as its hex string, datetimes as ISO 8601
+# (Flask's own default would write HTTP dates), so routes can jsonify documents as fetched.
+class MongoJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        if isinstance(o, (datetime.datetime, datetime.date)):
+            return o.isoformat()
+        if isinstance(o, Decimal128):
+            return str(o.to_decimal())
+        return DefaultJSONProvider.default(o)
+
+
+# Same output through orjson: datetimes, dataclasses and UUIDs are encoded in C and the response
+# body is built as bytes without an intermediate str. NaN/Infinity become null.
+class OrjsonProvider(MongoJSONProvider):
+    def _option(self, sort_keys):
+        return orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get("indent"):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._option(kwargs.get("sort_keys", self.sort_keys))).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(obj)  # pretty-printed, as Flask does in debug mode
+        body = orjson.dumps(obj, default=self.default, option=self._option(self.sort_keys))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {"orjson": OrjsonProvider, "flask": MongoJSONProvider}
+
+
+# Install the provider named by JSON_PROVIDER on the app (before any request is served)
+def init_app(app):
+    name = app.config["JSON_PROVIDER"]
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(JSON_PROVIDERS)}")
+    app.json = JSON_PROVIDERS[name](app)
+    # Keep response fields in the order the serializers build them
+    app.json.sort_keys = False
@@ -0,0 +1,287 @@
+from pymongo.errors import PyMongoError, OperationFailure
+from models import mongo, supports_transactions
+from logs import get_logger
+from collections import deque
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+
+log = get_logger("live")
+
+# Product changes the stream carries: new stock/price values and deletions. Values are absolute,
+# so a client that sees an event twice (e.g. across a watcher restart) ends in the same state.
+WATCH_PIPELINE = [{"$match": {"$or": [
+    {"operationType": {"$in": ["delete", "replace"]}},
+    {"operationType": "update", "$or": [
+        {"updateDescription.updatedFields.quantity": {"$exists": True}},
+        {"updateDescription.updatedFields.price": {"$exists": True}},
+    ]},
+]}}]
+LIVE_FIELDS = ("quantity", "price")
+
+
+class StreamsBusy(RuntimeError):
+    pass
+
+
+def stock_event(product_id, fields):
+    return {"type": "stock", "product_id": str(product_id),
+            **{k: fields[k] for k in LIVE_FIELDS if fields.get(k) is not None}}
+
+
+def deleted_event(product_id):
+    return {"type": "deleted", "product_id": str(product_id)}
+
+
+# Translate one products change-stream document into a stream event
+def change_event(change):
+    product_id = change["documentKey"]["_id"]
+    if change["operationType"] == "delete":
+        return deleted_event(product_id)
+    if change["operationType"] == "replace":
+        return stock_event(product_id, change.get("fullDocument") or {})
+    return stock_event(product_id, change["updateDescription"]["updatedFields"])
+
+
+class Subscription:
+    def __init__(self, hub, product_ids, size):
+        self.hub = hub
+        self.product_ids = product_ids
+        self.queue = queue.Queue(maxsize=size)
+        self.lagged = False
+
+    # ?ids= narrows the product-scoped events only: events without a product_id ("reset") concern
+    # every subscriber
+    def offer(self, event):
+        product_id = event.get("product_id")
+        if self.product_ids is not None and product_id is not None and product_id not in self.product_ids:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A client that cannot keep up gets one "reset" (refetch) instead of an unbounded backlog
+            self.lagged = True
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+# Per-process fan-out of product changes to Server-Sent Event streams.
+#
+# On a replica set (or sharded cluster) a watcher thread follows a change stream on products, so
+# every worker sees every write, whichever worker or tool made it. On a standalone mongod the
+# write routes publish their own changes in-process instead: subscribers only hear about writes
+# handled by the same worker, so run one worker, or a replica set, to get complete streams.
+class StockEvents:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._pid = None
+        self._watcher = None
+        self.mode = "local"
+        self.change_streams = True
+        self.max_subscribers, self.queue_size, self.history_size = 64, 256, 1000
+        self.subscriber_limit = self.max_subscribers
+        self.heartbeat, self.max_seconds = 15.0, 300.0
+        self.reserved_threads = 2
+        self._reset()
+
+    def init_app(self, app):
+        config = app.config
+        self.change_streams = config["LIVE_CHANGE_STREAMS"]
+        self.max_subscribers = self.subscriber_limit = config["LIVE_MAX_SUBSCRIBERS"]
+        self.reserved_threads = config["LIVE_RESERVED_THREADS"]
+        if config["LIVE_SERVING_THREADS"]:
+            self.limit_threads(config["LIVE_SERVING_THREADS"])
+        self.queue_size = config["LIVE_QUEUE_SIZE"]
+        self.history_size = config["LIVE_HISTORY_SIZE"]
+        self.heartbeat = config["LIVE_HEARTBEAT_SECONDS"]
+        self.max_seconds = config["LIVE_STREAM_MAX_SECONDS"]
+        with self._lock:
+            self._reset()
+
+    # Every open stream pins one of the worker's `threads` serving threads: keep reserved_threads of
+    # them for ordinary requests (a worker with no thread to spare serves no streams at all)
+    def limit_threads(self, threads):
+        self.max_subscribers = min(self.subscriber_limit, max(threads - self.reserved_threads, 0))
+
+    # Event ids are "<stream id>:<sequence>"; the stream id changes per process so a client that
+    # reconnects to another worker (or after a restart) is told to refetch rather than replayed
+    def _reset(self):
+        self._subscribers = set()
+        self._history = deque(maxlen=self.history_size)
+        self._stream_id = secrets.token_hex(4)
+        self._sequence = 0
+        self._pid = os.getpid()
+        self._watcher = None
+        self._generation = object()  # a watcher stops once this changes
+        self.mode = "local"
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def publish(self, event):
+        with self._lock:
+            self._check_pid()
+            self._sequence += 1
+            event = {**event, "id": f"{self._stream_id}:{self._sequence}"}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    # Called by the write routes; a no-op while the change stream reports the same writes
+    def product_changed(self, product_id, fields):
+        if self.mode == "local":
+            self.publish(stock_event(product_id, fields))
+
+    def product_deleted(self, product_id):
+        if self.mode == "local":
+            self.publish(deleted_event(product_id))
+
+    # For writes that do not return the new values (bulk reservations): one read, only when needed
+    def products_changed(self, collection, product_ids):
+        if self.mode != "local" or not product_ids:
+            return
+        with self._lock:
+            if not self._subscribers:
+                return
+        for product in collection.find({"_id": {"$in": list(product_ids)}}, {f: 1 for f in LIVE_FIELDS}):
+            self.publish(stock_event(product["_id"], product))
+
+    # Too many products changed at once to list (bulk imports): clients refetch instead
+    def catalog_changed(self):
+        if self.mode == "local":
+            self.publish({"type": "reset"})
+
+    # Returns (subscription, missed events, reset) for a client resuming after last_event_id
+    def subscribe(self, last_event_id=None, product_ids=None):
+        with self._lock:
+            self._check_pid()
+            if len(self._subscribers) >= self.max_subscribers:
+                raise StreamsBusy("Too many live streams on this worker")
+            subscription = Subscription(self, product_ids, self.queue_size)
+            self._subscribers.add(subscription)
+            missed, reset = self._since(last_event_id)
+        for event in missed:
+            subscription.offer(event)
+        self._ensure_watcher()
+        return subscription, reset
+
+    def _since(self, last_event_id):
+        if not last_event_id:
+            return [], False
+        stream_id, _, sequence = last_event_id.partition(":")
+        if stream_id != self._stream_id or not sequence.isdigit():
+            return [], True
+        sequence = int(sequence)
+        oldest = self._sequence - len(self._history) + 1
+        if sequence < oldest - 1:
+            return [], True  # the history no longer reaches back that far
+        return [e for e in self._history if int(e["id"].partition(":")[2]) > sequence], False
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    # ---- change stream watcher (replica sets / sharded clusters) ----
+
+    def _ensure_watcher(self):
+        if not self.change_streams:
+            return
+        with self._lock:
+            if self._watcher is not None:
+                return
+            watcher = threading.Thread(target=self._watch, name="products-change-stream", daemon=True)
+            self._watcher = watcher
+        watcher.start()
+
+    def _watch(self):
+        generation = self._generation
+        try:
+            mongo.cx.admin.command("ping")  # discover the topology before asking for it
+            if not supports_transactions():
+                log.info("Change streams unavailable, live stock uses in-process events")
+                return
+        except PyMongoError as e:
+            log.warning("Could not inspect the deployment for change streams", extra={"error": str(e)})
+            with self._lock:
+                self._watcher = None  # try again on the next subscription
+            return
+
+        resume_token, backoff = None, 1
+        while self._generation is generation:
+            try:
+                with mongo.db.products.watch(WATCH_PIPELINE, resume_after=resume_token,
+                                             max_await_time_ms=1000) as stream:
+                    self.mode = "change_stream"
+                    backoff = 1
+                    while stream.alive and self._generation is generation:
+                        change = stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is not None:
+                            self.publish(change_event(change))
+            except OperationFailure as e:
+                # The resume point fell off the oplog: start fresh and tell clients to refetch
+                log.warning("Change stream could not resume", extra={"error": str(e)})
+                self.mode, resume_token = "local", None
+                self.publish({"type": "reset"})
+            except PyMongoError as e:
+                log.warning("Change stream interrupted", extra={"error": str(e)})
+                self.mode = "local"
+            if self._generation is generation:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def stats(self):
+        with self._lock:
+            return {"pid": os.getpid(), "mode": self.mode, "subscribers": len(self._subscribers),
+                    "last_event_id": f"{self._stream_id}:{self._sequence}"}
+
+
+stock_events = StockEvents()
+
+
+def init_app(app):
+    stock_events.init_app(app)
+
+
+def _sse(event):
+    body = {k: v for k, v in event.items() if k != "id"}
+    lines = [f"event: {event['type']}", f"data: {json.dumps(body, separators=(',', ':'))}"]
+    if "id" in event:
+        lines.insert(0, f"id: {event['id']}")
+    return "\n".join(lines) + "\n\n"
+
+
+# The text/event-stream body for one subscription. Comments keep idle proxies from closing the
+# connection; after max_seconds the stream ends and EventSource reconnects with Last-Event-ID,
+# so a sync worker's thread is never held by one client indefinitely.
+def event_stream(subscription, reset=False, heartbeat=15.0, max_seconds=300.0):
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield "retry: 3000\n\n"
+        if reset:
+            yield _sse({"type": "reset"})
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if subscription.lagged:
+                subscription.lagged = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                yield _sse({"type": "reset"})
+                continue
+            try:
+                event = subscription.queue.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(event)
+    finally:
+        subscription.close()
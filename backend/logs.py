@@ -0,0 +1,113 @@
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import sys
+
+ROOT_LOGGER = "farm2home"
+
+# Attributes every LogRecord has; anything else was passed through extra= and is a structured field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+# One JSON object per line: time, level, logger, message, plus the extra= fields
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+# Keep a fraction of records below WARNING (per-request chatter); warnings and errors always pass
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+# Render the message and traceback on the calling thread (arguments may change after the call),
+# but leave the extra= fields on the record for the formatter
+class _RecordQueueHandler(QueueHandler):
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+# The writer thread does not survive fork(); forked workers start their own
+def _restart_listener_in_child():
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers)
+        _listener.start()
+
+
+# Route the farm2home.* loggers through a queue so request threads never block on stdout;
+# a background QueueListener does the formatting and writing
+def configure_logging(app):
+    global _listener
+    config = app.config
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if config["LOG_FORMAT"] == "json" else TextFormatter())
+
+    if _listener is None:
+        atexit.register(_stop_listener)
+        os.register_at_fork(after_in_child=_restart_listener_in_child)
+    else:
+        _listener.stop()
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, handler)
+    _listener.start()
+
+    queue_handler = _RecordQueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(config["LOG_SAMPLE_RATE"]))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.handlers[:] = [queue_handler]
+    logger.setLevel(config["LOG_LEVEL"].upper())
+    logger.propagate = False
+    return logger
@@ -0,0 +1,197 @@
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from metrics import market_price_lookups, market_price_upstream_latency
+from logs import get_logger
+import datetime
+import json
+import threading
+import time
+
+log = get_logger("market")
+
+# Filters the commodity resource accepts, in the order they appear in cache keys
+FILTERS = ("commodity", "state", "district", "market")
+
+# records: the upstream rows; fetched_at: wall-clock time of the fetch; fresh_until / stale_until /
+# retry_at: monotonic deadlines for serving it as a hit, serving it at all, and asking upstream again
+PriceEntry = namedtuple("PriceEntry", ["records", "fetched_at", "fresh_until", "stale_until", "retry_at"])
+
+
+class UpstreamError(RuntimeError):
+    pass
+
+
+# Trim and collapse whitespace, drop empty and unknown filters, bound the page size. The result is
+# the cache key, so "?state=Kerala&commodity=Onion" and "?commodity= Onion&state=Kerala" share one.
+def normalize_filters(args, max_limit):
+    filters = {}
+    for name in FILTERS:
+        value = " ".join((args.get(name) or "").split())
+        if value:
+            filters[name] = value
+    if "commodity" not in filters:
+        raise ValueError("commodity is required")
+    try:
+        limit = int(args.get("limit", max_limit))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return filters, min(limit, max_limit)
+
+
+# One in-progress upstream fetch; concurrent lookups for the same key wait on it
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.state = None
+
+
+# Read-through cache in front of data.gov.in: a TTL per filter set, single-flight fetches (N
+# identical concurrent lookups cost one upstream call) and stale answers while upstream is down.
+class MarketPriceService:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.upstream_calls = self.upstream_failures = 0
+        self.url, self.api_key = None, None
+        self.timeout, self.ttl, self.stale_ttl, self.retry_after, self.max_entries = 5.0, 900.0, 86400.0, 30.0, 512
+
+    def init_app(self, app):
+        config = app.config
+        self.url = config["MARKET_PRICES_API_URL"]
+        self.api_key = config["MARKET_PRICES_API_KEY"]
+        self.timeout = config["MARKET_PRICES_TIMEOUT"]
+        self.ttl = config["MARKET_PRICES_TTL"]
+        self.stale_ttl = max(config["MARKET_PRICES_STALE_TTL"], self.ttl)
+        self.retry_after = config["MARKET_PRICES_RETRY_AFTER"]
+        self.max_entries = config["MARKET_PRICES_CACHE_MAX_ENTRIES"]
+        self.clear()
+
+    # No API key, no upstream: the endpoint answers 503 instead of calling data.gov.in unauthenticated
+    @property
+    def configured(self):
+        return bool(self.api_key)
+
+    # Returns (entry, state) with state HIT, MISS, COALESCED or STALE; raises UpstreamError when
+    # the upstream failed and nothing servable is cached for these filters
+    def lookup(self, filters, limit):
+        key = (limit,) + tuple((name, filters[name]) for name in FILTERS if name in filters)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry.stale_until:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now < entry.fresh_until:
+                    return self._answer(entry, "HIT")
+                if now < entry.retry_at:
+                    # Upstream failed moments ago; don't pile more requests onto it
+                    return self._answer(entry, "STALE")
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.timeout * 2):
+                return self._answer(entry, "STALE", UpstreamError("Timed out waiting for market prices"))
+            state = "COALESCED" if flight.state == "MISS" else flight.state
+            return self._answer(flight.entry, state, UpstreamError("Market price service unavailable"))
+
+        try:
+            try:
+                records = self._fetch(filters, limit)
+            except UpstreamError as e:
+                log.warning("Market price fetch failed", extra={"filters": filters, "error": str(e)})
+                flight.entry, flight.state = self._stored_after_failure(key), "STALE"
+                return self._answer(flight.entry, "STALE", e)
+            flight.entry, flight.state = self._store(key, records), "MISS"
+            return self._answer(flight.entry, "MISS")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _answer(self, entry, state, error=None):
+        if entry is None:
+            market_price_lookups.inc("error")
+            raise error
+        market_price_lookups.inc(state.lower())
+        return entry, state
+
+    def _store(self, key, records):
+        now = time.monotonic()
+        entry = PriceEntry(records, datetime.datetime.utcnow(), now + self.ttl, now + self.stale_ttl, 0.0)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    # Keep serving the last good answer (if still within its stale window) and back off upstream
+    def _stored_after_failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry.stale_until:
+                return None
+            entry = self._entries[key] = entry._replace(retry_at=now + self.retry_after)
+            return entry
+
+    def _fetch(self, filters, limit):
+        params = [("api-key", self.api_key), ("format", "json"), ("limit", limit)]
+        params += [(f"filters[{name}]", value) for name, value in filters.items()]
+        request = Request(f"{self.url}?{urlencode(params)}", headers={"Accept": "application/json"})
+        with self._lock:
+            self.upstream_calls += 1
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                payload = json.load(response)
+            records = payload.get("records") if isinstance(payload, dict) else None
+            if not isinstance(records, list):
+                raise ValueError(payload.get("message", "no records in response") if isinstance(payload, dict)
+                                 else "unexpected response")
+        except (OSError, ValueError) as e:
+            market_price_upstream_latency.observe(time.perf_counter() - started, "error")
+            with self._lock:
+                self.upstream_failures += 1
+            raise UpstreamError(str(e) or e.__class__.__name__)
+        market_price_upstream_latency.observe(time.perf_counter() - started, "ok")
+        return [record for record in records if isinstance(record, dict)]
+
+    # Make every entry due for a refresh; each stays servable as stale until its stale_until
+    def expire(self):
+        with self._lock:
+            for key, entry in self._entries.items():
+                self._entries[key] = entry._replace(fresh_until=0.0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "in_flight": len(self._inflight),
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "upstream_calls": self.upstream_calls,
+                "upstream_failures": self.upstream_failures,
+            }
+
+
+market_prices = MarketPriceService()
+
+
+def init_app(app):
+    market_prices.init_app(app)
@@ -0,0 +1,230 @@
+from flask import request, g
+from pymongo import monitoring
+from collections import defaultdict
+import bisect
+import os
+import threading
+import time
+
+# Latency buckets (seconds) shared by the request and Mongo command histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else repr(bound)
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]!r}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+# Per-process registry (each gunicorn worker serves its own numbers; scrape them per worker or
+# aggregate at the Prometheus side)
+request_latency = Histogram("farm2home_http_request_duration_seconds",
+                            "Time to produce a response, by blueprint and endpoint",
+                            ("blueprint", "endpoint", "method"))
+request_count = Counter("farm2home_http_requests_total", "Responses sent, by endpoint and status",
+                        ("blueprint", "endpoint", "method", "status"))
+mongo_latency = Histogram("farm2home_mongo_command_duration_seconds", "Mongo command round-trip time",
+                          ("command", "collection"))
+mongo_failures = Counter("farm2home_mongo_command_failures_total", "Mongo commands that returned an error",
+                         ("command", "collection"))
+mongo_documents_returned = Counter("farm2home_mongo_documents_returned_total",
+                                   "Documents returned by find/getMore/aggregate batches", ("command", "collection"))
+mongo_documents_written = Counter("farm2home_mongo_documents_written_total",
+                                  "Documents inserted, matched by updates or deleted", ("command", "collection"))
+
+market_price_lookups = Counter("farm2home_market_price_lookups_total",
+                               "Market price lookups by how they were answered (hit, miss, coalesced, stale, error)",
+                               ("result",))
+market_price_upstream_latency = Histogram("farm2home_market_price_upstream_duration_seconds",
+                                          "data.gov.in round-trip time, by outcome", ("outcome",))
+
+profile_cache_lookups = Counter("farm2home_profile_cache_lookups_total",
+                                "Profile lookups by how they were answered (hit, negative_hit, miss)", ("result",))
+
+# Recorded by whichever process drains the outbox (a web worker's thread or the outbox-worker command)
+outbox_events_processed = Counter("farm2home_outbox_events_processed_total",
+                                  "Outbox events by type and outcome (done, retry, failed)", ("type", "result"))
+outbox_lag = Histogram("farm2home_outbox_lag_seconds", "Time from an order write to its event being processed",
+                       ("type",), buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0))
+
+REGISTRY = [request_latency, request_count, mongo_latency, mongo_failures,
+            mongo_documents_returned, mongo_documents_written, market_price_lookups, market_price_upstream_latency,
+            profile_cache_lookups, outbox_events_processed, outbox_lag]
+
+# Commands whose first field is not a collection name, or that would flood the series
+_IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+
+def _command_collection(command_name, command):
+    if command_name == "getMore":
+        return command.get("collection", "")
+    value = command.get(command_name)
+    return value if isinstance(value, str) else ""
+
+
+def _documents_returned(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if "value" in reply:  # findAndModify
+        return 1 if reply["value"] is not None else 0
+    return 0
+
+
+# Times every Mongo command and counts the documents it moved, by command and collection
+class CommandMetricsListener(monitoring.CommandListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections = {}
+
+    def _key(self, event):
+        return (event.request_id, event.connection_id)
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        with self._lock:
+            self._collections[self._key(event)] = _command_collection(event.command_name, event.command)
+
+    def _finish(self, event):
+        with self._lock:
+            return self._collections.pop(self._key(event), None)
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        if collection is None:
+            return
+        labels = (event.command_name, collection)
+        mongo_latency.observe(event.duration_micros / 1e6, *labels)
+        reply = event.reply or {}
+        returned = _documents_returned(reply)
+        if returned:
+            mongo_documents_returned.inc(*labels, amount=returned)
+        if event.command_name in ("insert", "update", "delete") and reply.get("n"):
+            mongo_documents_written.inc(*labels, amount=reply["n"])
+
+    def failed(self, event):
+        collection = self._finish(event)
+        if collection is None:
+            return
+        labels = (event.command_name, collection)
+        mongo_latency.observe(event.duration_micros / 1e6, *labels)
+        mongo_failures.inc(*labels)
+
+
+command_listener = CommandMetricsListener()
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        blueprint = request.blueprint or "app"
+        endpoint = request.endpoint or "unmatched"
+        request_latency.observe(time.perf_counter() - started, blueprint, endpoint, request.method)
+        request_count.inc(blueprint, endpoint, request.method, str(response.status_code))
+    return response
+
+
+# Register the request hooks and the Mongo command listener (before the clients are first created)
+def init_app(app, *clients):
+    if not app.config["METRICS_ENABLED"]:
+        return
+    for client in clients:
+        if command_listener not in client.listeners:
+            client.listeners.append(command_listener)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+def _sample(name, help, value, kind="gauge"):
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+
+
+# Prometheus text exposition of the registry plus point-in-time pool and cache gauges
+def render(pool_stats=None, cache_stats=None, outbox_stats=None):
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    if pool_stats:
+        lines += _sample("farm2home_mongo_pool_checked_out", "Connections checked out of the pool",
+                         pool_stats["checked_out"])
+        lines += _sample("farm2home_mongo_pool_open_connections", "Open pool connections",
+                         pool_stats["open_connections"])
+        lines += _sample("farm2home_mongo_pool_wait_seconds_total", "Total time spent waiting for a connection",
+                         pool_stats["wait_seconds_total"], "counter")
+    if cache_stats:
+        lines += _sample("farm2home_catalog_cache_entries", "Responses held by the catalog cache",
+                         cache_stats["entries"])
+        lines += _sample("farm2home_catalog_cache_hits_total", "Catalog cache hits", cache_stats["hits"], "counter")
+        lines += _sample("farm2home_catalog_cache_misses_total", "Catalog cache misses", cache_stats["misses"],
+                         "counter")
+    if outbox_stats:
+        lines += _sample("farm2home_outbox_pending", "Outbox events waiting to be processed", outbox_stats["pending"])
+        lines += _sample("farm2home_outbox_failed", "Outbox events that ran out of attempts", outbox_stats["failed"])
+        lines += _sample("farm2home_outbox_oldest_pending_seconds", "Age of the oldest pending outbox event",
+                         outbox_stats["oldest_pending_seconds"])
+    lines += _sample("farm2home_process_pid", "Worker process id", os.getpid())
+    return "\n".join(lines) + "\n"
@@ -1,6 +1,241 @@
-from flask_pymongo import PyMongo
+from pymongo import MongoClient, AsyncMongoClient, ReturnDocument, monitoring
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+import contextvars
+import os
+import threading
+import time
 
-mongo = PyMongo()
+DEFAULT_DATABASE = "farm2home"
+
+
+# Records how long requests wait to check a connection out of the pool. The start time lives in a
+# context variable: per thread for the sync client, per task for the async one.
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = contextvars.ContextVar("pool_checkout_started", default=None)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.failed_checkouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.checked_out = 0
+            self.connections = 0
+
+    def connection_check_out_started(self, event):
+        self._started.set(time.perf_counter())
+
+    def _waited(self):
+        started = self._started.get()
+        self._started.set(None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_checked_out(self, event):
+        wait = self._waited()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def connection_check_out_failed(self, event):
+        wait = self._waited()
+        with self._lock:
+            self.failed_checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections -= 1
+
+    # Pool lifecycle events are not needed for the wait statistics
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "failed_checkouts": self.failed_checkouts,
+                "checked_out": self.checked_out,
+                "open_connections": self.connections,
+                "wait_seconds_total": round(self.total_wait, 6),
+                "wait_seconds_max": round(self.max_wait, 6),
+                "wait_seconds_avg": round(self.total_wait / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+# The one MongoClient per process. Created lazily on first use and again after a fork,
+# so a client built in a parent process is never shared with its workers.
+class Mongo:
+    client_class = MongoClient
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._db = None
+        self._pid = None
+        self._settings = {}
+        self.pool_listener = PoolWaitListener()
+        self.listeners = [self.pool_listener]
+
+    def init_app(self, app):
+        config = app.config
+        self._settings = {
+            "uri": config["MONGO_URI"],
+            "options": {
+                "maxPoolSize": config["MONGO_MAX_POOL_SIZE"],
+                "minPoolSize": config["MONGO_MIN_POOL_SIZE"],
+                "maxIdleTimeMS": config["MONGO_MAX_IDLE_TIME_MS"],
+                "waitQueueTimeoutMS": config["MONGO_WAIT_QUEUE_TIMEOUT_MS"],
+                "connectTimeoutMS": config["MONGO_CONNECT_TIMEOUT_MS"],
+                "serverSelectionTimeoutMS": config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+                "socketTimeoutMS": config["MONGO_SOCKET_TIMEOUT_MS"],
+                "readPreference": config["MONGO_READ_PREFERENCE"],
+            },
+            "read_concern": config["MONGO_READ_CONCERN"],
+            "write_concern": config["MONGO_WRITE_CONCERN"],
+        }
+        self.reset()
+
+    # Drop this process's client (e.g. from a post-fork hook); the next access reconnects
+    def reset(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._db = None
+            self._pid = None
+
+    # Serve this process from an existing client (e.g. the benchmark suite's in-process stand-in)
+    def use_client(self, client):
+        with self._lock:
+            self._client = client
+            self._db = self._default_database(client)
+            self._pid = os.getpid()
+
+    @property
+    def cx(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self.pool_listener.reset()
+                    client = self.client_class(
+                        self._settings.get("uri"),
+                        connect=False,
+                        event_listeners=self.listeners,
+                        **self._settings.get("options", {})
+                    )
+                    self._db = self._default_database(client)
+                    self._client = client
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def db(self):
+        self.cx
+        return self._db
+
+    def _default_database(self, client):
+        write_concern = self._settings.get("write_concern")
+        if write_concern is not None and str(write_concern).isdigit():
+            write_concern = int(write_concern)
+        return client.get_default_database(
+            DEFAULT_DATABASE,
+            read_concern=ReadConcern(self._settings.get("read_concern")),
+            write_concern=WriteConcern(w=write_concern),
+        )
+
+    def pool_stats(self):
+        return {"pid": os.getpid(), "connected": self._client is not None, **self.pool_listener.stats()}
+
+
+# The asyncio serving mode's client (see aio.py). Same settings as `mongo`; it lives on the
+# event loop of the process that first used it, so it is created lazily inside that loop.
+class AsyncMongo(Mongo):
+    client_class = AsyncMongoClient
+
+    def reset(self):
+        # Closing an async client must be awaited on its own loop (see close())
+        with self._lock:
+            self._client = None
+            self._db = None
+            self._pid = None
+
+    async def close(self):
+        client, self._client, self._db, self._pid = self._client, None, None, None
+        if client is not None:
+            await client.close()
+
+
+mongo = Mongo()
+amongo = AsyncMongo()
 
 def init_app(app):
     mongo.init_app(app)
+    amongo.init_app(app)
+
+
+# Multi-document transactions need a replica set or sharded cluster; standalone mongod has none
+def supports_transactions():
+    topology = mongo.cx.topology_description.topology_type_name
+    return topology in ("ReplicaSetWithPrimary", "Sharded")
+
+
+# Run callback(session) in a transaction when the deployment supports it, else callback(None)
+def run_transaction(callback):
+    if not supports_transactions():
+        return callback(None)
+    with mongo.cx.start_session() as session:
+        return session.with_transaction(callback)
+
+
+# ---- Users repository (auth, buyer and farmer profiles) ----
+
+def find_user(email, role, projection=None):
+    return mongo.db.users.find_one({"email": email, "role": role}, projection)
+
+def create_user(user):
+    return mongo.db.users.insert_one(user).inserted_id
+
+# Upsert profile fields; returns the stored document (projected) as it is after the write.
+# Two first saves racing on the unique (email, role) index: the loser's retry updates the winner's document.
+def save_profile(email, role, fields, projection=None):
+    def save():
+        return mongo.db.users.find_one_and_update(
+            {"email": email, "role": role},
+            {"$set": {**fields, "role": role}},
+            projection=projection,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    try:
+        return save()
+    except DuplicateKeyError:
+        return save()
@@ -0,0 +1,184 @@
+from pymongo import ASCENDING
+from models import mongo
+from metrics import outbox_events_processed, outbox_lag
+from logs import get_logger
+from bson import ObjectId
+import datetime
+import os
+import threading
+
+log = get_logger("outbox")
+
+# Order events are written to OUTBOX in the same transaction as the order itself, then drained by a
+# worker that runs the registered handlers. Delivery is at least once (an event whose worker died is
+# claimed again once its lease expires), so handlers must be idempotent.
+OUTBOX = "outbox"
+ORDER_EVENT_FIELDS = ("farmer_email", "product_name", "quantity", "total_price", "status", "created_at")
+
+# name -> (event types, fn(db, events)); handlers register themselves with @handler
+HANDLERS = {}
+
+
+def handler(name, *event_types):
+    def register(fn):
+        HANDLERS[name] = (frozenset(event_types), fn)
+        return fn
+    return register
+
+
+# An outbox document for one order change; pass it to record() with the write's session
+def order_event(event_type, order_id, order, **extra):
+    now = datetime.datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "type": event_type,
+        "order_id": str(order_id),
+        "order": {field: order.get(field) for field in ORDER_EVENT_FIELDS},
+        **extra,
+        "created_at": now,
+        "available_at": now,
+        "status": "pending",
+        "attempts": 0,
+        "handled": [],
+    }
+
+
+class OutboxWorker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.in_process = True
+        self.batch_size, self.poll_seconds, self.lease_seconds, self.max_attempts = 100, 1.0, 30.0, 10
+
+    def init_app(self, app):
+        config = app.config
+        self.in_process = config["OUTBOX_WORKER_THREAD"]
+        self.batch_size = config["OUTBOX_BATCH_SIZE"]
+        self.poll_seconds = config["OUTBOX_POLL_SECONDS"]
+        self.lease_seconds = config["OUTBOX_LEASE_SECONDS"]
+        self.max_attempts = config["OUTBOX_MAX_ATTEMPTS"]
+
+    # Add events as part of the caller's write (session is its transaction, or None on a standalone)
+    def record(self, events, session=None):
+        if events:
+            mongo.db[OUTBOX].insert_many(events, ordered=True, session=session)
+
+    # Called once the write has committed: start (or wake) this process's drainer thread
+    def notify(self):
+        if self.in_process:
+            self.ensure_thread()
+            self._wake.set()
+
+    # ---- draining ----
+
+    # Lease up to `limit` due events to this worker: one find, one update_many, one find
+    def claim(self, db, limit):
+        now = datetime.datetime.utcnow()
+        due = {"status": "pending", "available_at": {"$lte": now}}
+        ids = [e["_id"] for e in db[OUTBOX].find(due, {"_id": 1}).sort([("available_at", ASCENDING),
+                                                                         ("_id", ASCENDING)]).limit(limit)]
+        if not ids:
+            return []
+        lease = ObjectId()
+        db[OUTBOX].update_many(
+            {"_id": {"$in": ids}, **due},  # another worker may have leased some of them in between
+            {"$set": {"lease": lease, "available_at": now + datetime.timedelta(seconds=self.lease_seconds)},
+             "$inc": {"attempts": 1}}
+        )
+        return list(db[OUTBOX].find({"lease": lease}).sort("_id", ASCENDING))
+
+    # Run every handler over one claimed batch; returns the number of events completed
+    def process(self, db, events):
+        failed = set()
+        for name, (event_types, fn) in HANDLERS.items():
+            todo = [e for e in events if e["type"] in event_types and name not in e["handled"]]
+            if not todo:
+                continue
+            try:
+                fn(db, todo)
+            except Exception as e:
+                log.exception("Outbox handler failed", extra={"handler": name, "events": len(todo)})
+                failed.update(event["_id"] for event in todo)
+                continue
+            # Remember the handler ran, so a retry after another handler's failure skips it
+            db[OUTBOX].update_many({"_id": {"$in": [event["_id"] for event in todo]}},
+                                   {"$addToSet": {"handled": name}})
+
+        now = datetime.datetime.utcnow()
+        done = [e for e in events if e["_id"] not in failed]
+        if done:
+            db[OUTBOX].update_many({"_id": {"$in": [e["_id"] for e in done]}},
+                                   {"$set": {"status": "done", "processed_at": now}, "$unset": {"lease": ""}})
+            for event in done:
+                outbox_events_processed.inc(event["type"], "done")
+                outbox_lag.observe((now - event["created_at"]).total_seconds(), event["type"])
+        for event in events:
+            if event["_id"] in failed:
+                self._retry_later(db, event, now)
+        return len(done)
+
+    # Exponential backoff, then park the event as "failed" for an operator to look at
+    def _retry_later(self, db, event, now):
+        if event["attempts"] >= self.max_attempts:
+            update, result = {"status": "failed"}, "failed"
+            log.error("Outbox event failed for good", extra={"event_id": str(event["_id"]), "type": event["type"]})
+        else:
+            delay = min(self.poll_seconds * 2 ** event["attempts"], 300)
+            update, result = {"available_at": now + datetime.timedelta(seconds=delay)}, "retry"
+        db[OUTBOX].update_one({"_id": event["_id"], "lease": event["lease"]},
+                              {"$set": update, "$unset": {"lease": ""}})
+        outbox_events_processed.inc(event["type"], result)
+
+    # Claim and process batches until the outbox has nothing due; returns the events completed
+    def drain(self, db=None):
+        db = db if db is not None else mongo.db
+        completed = 0
+        while True:
+            events = self.claim(db, self.batch_size)
+            if not events:
+                return completed
+            completed += self.process(db, events)
+            if len(events) < self.batch_size:
+                return completed
+
+    # The worker loop: drain, then sleep until the poll interval passes or a write wakes us
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                log.warning("Outbox drain failed", extra={"error": str(e)})
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def ensure_thread(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self.run, name="outbox-worker", daemon=True)
+            self._thread = thread
+        thread.start()
+
+    # Backlog and lag as seen from the database (any process can report them)
+    def stats(self, db=None):
+        db = db if db is not None else mongo.db
+        now = datetime.datetime.utcnow()
+        oldest = db[OUTBOX].find_one({"status": "pending"}, {"created_at": 1}, sort=[("_id", ASCENDING)])
+        return {
+            "pending": db[OUTBOX].count_documents({"status": "pending"}),
+            "failed": db[OUTBOX].count_documents({"status": "failed"}),
+            "oldest_pending_seconds": (now - oldest["created_at"]).total_seconds() if oldest else 0.0,
+            "handlers": sorted(HANDLERS),
+            "worker_thread": self.in_process and self._pid == os.getpid() and self._thread is not None,
+        }
+
+
+outbox = OutboxWorker()
+
+
+def init_app(app):
+    outbox.init_app(app)
@@ -0,0 +1,173 @@
+from flask import current_app, request, url_for
+from bson import ObjectId
+from bson.errors import InvalidId
+from collections import namedtuple
+import base64
+import datetime
+import json
+
+# Response header carrying the opaque token for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PAGE_HEADERS = [NEXT_CURSOR_HEADER, "Link"]
+
+# Newest first, _id breaks ties between documents created in the same millisecond
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+Page = namedtuple("Page", ["limit", "cursor", "fields"])
+
+
+# Opaque cursor = urlsafe base64 of the sort-key values and _id of the last document served
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return datetime.datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(doc, sort=KEYSET_SORT):
+    payload = {
+        "v": [_encode_value(doc.get(field)) for field, _ in sort if field != "_id"],
+        "id": str(doc["_id"]),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# Returns (sort-key values, last _id)
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = tuple(_decode_value(v) for v in payload["v"])
+        return values, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, AttributeError, InvalidId):
+        raise ValueError("Invalid pagination cursor")
+
+
+# Parse ?limit=&next=&fields= against the fields a collection exposes
+def parse_page_args(args, allowed_fields, default_fields, sort=KEYSET_SORT):
+    default_limit = current_app.config.get("DEFAULT_PAGE_SIZE", 50)
+    max_limit = current_app.config.get("MAX_PAGE_SIZE", 200)
+
+    try:
+        limit = int(args.get("limit", default_limit))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    limit = min(limit, max_limit)
+
+    token = args.get("next")
+    cursor = decode_cursor(token) if token else None
+    if cursor and len(cursor[0]) != len([f for f, _ in sort if f != "_id"]):
+        raise ValueError("Invalid pagination cursor")
+
+    fields = default_fields
+    if args.get("fields"):
+        fields = tuple(f.strip() for f in args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in allowed_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return Page(limit, cursor, fields)
+
+
+# Mongo projection for the requested fields; _id, created_at and the sort keys are always needed
+# for the cursor. aliases maps a response field onto the stored field(s) it is built from.
+def build_projection(fields, aliases=None, sort=KEYSET_SORT):
+    aliases = aliases or {}
+    projection = {}
+    for f in fields:
+        for stored in aliases.get(f, (f,)):
+            projection[stored] = 1
+    projection["_id"] = 1
+    projection["created_at"] = 1
+    for field, _ in sort:
+        projection[field] = 1
+    return projection
+
+
+# Documents strictly after the cursor in `sort` order: an $or over each tie-break level
+def _after_cursor(cursor, sort):
+    values, last_id = cursor
+    keys = [(field, direction) for field, direction in sort if field != "_id"]
+    last = dict(zip((field for field, _ in keys), values))
+    last["_id"] = last_id
+    id_direction = dict(sort).get("_id", -1)
+
+    clauses = []
+    equal = {}
+    for field, direction in keys + [("_id", id_direction)]:
+        value = last[field]
+        if value is None:
+            # Missing keys sort first ascending and last descending
+            if direction > 0:
+                clauses.append({**equal, field: {"$ne": None}})
+        else:
+            clauses.append({**equal, field: {"$gt" if direction > 0 else "$lt": value}})
+            if direction < 0 and field != "_id":
+                clauses.append({**equal, field: None})  # legacy documents without the key sort last
+        equal[field] = value
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+# Filter and projection for one keyset page (limit + 1 documents tells whether another page follows)
+def page_query(query, page, aliases=None, sort=KEYSET_SORT):
+    if page.cursor:
+        after = _after_cursor(page.cursor, sort)
+        query = {"$and": [query, after]} if query else after
+    return query, build_projection(page.fields, aliases, sort)
+
+
+# Trim the extra document; returns (docs, next_token) where next_token is None on the last page
+def finish_page(docs, page, sort=KEYSET_SORT):
+    next_token = None
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        next_token = encode_cursor(docs[-1], sort)
+    return docs, next_token
+
+
+# Fetch one keyset page; returns (docs, next_token) where next_token is None on the last page
+def fetch_page(collection, query, page, aliases=None, sort=KEYSET_SORT):
+    query, projection = page_query(query, page, aliases, sort)
+    docs = list(collection.find(query, projection).sort(sort).limit(page.limit + 1))
+    return finish_page(docs, page, sort)
+
+
+# fetch_page for an AsyncMongoClient collection
+async def fetch_page_async(collection, query, page, aliases=None, sort=KEYSET_SORT):
+    query, projection = page_query(query, page, aliases, sort)
+    docs = await collection.find(query, projection).sort(sort).limit(page.limit + 1).to_list()
+    return finish_page(docs, page, sort)
+
+
+# Turn projected documents into the response objects in place, instead of rebuilding each one:
+# keys fetched only for the cursor or as a source field are dropped and fields a legacy document
+# lacks get their defaults. ObjectId and datetime values are left to the JSON provider.
+def shape_page(docs, fields, defaults=None):
+    keep = set(fields) | {"_id"}
+    fill = [(field, value) for field, value in (defaults or {}).items() if field in keep]
+    for doc in docs:
+        for key in doc.keys() - keep:
+            del doc[key]
+        for field, value in fill:
+            if field not in doc:
+                doc[field] = value
+    return docs
+
+
+# Attach the next-page token to a list response (header + RFC 8288 Link)
+def set_next_cursor(response, next_token):
+    if next_token:
+        args = request.args.to_dict()
+        args["next"] = next_token
+        next_url = url_for(request.endpoint, _external=True, **(request.view_args or {}), **args)
+        response.headers[NEXT_CURSOR_HEADER] = next_token
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
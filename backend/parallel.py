@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import os
+import threading
+import time
+
+
+class QueryTimeout(RuntimeError):
+    pass
+
+
+# Runs a request's independent Mongo reads side by side on a per-process thread pool, so a composite
+# response costs as long as its slowest query rather than the sum. pymongo releases the GIL while it
+# waits on the network, and every thread checks out its own pooled connection.
+class QueryPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self.threads = 8
+        self.timeout = 10.0
+
+    def init_app(self, app):
+        config = app.config
+        self.threads = config["QUERY_POOL_THREADS"]
+        self.timeout = config["QUERY_POOL_TIMEOUT"]
+        self.shutdown()
+
+    # Created lazily in each process; threads do not survive fork()
+    @property
+    def pool(self):
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="query")
+                    self._pid = os.getpid()
+        return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pid = None
+
+    # Run {name: fn} concurrently; returns ({name: result}, {name: milliseconds}). The first
+    # exception is re-raised; QueryTimeout if the whole set takes longer than the timeout.
+    def gather(self, jobs):
+        def timed(fn):
+            started = time.perf_counter()
+            return fn(), (time.perf_counter() - started) * 1000
+
+        # QUERY_POOL_THREADS=0 runs the jobs one after another on the calling thread
+        if not self.threads:
+            done = {name: timed(fn) for name, fn in jobs.items()}
+        else:
+            futures = {name: self.pool.submit(timed, fn) for name, fn in jobs.items()}
+            deadline = time.monotonic() + self.timeout
+            try:
+                done = {name: future.result(timeout=max(deadline - time.monotonic(), 0))
+                        for name, future in futures.items()}
+            except FutureTimeout:
+                for future in futures.values():
+                    future.cancel()
+                raise QueryTimeout(f"Queries did not finish within {self.timeout:g}s")
+        return {name: result for name, (result, _) in done.items()}, {name: ms for name, (_, ms) in done.items()}
+
+
+query_pool = QueryPool()
+
+
+def init_app(app):
+    query_pool.init_app(app)
@@ -0,0 +1,80 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+import multiprocessing
+import os
+import threading
+
+
+class PasswordPoolBusy(RuntimeError):
+    pass
+
+
+# PBKDF2 hashing and checking on a bounded process pool, so a login storm saturates the pool's
+# cores instead of every request thread. At most max_pending jobs are admitted (running or
+# queued); callers beyond that fail fast with PasswordPoolBusy and the route answers 503.
+class PasswordHasher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self.workers = 0
+        self.timeout = 10.0
+        self._slots = None
+        self.rejected = 0
+
+    def init_app(self, app):
+        config = app.config
+        self.workers = config["PASSWORD_HASH_WORKERS"]
+        self.timeout = config["PASSWORD_HASH_TIMEOUT"]
+        self._slots = threading.BoundedSemaphore(config["PASSWORD_HASH_MAX_PENDING"])
+        self.shutdown()
+
+    # Created lazily in each process; a pool inherited across fork() is unusable
+    @property
+    def pool(self):
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    # spawn: never fork a (possibly multi-threaded) web worker
+                    context = multiprocessing.get_context("spawn")
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pid = None
+
+    def _run(self, fn, *args):
+        # PASSWORD_HASH_WORKERS=0 hashes on the calling thread (development, tests)
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy("Too many sign-ins in progress, please retry")
+        try:
+            return self.pool.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordPoolBusy("Password check timed out, please retry")
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def stats(self):
+        return {"workers": self.workers, "rejected": self.rejected}
+
+
+hasher = PasswordHasher()
+
+
+def init_app(app):
+    hasher.init_app(app)
@@ -0,0 +1,128 @@
+from collections import OrderedDict, namedtuple
+from models import find_user, save_profile
+from metrics import profile_cache_lookups
+import threading
+import time
+
+# What the profile pages (and order names) read for each role; the password hash never leaves Mongo
+PROFILE_FIELDS = {
+    "farmer": ("email", "name", "phone", "crops", "location", "farm_size", "experience_years", "role"),
+    "buyer": ("email", "name", "phone", "business_name", "business_type", "location", "role"),
+}
+
+# profile: the projected user document, or None for "no such user"; expires: monotonic deadline
+ProfileEntry = namedtuple("ProfileEntry", ["profile", "expires"])
+
+
+def profile_projection(role):
+    return {field: 1 for field in PROFILE_FIELDS[role]}
+
+
+# In-process LRU + TTL cache of user profiles keyed by (role, email). Profile saves write through;
+# missing users are remembered for the shorter PROFILE_CACHE_NEGATIVE_TTL so unknown emails do not hit Mongo on
+# every view. Each worker has its own copy, so a save made elsewhere shows up within the TTL.
+class ProfileCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Bumped by every write; a lookup that raced one does not store what it read
+        self.generation = 0
+        self.enabled, self.ttl, self.negative_ttl, self.max_entries = True, 300.0, 30.0, 10000
+        self.hits = self.negative_hits = self.misses = self.evictions = 0
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config["PROFILE_CACHE_ENABLED"]
+        self.ttl = config["PROFILE_CACHE_TTL"]
+        self.negative_ttl = config["PROFILE_CACHE_NEGATIVE_TTL"]
+        self.max_entries = config["PROFILE_CACHE_MAX_ENTRIES"]
+        self.clear()
+
+    # The user's profile fields (see PROFILE_FIELDS) or None when there is no such user
+    def get(self, email, role):
+        key = (role, email)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                if entry.profile is None:
+                    self.negative_hits += 1
+                    profile_cache_lookups.inc("negative_hit")
+                    return None
+                self.hits += 1
+                profile_cache_lookups.inc("hit")
+                return dict(entry.profile)
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            generation = self.generation
+        profile_cache_lookups.inc("miss")
+
+        profile = find_user(email, role, profile_projection(role))
+        self._store(key, profile, generation)
+        return dict(profile) if profile else None
+
+    def name(self, email, role):
+        profile = self.get(email, role) if email else None
+        return profile.get("name") if profile else None
+
+    # Save profile fields and cache the document as stored (one round-trip: update and read back)
+    def save(self, email, role, fields):
+        profile = save_profile(email, role, fields, profile_projection(role))
+        self.put(profile, role)
+        return profile
+
+    # Cache a user document read or written elsewhere (signup, login), trimmed to the profile fields
+    def put(self, user, role):
+        if role not in PROFILE_FIELDS:
+            return
+        profile = {"_id": user["_id"], **{field: user[field] for field in PROFILE_FIELDS[role] if field in user}}
+        self._store((role, profile["email"]), profile)
+
+    def invalidate(self, email, role):
+        with self._lock:
+            self.generation += 1
+            self._entries.pop((role, email), None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def _store(self, key, profile, generation=None):
+        if not self.enabled:
+            return
+        ttl = self.ttl if profile is not None else self.negative_ttl
+        with self._lock:
+            if generation is None:
+                self.generation += 1
+            elif generation != self.generation:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = ProfileEntry(profile, time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "negative_ttl_seconds": self.negative_ttl,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+profile_cache = ProfileCache()
+
+
+def init_app(app):
+    profile_cache.init_app(app)
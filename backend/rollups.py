@@ -0,0 +1,236 @@
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+from models import run_transaction
+from outbox import handler
+import datetime
+
+# Per-farmer sales rollups, kept in step with the orders collection:
+#   scope "total"   - one per farmer
+#   scope "month"   - one per farmer and calendar month (UTC), key "YYYY-MM"
+#   scope "product" - one per farmer and product name
+# Cancelled orders are not counted.
+ROLLUPS = "sales_rollups"
+# One marker per outbox event already counted ({_id: event id, applied_at}), expired after a week
+APPLIED_EVENTS = "rollup_events"
+COUNTED = {"status": {"$ne": "cancelled"}}
+REVENUE_TOLERANCE = 0.01
+DUPLICATE_KEY = 11000
+
+
+def rollup_id(farmer_email, scope, key=None):
+    return {"farmer_email": farmer_email, "scope": scope, "key": key}
+
+
+def month_key(created_at):
+    return f"{created_at.year:04d}-{created_at.month:02d}"
+
+
+def is_counted(order):
+    return order.get("status", "confirmed") != "cancelled"
+
+
+# The rollup documents one order counts towards: (_id, fields set when the document is created)
+def _targets(order):
+    farmer_email = order["farmer_email"]
+    created_at = order["created_at"]
+    return [
+        (rollup_id(farmer_email, "total"), {}),
+        (rollup_id(farmer_email, "month", month_key(created_at)),
+         {"year": created_at.year, "month": created_at.month}),
+        (rollup_id(farmer_email, "product", order["product_name"]), {}),
+    ]
+
+
+# +1 when an event brings an order into the counted sales, -1 when it takes one out, else 0
+def event_sign(event):
+    order = event["order"]
+    if event["type"] == "order.placed":
+        return 1 if is_counted(order) else 0
+    if event["type"] == "order.deleted":
+        return -1 if is_counted(order) else 0
+    was_counted = event.get("previous_status", "confirmed") != "cancelled"
+    return is_counted(order) - was_counted
+
+
+# Outbox consumer. Each event is counted at most once: its marker in APPLIED_EVENTS is written in the
+# same transaction as its increments, and an event that already has a marker is skipped. Without
+# transactions (standalone mongod) the marker is written first, so a drainer that dies in between loses
+# that event's counts rather than doubling them; check-rollups reports the gap and rebuild-rollups
+# closes it. Rollups rebuilt after an event was recorded already include it and are left alone.
+@handler("rollups", "order.placed", "order.deleted", "order.status_changed")
+def apply_order_events(db, events):
+    counted = [(event, event_sign(event)) for event in events]
+    counted = [(event, sign) for event, sign in counted if sign]
+    if counted:
+        run_transaction(lambda session: _apply_events(db, counted, session))
+
+
+def _apply_events(db, counted, session):
+    ids = [event["_id"] for event, _ in counted]
+    applied = {doc["_id"] for doc in db[APPLIED_EVENTS].find({"_id": {"$in": ids}}, {"_id": 1}, session=session)}
+    counted = [(event, sign) for event, sign in counted if event["_id"] not in applied]
+    if not counted:
+        return
+    counted = _mark_applied(db, counted, session)
+
+    targets = [(event, sign, _id, extra) for event, sign in counted for _id, extra in _targets(event["order"])]
+    rebuilt = {
+        tuple(doc["_id"].values()): doc["rebuilt_at"]
+        for doc in db[ROLLUPS].find({"_id": {"$in": [t[2] for t in targets]}, "rebuilt_at": {"$exists": True}},
+                                    {"rebuilt_at": 1}, session=session)
+    }
+    requests = []
+    for event, sign, _id, extra in targets:
+        rebuilt_at = rebuilt.get(tuple(_id.values()))
+        if rebuilt_at and rebuilt_at >= event["created_at"]:
+            continue
+        order = event["order"]
+        update = {
+            "$setOnInsert": {"farmer_email": _id["farmer_email"], "scope": _id["scope"], "key": _id["key"], **extra},
+            "$inc": {"quantity": sign * order["quantity"], "revenue": sign * order["total_price"], "orders": sign},
+        }
+        if sign > 0 and _id["scope"] == "product":
+            update["$min"] = {"first_order": order["created_at"]}
+        # The rebuilt_at condition covers a rebuild landing after the read above (no transaction): the
+        # upsert then collides with the rebuilt document and the duplicate key is ignored
+        requests.append(UpdateOne({"_id": _id, "rebuilt_at": {"$not": {"$gte": event["created_at"]}}},
+                                  update, upsert=True))
+    if not requests:
+        return
+    try:
+        db[ROLLUPS].bulk_write(requests, ordered=False, session=session)
+    except BulkWriteError as e:
+        if session is not None or any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+            raise
+
+
+# Write the events' markers; returns the events this call is to apply. Inside a transaction a
+# concurrent drainer's marker is a write conflict and the transaction retries (then skips the event);
+# without one, an event whose marker another drainer wrote first is left to that drainer.
+def _mark_applied(db, counted, session):
+    now = datetime.datetime.utcnow()
+    markers = [{"_id": event["_id"], "applied_at": now} for event, _ in counted]
+    if session is not None:
+        db[APPLIED_EVENTS].insert_many(markers, session=session)
+        return counted
+    try:
+        db[APPLIED_EVENTS].insert_many(markers, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+        taken = {markers[error["index"]]["_id"] for error in errors}
+        return [(event, sign) for event, sign in counted if event["_id"] not in taken]
+    return counted
+
+
+def _sales_group(group_id, extra=None):
+    return {"$group": {
+        "_id": group_id,
+        "quantity": {"$sum": "$quantity"},
+        "revenue": {"$sum": "$total_price"},
+        "orders": {"$sum": 1},
+        **(extra or {}),
+    }}
+
+
+# Recompute rollup documents from the orders collection (one farmer, or everyone)
+def compute_rollups(db, farmer_email=None):
+    match = dict(COUNTED)
+    if farmer_email:
+        match["farmer_email"] = farmer_email
+
+    docs = []
+    for row in db.orders.aggregate([{"$match": match}, _sales_group("$farmer_email")], allowDiskUse=True):
+        docs.append({"_id": rollup_id(row["_id"], "total"), "farmer_email": row["_id"], "scope": "total",
+                     "key": None, "quantity": row["quantity"], "revenue": row["revenue"], "orders": row["orders"]})
+
+    month_group = {"farmer_email": "$farmer_email", "year": {"$year": "$created_at"}, "month": {"$month": "$created_at"}}
+    for row in db.orders.aggregate([{"$match": match}, _sales_group(month_group)], allowDiskUse=True):
+        g = row["_id"]
+        key = f"{g['year']:04d}-{g['month']:02d}"
+        docs.append({"_id": rollup_id(g["farmer_email"], "month", key), "farmer_email": g["farmer_email"],
+                     "scope": "month", "key": key, "year": g["year"], "month": g["month"],
+                     "quantity": row["quantity"], "revenue": row["revenue"], "orders": row["orders"]})
+
+    product_group = {"farmer_email": "$farmer_email", "product_name": "$product_name"}
+    pipeline = [{"$match": match}, _sales_group(product_group, {"first_order": {"$min": "$created_at"}})]
+    for row in db.orders.aggregate(pipeline, allowDiskUse=True):
+        g = row["_id"]
+        docs.append({"_id": rollup_id(g["farmer_email"], "product", g["product_name"]),
+                     "farmer_email": g["farmer_email"], "scope": "product", "key": g["product_name"],
+                     "quantity": row["quantity"], "revenue": row["revenue"], "orders": row["orders"],
+                     "first_order": row["first_order"]})
+    return docs
+
+
+# Backfill / rebuild: overwrite the stored rollups with freshly computed ones. Documents are replaced
+# in place (never deleted and re-inserted) because the outbox drainer may be upserting them meanwhile;
+# rollups with no counted orders left are zeroed, which readers and check-rollups treat as absent.
+def rebuild_rollups(db, farmer_email=None, batch_size=1000):
+    # Outbox events recorded before this point are already in the counts (see apply_order_events)
+    rebuilt_at = datetime.datetime.utcnow()
+    scope = {"farmer_email": farmer_email} if farmer_email else {}
+    stale = {tuple(doc["_id"].values()): doc["_id"] for doc in db[ROLLUPS].find(scope, {"_id": 1})}
+    docs = compute_rollups(db, farmer_email)
+    requests = []
+    for doc in docs:
+        doc["rebuilt_at"] = rebuilt_at
+        stale.pop(tuple(doc["_id"].values()), None)
+        requests.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+    requests.extend(
+        UpdateOne({"_id": _id}, {"$set": {"quantity": 0, "revenue": 0, "orders": 0, "rebuilt_at": rebuilt_at},
+                                 "$unset": {"first_order": ""}})
+        for _id in stale.values()
+    )
+    for start in range(0, len(requests), batch_size):
+        db[ROLLUPS].bulk_write(requests[start:start + batch_size], ordered=False)
+    return len(docs)
+
+
+# Compare stored rollups with a recomputation; returns a list of human-readable mismatches
+def check_rollups(db, farmer_email=None):
+    expected = {tuple(d["_id"].values()): d for d in compute_rollups(db, farmer_email)}
+    stored = {
+        tuple(d["_id"].values()): d
+        for d in db[ROLLUPS].find({"farmer_email": farmer_email} if farmer_email else {})
+        if d.get("orders")
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=lambda k: tuple(str(v) for v in k)):
+        want, have = expected.get(key), stored.get(key)
+        label = "/".join(str(v) for v in key if v is not None)
+        if not have:
+            mismatches.append(f"{label}: missing rollup")
+        elif not want:
+            mismatches.append(f"{label}: stale rollup for {have['orders']} orders")
+        elif (want["orders"] != have["orders"] or want["quantity"] != have["quantity"]
+              or abs(want["revenue"] - have["revenue"]) > REVENUE_TOLERANCE):
+            mismatches.append(
+                f"{label}: stored orders={have['orders']} quantity={have['quantity']} revenue={have['revenue']}, "
+                f"expected orders={want['orders']} quantity={want['quantity']} revenue={want['revenue']}"
+            )
+    return mismatches
+
+
+# One indexed read of every rollup for a farmer: (total or None, months oldest first, products)
+def read_rollups(db, farmer_email):
+    return summarize_rollups(db[ROLLUPS].find({"farmer_email": farmer_email}))
+
+
+# Split one farmer's rollup documents into (total, months, products), oldest first
+def summarize_rollups(docs):
+    total, months, products = None, [], []
+    for doc in docs:
+        if doc["scope"] == "total":
+            total = doc
+        elif doc.get("orders", 0) <= 0:
+            continue
+        elif doc["scope"] == "month":
+            months.append(doc)
+        elif doc["scope"] == "product":
+            products.append(doc)
+    months.sort(key=lambda d: d["key"])
+    products.sort(key=lambda d: d.get("first_order") or datetime.datetime.min)
+    return total, months, products
@@ -1,101 +1,121 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-from models import mongo
-from bson import ObjectId
+from models import mongo, amongo
+from rollups import ROLLUPS, COUNTED, read_rollups, summarize_rollups, rebuild_rollups
+from inventory import (INVENTORY, STOCK_LABELS, stock_status, status_pipeline, read_inventory, is_built,
+                       summarize_inventory)
+from logs import get_logger
+from sessions import session_required
+from aio import async_view
+import asyncio
 import datetime
-from collections import defaultdict
 
 analytics_bp = Blueprint("analytics", __name__, url_prefix="/api/analytics")
+log = get_logger("analytics")
+
+MONTHS_SHOWN = 6
+
+STOCK_PROJECTION = {"_id": 0, "name": 1, "quantity": 1, "stock_status": 1}
+
+def recent_orders_query(farmer_email):
+    week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
+    return {"farmer_email": farmer_email, "created_at": {"$gt": week_ago}, **COUNTED}
+
+# (total, months, products) rollups for one farmer
+def load_rollups(db, farmer_email):
+    total, months, product_rollups = read_rollups(db, farmer_email)
+    if total is None and db.orders.find_one({"farmer_email": farmer_email}, {"_id": 1}):
+        # First visit since the backfill: build this farmer's rollups once
+        rebuild_rollups(db, farmer_email)
+        total, months, product_rollups = read_rollups(db, farmer_email)
+    return total, months, product_rollups
+
+# Build the analytics payload for one farmer from the sales rollups: O(months + products) reads
+def build_farmer_analytics(db, farmer_email):
+    total, months, product_rollups = load_rollups(db, farmer_email)
+    recent_orders = db.orders.count_documents(recent_orders_query(farmer_email))
+    products = list(db.products.find({"farmer_email": farmer_email}, STOCK_PROJECTION))
+    inventory = read_inventory(db, farmer_email)
+    return analytics_payload(farmer_email, total, months, product_rollups, recent_orders, products, inventory)
+
+async def _status_counts(db, farmer_email):
+    return await (await db.products.aggregate(status_pipeline(farmer_email))).to_list()
+
+# The async port issues its reads concurrently
+async def build_farmer_analytics_async(db, farmer_email):
+    rollup_docs, recent_orders, products, summary, status_rows = await asyncio.gather(
+        db[ROLLUPS].find({"farmer_email": farmer_email}).to_list(),
+        db.orders.count_documents(recent_orders_query(farmer_email)),
+        db.products.find({"farmer_email": farmer_email}, STOCK_PROJECTION).to_list(),
+        db[INVENTORY].find_one({"_id": farmer_email}),
+        _status_counts(db, farmer_email),
+    )
+    if not is_built(summary) and products:
+        # read_inventory builds the summary once; run it on the sync client off the event loop
+        inventory = await asyncio.to_thread(read_inventory, mongo.db, farmer_email)
+    else:
+        inventory = summarize_inventory(summary, status_rows)
+    total, months, product_rollups = summarize_rollups(rollup_docs)
+    if total is None and await db.orders.find_one({"farmer_email": farmer_email}, {"_id": 1}):
+        # The one-off rebuild is a batch job; run it on the sync client off the event loop
+        await asyncio.to_thread(rebuild_rollups, mongo.db, farmer_email)
+        total, months, product_rollups = summarize_rollups(
+            await db[ROLLUPS].find({"farmer_email": farmer_email}).to_list())
+    return analytics_payload(farmer_email, total, months, product_rollups, recent_orders, products, inventory)
+
+# Stock totals come from the inventory summary; products is the stock chart (name, quantity, stock_status)
+def analytics_payload(farmer_email, total, months, product_rollups, recent_orders, products, inventory):
+    total = total or {}
+    months = months[-MONTHS_SHOWN:]
+
+    return {
+        "farmer_email": farmer_email,
+        "total_sales": total.get("orders", 0),
+        "total_revenue": total.get("revenue", 0),
+        "total_quantity_sold": total.get("quantity", 0),
+        "current_stock": inventory["stock"],
+        "total_products_listed": inventory["products"],
+        "stock_summary": inventory["statuses"],
+        "recent_orders_7days": recent_orders,
+
+        "monthly_sales": {
+            "labels": [datetime.date(m["year"], m["month"], 1).strftime("%b %Y") for m in months],
+            "quantities": [m["quantity"] for m in months],
+            "revenues": [m["revenue"] for m in months]
+        },
+
+        "product_performance": [
+            {
+                "name": p["key"],
+                "quantity": p["quantity"],
+                "revenue": p["revenue"]
+            }
+            for p in product_rollups
+        ],
+
+        "stock_distribution": [
+            {
+                "name": product["name"],
+                "quantity": product["quantity"],
+                "status": STOCK_LABELS[product.get("stock_status") or stock_status(product["quantity"])]
+            }
+            for product in products
+        ]
+    }
 
 # ✅ Get farmer analytics
 @analytics_bp.route("/farmer/<farmer_email>", methods=["GET"], strict_slashes=False)
 @cross_origin()
+@session_required("farmer", email_arg="farmer_email")
 def get_farmer_analytics(farmer_email):
     try:
-        print(f"📊 Fetching analytics for farmer: {farmer_email}")
-        
-        # Get all orders for this farmer
-        orders = list(mongo.db.orders.find({"farmer_email": farmer_email}))
-        print(f"📦 Found {len(orders)} orders for farmer {farmer_email}")
-        
-        # Get farmer's products
-        products = list(mongo.db.products.find({"farmer_email": farmer_email}))
-        
-        # Calculate basic analytics
-        total_sales = len(orders)
-        total_revenue = sum(order["total_price"] for order in orders)
-        total_quantity_sold = sum(order["quantity"] for order in orders)
-        
-        # Monthly sales data (last 6 months)
-        monthly_sales = defaultdict(int)
-        monthly_revenue = defaultdict(float)
-        
-        for order in orders:
-            month_year = order["created_at"].strftime("%b %Y")
-            monthly_sales[month_year] += order["quantity"]
-            monthly_revenue[month_year] += order["total_price"]
-        
-        # Sort months chronologically
-        sorted_months = sorted(monthly_sales.keys(), 
-                             key=lambda x: datetime.datetime.strptime(x, "%b %Y"))
-        
-        # Product performance
-        product_performance = defaultdict(lambda: {"quantity": 0, "revenue": 0})
-        
-        for order in orders:
-            product_name = order["product_name"]
-            product_performance[product_name]["quantity"] += order["quantity"]
-            product_performance[product_name]["revenue"] += order["total_price"]
-        
-        # Current stock status
-        current_stock = sum(product["quantity"] for product in products)
-        total_products_listed = len(products)
-        
-        # Recent activity (last 7 days)
-        week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
-        recent_orders = len([order for order in orders if order["created_at"] > week_ago])
-        
-        analytics_data = {
-            "farmer_email": farmer_email,
-            "total_sales": total_sales,
-            "total_revenue": total_revenue,
-            "total_quantity_sold": total_quantity_sold,
-            "current_stock": current_stock,
-            "total_products_listed": total_products_listed,
-            "recent_orders_7days": recent_orders,
-            
-            "monthly_sales": {
-                "labels": sorted_months[-6:],  # Last 6 months
-                "quantities": [monthly_sales[month] for month in sorted_months[-6:]],
-                "revenues": [monthly_revenue[month] for month in sorted_months[-6:]]
-            },
-            
-            "product_performance": [
-                {
-                    "name": name,
-                    "quantity": data["quantity"],
-                    "revenue": data["revenue"]
-                }
-                for name, data in product_performance.items()
-            ],
-            
-            "stock_distribution": [
-                {
-                    "name": product["name"],
-                    "quantity": product["quantity"],
-                    "status": "Out of Stock" if product["quantity"] == 0 else 
-                              "Low Stock" if product["quantity"] <= 5 else 
-                              "Good Stock"
-                }
-                for product in products
-            ]
-        }
-        
-        print(f"✅ Analytics data for {farmer_email}: {total_sales} sales, ₹{total_revenue} revenue")
+        analytics_data = build_farmer_analytics(mongo.db, farmer_email)
+        log.debug("Returning farmer analytics", extra={"farmer_email": farmer_email,
+                                                        "total_sales": analytics_data["total_sales"]})
         return jsonify(analytics_data)
         
     except Exception as e:
-        print("❌ Error fetching farmer analytics:", str(e))
+        log.exception("Error fetching farmer analytics")
         return jsonify({"error": "Failed to fetch analytics", "details": str(e)}), 500
 
 # ✅ Health check
@@ -107,4 +127,16 @@ def analytics_health_check():
         "service": "analytics",
         "timestamp": datetime.datetime.utcnow().isoformat(),
         "message": "Analytics service is running"
-    })
\ No newline at end of file
+    })
+
+
+# ---- Async port of the read route (asyncio serving mode, see aio.py) ----
+
+@async_view(analytics_bp, "get_farmer_analytics")
+@session_required("farmer", email_arg="farmer_email")
+async def get_farmer_analytics_async(farmer_email):
+    try:
+        return jsonify(await build_farmer_analytics_async(amongo.db, farmer_email))
+    except Exception as e:
+        log.exception("Error fetching farmer analytics")
+        return jsonify({"error": "Failed to fetch analytics", "details": str(e)}), 500
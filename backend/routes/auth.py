@@ -1,17 +1,17 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from pymongo import MongoClient
-import os
-from bson import ObjectId  # add this import at the top
+from pymongo.errors import DuplicateKeyError
+from models import find_user, create_user
+from profiles import profile_cache
+from passwords import hasher, PasswordPoolBusy
+from sessions import issue_token, verify_token, bearer_token
 
 
 auth_bp = Blueprint('auth_bp', __name__, url_prefix='/api/auth')
 
-# MongoDB connection
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/farm2home")
-client = MongoClient(MONGO_URI)
-db = client["farm2home"]
-users = db["users"]
+def busy(e):
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = "1"
+    return response, 503
 
 @auth_bp.route("/signup", methods=["POST"])
 def signup():
@@ -24,18 +24,27 @@ def signup():
     if not all([name, email, password, role]):
         return jsonify({"error": "Missing fields"}), 400
 
-    if users.find_one({"email": email, "role": role}):
+    if find_user(email, role, {"_id": 1}):
         return jsonify({"error": "User already exists"}), 400
 
-    hashed_pw = generate_password_hash(password)
+    try:
+        hashed_pw = hasher.hash(password)
+    except PasswordPoolBusy as e:
+        return busy(e)
     user = {"name": name, "email": email, "password": hashed_pw, "role": role}
-    result = users.insert_one(user)
+    try:
+        inserted_id = create_user(user)
+    except DuplicateKeyError:
+        # Signed up concurrently: the unique (email, role) index let the other request win
+        return jsonify({"error": "User already exists"}), 400
+    # Replaces any cached "no such user" for this email
+    profile_cache.put({**user, "_id": inserted_id}, role)
 
     # Convert ObjectId to string
-    user["_id"] = str(result.inserted_id)
+    user["_id"] = str(inserted_id)
     del user["password"]
 
-    return jsonify({"message": "Signup successful", "user": user}), 201
+    return jsonify({"message": "Signup successful", "user": user, "token": issue_token(user)}), 201
 
 @auth_bp.route("/login", methods=["POST"])
 def login():
@@ -44,11 +53,24 @@ def login():
     password = data.get("password")
     role = data.get("role")
 
-    user = users.find_one({"email": email, "role": role})
-    if not user or not check_password_hash(user["password"], password):
-        return jsonify({"error": "Invalid credentials"}), 401
+    user = find_user(email, role)
+    try:
+        if not user or not hasher.verify(user["password"], password):
+            return jsonify({"error": "Invalid credentials"}), 401
+    except PasswordPoolBusy as e:
+        return busy(e)
 
+    # The profile page is usually the next request
+    profile_cache.put(user, role)
     user["_id"] = str(user["_id"])  # Convert ObjectId to string
     del user["password"]
 
-    return jsonify({"message": "Login successful", "user": user}), 200
+    return jsonify({"message": "Login successful", "user": user, "token": issue_token(user)}), 200
+
+# Who does this token belong to? (signature + expiry check only, no database read)
+@auth_bp.route("/session", methods=["GET"])
+def current_session():
+    claims = verify_token(bearer_token() or "")
+    if claims is None:
+        return jsonify({"error": "Invalid or expired session token"}), 401
+    return jsonify({"email": claims["email"], "role": claims["role"], "_id": claims["sub"]}), 200
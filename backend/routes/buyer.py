@@ -1,18 +1,14 @@
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
-import os
+from profiles import profile_cache
+from sessions import session_required
 
 buyer_bp = Blueprint('buyer_bp', __name__, url_prefix='/api/buyer')
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/farm2home")
-client = MongoClient(MONGO_URI)
-db = client["farm2home"]
-users = db["users"]
-
 # ✅ Get buyer profile (if not found, return empty default profile)
 @buyer_bp.route("/<email>", methods=["GET"])
+@session_required("buyer", email_arg="email")
 def get_buyer(email):
-    user = users.find_one({"email": email, "role": "buyer"})
+    user = profile_cache.get(email, "buyer")
     if not user:
         # Return default profile with ALL fields
         return jsonify({
@@ -36,14 +32,12 @@ def get_buyer(email):
         "role": user.get("role", "buyer")
     }
     
-    # Remove password if it exists
-    user_data.pop("password", None)
-    
     return jsonify(user_data), 200
 
 
 # ✅ Save or update profile
 @buyer_bp.route("", methods=["POST"])
+@session_required("buyer", email_field="email")
 def save_buyer():
     data = request.json
     email = data.get("email")
@@ -56,13 +50,8 @@ def save_buyer():
         "business_name": data.get("business_name", ""),
         "business_type": data.get("business_type", ""),
         "location": data.get("location", ""),
-        "role": "buyer"
     }
 
-    users.update_one(
-        {"email": email, "role": "buyer"},
-        {"$set": update_fields},
-        upsert=True
-    )
+    profile_cache.save(email, "buyer", update_fields)
 
     return jsonify({"message": "Profile saved successfully!"}), 200
\ No newline at end of file
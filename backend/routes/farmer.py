@@ -1,18 +1,26 @@
-from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
-import os
+from flask import Blueprint, request, jsonify, current_app
+from models import mongo
+from profiles import profile_cache
+from sessions import session_required
+from pagination import Page, KEYSET_SORT, build_projection, fetch_page, shape_page
+from parallel import query_pool, QueryTimeout
+from routes.products import PRODUCT_FIELDS, PRODUCT_FIELD_ALIASES, shape_products
+from routes.orders import ORDER_FIELDS, ORDER_DEFAULTS
+from routes.analytics import load_rollups, recent_orders_query, analytics_payload
+from inventory import read_inventory
+from logs import get_logger
+import datetime
 
 farmer_bp = Blueprint('farmer_bp', __name__, url_prefix='/api/farmer')
+log = get_logger("farmer")
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/farm2home")
-client = MongoClient(MONGO_URI)
-db = client["farm2home"]
-users = db["users"]
+DASHBOARD_SECTIONS = ("products", "orders", "analytics")
 
 # ✅ Get farmer profile (if not found, return empty default profile)
 @farmer_bp.route("/<email>", methods=["GET"])
+@session_required("farmer", email_arg="email")
 def get_farmer(email):
-    user = users.find_one({"email": email, "role": "farmer"})
+    user = profile_cache.get(email, "farmer")
     if not user:
         # Return default profile with ALL fields
         return jsonify({
@@ -38,14 +46,12 @@ def get_farmer(email):
         "role": user.get("role", "farmer")
     }
     
-    # Remove password if it exists
-    user_data.pop("password", None)
-    
     return jsonify(user_data), 200
 
 
 # ✅ Save or update profile
 @farmer_bp.route("", methods=["POST"])
+@session_required("farmer", email_field="email")
 def save_farmer():
     data = request.json
     email = data.get("email")
@@ -59,13 +65,70 @@ def save_farmer():
         "location": data.get("location", ""),
         "farm_size": data.get("farm_size", ""),
         "experience_years": data.get("experience_years", ""),
-        "role": "farmer"
     }
 
-    users.update_one(
-        {"email": email, "role": "farmer"},
-        {"$set": update_fields},
-        upsert=True
-    )
+    profile_cache.save(email, "farmer", update_fields)
 
     return jsonify({"message": "Profile saved successfully!"}), 200
+
+
+def parse_sections(args):
+    if not args.get("sections"):
+        return DASHBOARD_SECTIONS
+    sections = tuple(dict.fromkeys(s.strip() for s in args["sections"].split(",") if s.strip()))
+    unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+    if unknown or not sections:
+        raise ValueError(f"sections must be a comma-separated subset of {', '.join(DASHBOARD_SECTIONS)}")
+    return sections
+
+
+# ✅ Farmer dashboard in one round-trip (?sections=products,orders,analytics, default all). The
+# catalog, the newest page of sales and the rollups are read concurrently and each only once:
+# analytics reuses the product list instead of querying products again. More orders: follow
+# "orders_next" as ?next= on /api/orders/farmer/<email>. Server-Timing gives each query's time.
+@farmer_bp.route("/<email>/dashboard", methods=["GET"])
+@session_required("farmer", email_arg="email")
+def get_farmer_dashboard(email):
+    try:
+        sections = parse_sections(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db = mongo.db
+    jobs = {}
+    if "products" in sections or "analytics" in sections:
+        projection = build_projection(PRODUCT_FIELDS, PRODUCT_FIELD_ALIASES)
+        jobs["products"] = lambda: list(db.products.find({"farmer_email": email}, projection).sort(KEYSET_SORT))
+    if "orders" in sections:
+        page = Page(current_app.config["DASHBOARD_ORDERS_LIMIT"], None, ORDER_FIELDS)
+        jobs["orders"] = lambda: fetch_page(db.orders, {"farmer_email": email}, page)
+    if "analytics" in sections:
+        jobs["rollups"] = lambda: load_rollups(db, email)
+        jobs["recent_orders"] = lambda: db.orders.count_documents(recent_orders_query(email))
+        jobs["inventory"] = lambda: read_inventory(db, email)
+
+    try:
+        data, timings = query_pool.gather(jobs)
+    except QueryTimeout as e:
+        log.warning("Dashboard queries timed out", extra={"farmer_email": email, "sections": sections})
+        return jsonify({"error": str(e)}), 504
+    except Exception as e:
+        log.exception("Error loading farmer dashboard")
+        return jsonify({"error": "Failed to load dashboard"}), 500
+
+    body = {"farmer_email": email, "sections": list(sections)}
+    if "analytics" in sections:
+        total, months, product_rollups = data["rollups"]
+        # Same stock chart order as /api/analytics (oldest listing first)
+        body["analytics"] = analytics_payload(email, total, months, product_rollups, data["recent_orders"],
+                                              data["products"][::-1], data["inventory"])
+    if "products" in sections:
+        body["products"] = shape_products(data["products"], PRODUCT_FIELDS)
+    if "orders" in sections:
+        orders, next_token = data["orders"]
+        body["orders"] = shape_page(orders, ORDER_FIELDS, {**ORDER_DEFAULTS, "created_at": datetime.datetime.utcnow()})
+        body["orders_next"] = next_token
+
+    response = jsonify(body)
+    response.headers["Server-Timing"] = ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+    return response
@@ -0,0 +1,36 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_cors import cross_origin
+from market import market_prices, normalize_filters, UpstreamError
+
+market_bp = Blueprint("market", __name__, url_prefix="/api/market-prices")
+
+# ✅ Mandi prices for ?commodity= (optional state, district, market, limit), served from the shared
+# cache; X-Cache says whether the answer was a HIT, MISS, COALESCED with another request or STALE
+@market_bp.route("/", methods=["GET"], strict_slashes=False)
+@cross_origin(expose_headers=["X-Cache"])
+def get_market_prices():
+    try:
+        filters, limit = normalize_filters(request.args, current_app.config["MARKET_PRICES_MAX_LIMIT"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not market_prices.configured:
+        return jsonify({"error": "Market prices are not configured on this server"}), 503
+    try:
+        entry, state = market_prices.lookup(filters, limit)
+    except UpstreamError:
+        return jsonify({"error": "Market prices are unavailable right now, please try again later"}), 502
+
+    response = jsonify({
+        "filters": filters,
+        "records": entry.records,
+        "fetched_at": entry.fetched_at.isoformat(),
+        "stale": state == "STALE",
+    })
+    response.headers["X-Cache"] = state
+    return response
+
+# ✅ Cache counters (for tuning the TTLs)
+@market_bp.route("/cache-stats", methods=["GET"], strict_slashes=False)
+@cross_origin()
+def market_cache_stats():
+    return jsonify(market_prices.stats())
@@ -1,10 +1,23 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, g
 from flask_cors import cross_origin
-from models import mongo
+from models import mongo, amongo, run_transaction
+from pymongo import ReturnDocument, UpdateOne
+from outbox import outbox, order_event
+from cache import invalidate_products, invalidate_search
+from profiles import profile_cache
+from inventory import adjust_stock, refresh_stock_status, apply_inventory
+from pagination import (PAGE_HEADERS, KEYSET_SORT, parse_page_args, fetch_page, fetch_page_async, set_next_cursor,
+                        shape_page)
+from exports import export_query, export_format, stream_export
+from sessions import session_required, admin_required, is_admin
+from logs import get_logger
+from live import stock_events
+from aio import async_view
 from bson import ObjectId
 import datetime
 
 orders_bp = Blueprint("orders", __name__, url_prefix="/api/orders")
+log = get_logger("orders")
 
 # ✅ HEALTH CHECK FOR ORDERS
 @orders_bp.route("/health", methods=["GET"], strict_slashes=False)
@@ -17,23 +30,120 @@ def orders_health_check():
         "message": "Orders service is running"
     })
 
-# Helper to convert ObjectId to string
-def serialize_order(o):
+ORDER_FIELDS = ("product_id", "product_name", "buyer_email", "buyer_name", "farmer_email",
+                "farmer_name", "quantity", "total_price", "status", "created_at")
+
+# Helper to convert ObjectId to string (optionally restricted to the requested fields)
+def serialize_order(o, fields=None):
     if not o:
         return None
-    return {
+    data = {
         "_id": str(o["_id"]),
-        "product_id": str(o["product_id"]),
-        "product_name": o["product_name"],
-        "buyer_email": o["buyer_email"],
-        "buyer_name": o["buyer_name"],
-        "farmer_email": o["farmer_email"],
-        "farmer_name": o["farmer_name"],
-        "quantity": o["quantity"],
-        "total_price": o["total_price"],
+        "product_id": str(o["product_id"]) if o.get("product_id") is not None else None,
+        "product_name": o.get("product_name"),
+        "buyer_email": o.get("buyer_email"),
+        "buyer_name": o.get("buyer_name"),
+        "farmer_email": o.get("farmer_email"),
+        "farmer_name": o.get("farmer_name"),
+        "quantity": o.get("quantity"),
+        "total_price": o.get("total_price"),
         "status": o.get("status", "confirmed"),
         "created_at": o["created_at"].isoformat() if o.get("created_at") else datetime.datetime.utcnow().isoformat()
     }
+    if fields is not None:
+        data = {k: v for k, v in data.items() if k == "_id" or k in fields}
+    return data
+
+
+# What serialize_order writes for fields a legacy document lacks
+ORDER_DEFAULTS = {field: None for field in ORDER_FIELDS}
+ORDER_DEFAULTS["status"] = "confirmed"
+
+# A listing page is the projected documents themselves (see pagination.shape_page)
+def order_page(orders, next_token, page):
+    defaults = {**ORDER_DEFAULTS, "created_at": datetime.datetime.utcnow()}
+    response = jsonify(shape_page(orders, page.fields, defaults))
+    return set_next_cursor(response, next_token)
+
+# Shared body of the paginated order listings
+def list_orders(query):
+    try:
+        page = parse_page_args(request.args, ORDER_FIELDS, ORDER_FIELDS)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    orders, next_token = fetch_page(mongo.db.orders, query, page)
+    return orders, order_page(orders, next_token, page)
+
+async def list_orders_async(query):
+    try:
+        page = parse_page_args(request.args, ORDER_FIELDS, ORDER_FIELDS)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    orders, next_token = await fetch_page_async(amongo.db.orders, query, page)
+    return orders, order_page(orders, next_token, page)
+
+# Order fields the sales rollups are keyed on
+ROLLUP_ORDER_PROJECTION = {"farmer_email": 1, "product_name": 1, "quantity": 1, "total_price": 1,
+                           "status": 1, "created_at": 1}
+
+PRODUCT_ORDER_PROJECTION = {"name": 1, "price": 1, "quantity": 1, "farmer_email": 1, "farmer_name": 1}
+
+# Atomically take stock: only matches while quantity >= n, so concurrent checkouts cannot oversell.
+# The product's stock_status and the farmer's inventory summary move with it.
+def reserve_stock(product_object_id, quantity, session=None):
+    product = mongo.db.products.find_one_and_update(
+        {"_id": product_object_id, "quantity": {"$gte": quantity}},
+        adjust_stock(-quantity),
+        projection=PRODUCT_ORDER_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if product:
+        apply_inventory(mongo.db, {product["farmer_email"]: (0, -quantity)}, session)
+    return product
+
+# Give reserved stock back (failed insert without a transaction, deleted order); returns the new stock
+def release_stock(product_object_id, quantity, session=None):
+    product = mongo.db.products.find_one_and_update(
+        {"_id": product_object_id},
+        adjust_stock(quantity),
+        projection={"quantity": 1, "price": 1, "farmer_email": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if product:
+        apply_inventory(mongo.db, {product["farmer_email"]: (0, quantity)}, session)
+    return product
+
+# Explain why a reservation matched nothing (only runs on the failure path)
+def stock_error(product_object_id):
+    product = mongo.db.products.find_one({"_id": product_object_id}, {"quantity": 1})
+    if not product:
+        return jsonify({"error": "Product not found"}), 404
+    return jsonify({"error": f"Not enough quantity available. Only {product['quantity']} kg left"}), 400
+
+def parse_quantity(value):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Quantity must be a whole number")
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive")
+    return quantity
+
+def build_order(product, product_id, buyer_email, buyer_name, quantity):
+    return {
+        "product_id": product_id,
+        "product_name": product["name"],
+        "buyer_email": buyer_email,
+        "buyer_name": buyer_name,
+        "farmer_email": product["farmer_email"],
+        "farmer_name": product.get("farmer_name") or profile_cache.name(product["farmer_email"], "farmer"),
+        "quantity": quantity,
+        "total_price": product["price"] * quantity,
+        "status": "confirmed",
+        "created_at": datetime.datetime.utcnow()
+    }
 
 # Create new order
 @orders_bp.route("/", methods=["POST"], strict_slashes=False)
@@ -41,11 +151,11 @@ def serialize_order(o):
 def create_order():
     try:
         data = request.get_json()
-        print("🛒 Received order data:", data)
+        log.debug("Received order", extra={"product_id": data.get("product_id"), "buyer_email": data.get("buyer_email")})
         
         product_id = data.get("product_id")
         buyer_email = data.get("buyer_email")
-        buyer_name = data.get("buyer_name")
+        buyer_name = data.get("buyer_name") or profile_cache.name(data.get("buyer_email"), "buyer")
         quantity = data.get("quantity")
 
         if not product_id or not buyer_email or not quantity:
@@ -57,149 +167,621 @@ def create_order():
         except:
             return jsonify({"error": "Invalid product ID format"}), 400
 
-        # Get product details
-        product = mongo.db.products.find_one({"_id": product_object_id})
-        if not product:
-            return jsonify({"error": "Product not found"}), 404
-
-        # Check if enough quantity available
-        if product["quantity"] < int(quantity):
-            return jsonify({"error": f"Not enough quantity available. Only {product['quantity']} kg left"}), 400
-
-        # Calculate total price
-        total_price = product["price"] * int(quantity)
-
-        order = {
-            "product_id": product_id,
-            "product_name": product["name"],
-            "buyer_email": buyer_email,
-            "buyer_name": buyer_name,
-            "farmer_email": product["farmer_email"],
-            "farmer_name": product["farmer_name"],
-            "quantity": int(quantity),
-            "total_price": total_price,
-            "status": "confirmed",
-            "created_at": datetime.datetime.utcnow()
-        }
-
-        # Update product quantity (reduce available quantity)
-        mongo.db.products.update_one(
-            {"_id": product_object_id},
-            {"$inc": {"quantity": -int(quantity)}}
-        )
+        try:
+            quantity = parse_quantity(quantity)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Reserve stock and save the order together (one transaction on replica sets)
+        def place(session):
+            product = reserve_stock(product_object_id, quantity, session)
+            if not product:
+                return None
+            order = build_order(product, product_id, buyer_email, buyer_name, quantity)
+            try:
+                res = mongo.db.orders.insert_one(order, session=session)
+                outbox.record([order_event("order.placed", res.inserted_id, order)], session)
+            except Exception:
+                if session is None:
+                    release_stock(product_object_id, quantity)
+                    if "_id" in order:
+                        mongo.db.orders.delete_one({"_id": order["_id"]})
+                raise
+            order["_id"] = str(res.inserted_id)
+            return order, product
 
-        # Save order
-        res = mongo.db.orders.insert_one(order)
-        order["_id"] = str(res.inserted_id)
+        placed = run_transaction(place)
+        if not placed:
+            return stock_error(product_object_id)
+        order, product = placed
+        outbox.notify()
+        invalidate_products(product_id)
+        stock_events.product_changed(product_id, product)
         
-        print("✅ Order created successfully:", order["_id"])
+        log.info("Order created", extra={"order_id": order["_id"], "product_id": product_id, "quantity": quantity})
         return jsonify(serialize_order(order)), 201
         
     except Exception as e:
-        print("❌ Error creating order:", str(e))
+        log.exception("Error creating order")
         return jsonify({"error": "Failed to create order", "details": str(e)}), 500
 
+BATCH_MODES = ("all_or_nothing", "best_effort")
+
+class BatchAborted(Exception):
+    pass
+
+# Validate cart lines; returns (lines, errors) where errors are per-line results
+def parse_batch_lines(items):
+    lines, errors = [], []
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        product_id = item.get("product_id")
+        try:
+            product_object_id = ObjectId(product_id)
+            quantity = parse_quantity(item.get("quantity"))
+        except ValueError as e:
+            errors.append(line_result(index, product_id, error=str(e)))
+            continue
+        except Exception:
+            errors.append(line_result(index, product_id, error="Invalid product ID format"))
+            continue
+        lines.append({"index": index, "product_id": str(product_object_id),
+                      "product_object_id": product_object_id, "quantity": quantity})
+    return lines, errors
+
+def line_result(index, product_id, order=None, error=None):
+    result = {"index": index, "product_id": product_id, "status": "placed" if order else "failed"}
+    if order:
+        result["order"] = serialize_order(order)
+    else:
+        result["error"] = error
+    return result
+
+# Stock taken (sign -1) or given back (+1) per farmer for the given products, for apply_inventory
+def farmer_stock_changes(wanted, product_ids, farmers, sign):
+    changes = {}
+    for pid in product_ids:
+        products, stock = changes.get(farmers[pid], (0, 0))
+        changes[farmers[pid]] = (products, stock + sign * wanted[pid])
+    return changes
+
+# Reserve stock for every product; returns the set of product ids reserved. products is what place()
+# read in the same session: inside a transaction that snapshot holds for the writes too (a concurrent
+# change is a write conflict and the transaction retries), so the lines that fit are known up front
+# and reserved in one bulk_write. Without a transaction each line takes its stock on its own, as a
+# single order does, so the result is exact without leaving anything on the products.
+# farmers maps each product id to its farmer (for the inventory summaries).
+def reserve_batch(wanted, products, farmers, session=None):
+    if session is None:
+        return {pid for pid, quantity in wanted.items() if reserve_stock(pid, quantity)}
+    reserved = {pid for pid, quantity in wanted.items() if products[pid]["quantity"] >= quantity}
+    if not reserved:
+        return reserved
+    result = mongo.db.products.bulk_write(
+        [UpdateOne({"_id": pid, "quantity": {"$gte": wanted[pid]}}, {"$inc": {"quantity": -wanted[pid]}})
+         for pid in reserved],
+        ordered=False, session=session
+    )
+    if result.matched_count != len(reserved):
+        raise RuntimeError("Stock changed under the batch's transaction")
+    refresh_stock_status(mongo.db.products, reserved, session)
+    apply_inventory(mongo.db, farmer_stock_changes(wanted, reserved, farmers, -1), session)
+    return reserved
+
+def release_batch(wanted, reserved, farmers, session=None):
+    if reserved:
+        mongo.db.products.bulk_write(
+            [UpdateOne({"_id": pid}, {"$inc": {"quantity": wanted[pid]}}) for pid in reserved],
+            ordered=False, session=session
+        )
+        refresh_stock_status(mongo.db.products, reserved, session)
+        apply_inventory(mongo.db, farmer_stock_changes(wanted, reserved, farmers, 1), session)
+
+# Place a whole cart: one find, one bulk_write of reservations, one insert_many of orders
+@orders_bp.route("/batch", methods=["POST"], strict_slashes=False)
+@cross_origin()
+def create_orders_batch():
+    try:
+        data = request.get_json() or {}
+        buyer_email = data.get("buyer_email")
+        buyer_name = data.get("buyer_name") or profile_cache.name(data.get("buyer_email"), "buyer")
+        items = data.get("items")
+        mode = data.get("mode", "all_or_nothing")
+        log.debug("Received batch order", extra={"buyer_email": buyer_email, "lines": len(items or []), "mode": mode})
+
+        if not buyer_email or not isinstance(items, list) or not items:
+            return jsonify({"error": "Buyer email and a non-empty items list are required"}), 400
+        if mode not in BATCH_MODES:
+            return jsonify({"error": f"mode must be one of {', '.join(BATCH_MODES)}"}), 400
+        max_lines = current_app.config.get("MAX_BATCH_LINES", 100)
+        if len(items) > max_lines:
+            return jsonify({"error": f"A batch may contain at most {max_lines} lines"}), 400
+
+        lines, failed = parse_batch_lines(items)
+        if failed and mode == "all_or_nothing":
+            return batch_response(mode, failed + [line_result(l["index"], l["product_id"], error="Batch aborted") for l in lines])
+
+        def place(session):
+            results = list(failed)
+            products = {
+                p["_id"]: p for p in mongo.db.products.find(
+                    {"_id": {"$in": list({l["product_object_id"] for l in lines})}},
+                    PRODUCT_ORDER_PROJECTION, session=session
+                )
+            }
+
+            # Lines for the same product share one reservation
+            wanted = {}
+            for line in lines:
+                if line["product_object_id"] in products:
+                    wanted[line["product_object_id"]] = wanted.get(line["product_object_id"], 0) + line["quantity"]
+
+            farmers = {pid: product["farmer_email"] for pid, product in products.items()}
+            reserved = reserve_batch(wanted, products, farmers, session) if wanted else set()
+            if mode == "all_or_nothing" and len(reserved) < len({l["product_object_id"] for l in lines}):
+                if session is None:
+                    release_batch(wanted, reserved, farmers)
+                raise BatchAborted()
+
+            orders, placed_lines = [], []
+            for line in lines:
+                product = products.get(line["product_object_id"])
+                if not product:
+                    results.append(line_result(line["index"], line["product_id"], error="Product not found"))
+                elif line["product_object_id"] not in reserved:
+                    results.append(line_result(line["index"], line["product_id"],
+                                               error="Not enough quantity available"))
+                else:
+                    orders.append(build_order(product, line["product_id"], buyer_email, buyer_name, line["quantity"]))
+                    placed_lines.append(line)
+
+            if orders:
+                try:
+                    res = mongo.db.orders.insert_many(orders, session=session)
+                    outbox.record([order_event("order.placed", order_id, order)
+                                   for order, order_id in zip(orders, res.inserted_ids)], session)
+                except Exception:
+                    if session is None:
+                        release_batch(wanted, reserved, farmers)
+                        mongo.db.orders.delete_many({"_id": {"$in": [o["_id"] for o in orders if "_id" in o]}})
+                    raise
+                for line, order, order_id in zip(placed_lines, orders, res.inserted_ids):
+                    order["_id"] = str(order_id)
+                    results.append(line_result(line["index"], line["product_id"], order=order))
+            return results
+
+        try:
+            results = run_transaction(place)
+        except BatchAborted:
+            return batch_response(mode, batch_abort_results(lines))
+        placed_ids = {r["product_id"] for r in results if r["status"] == "placed"}
+        if placed_ids:
+            outbox.notify()
+        invalidate_products(*placed_ids)
+        stock_events.products_changed(mongo.db.products, [ObjectId(pid) for pid in placed_ids])
+
+        log.info("Batch order placed", extra={"buyer_email": buyer_email, "lines": len(items),
+                                             "placed": sum(r["status"] == "placed" for r in results)})
+        return batch_response(mode, results)
+
+    except Exception as e:
+        log.exception("Error creating batch order")
+        return jsonify({"error": "Failed to create orders", "details": str(e)}), 500
+
+# Per-line reasons for an aborted all-or-nothing batch (one read, failure path only)
+def batch_abort_results(lines):
+    stock = {
+        p["_id"]: p["quantity"] for p in mongo.db.products.find(
+            {"_id": {"$in": [l["product_object_id"] for l in lines]}}, {"quantity": 1}
+        )
+    }
+    results = []
+    for line in lines:
+        available = stock.get(line["product_object_id"])
+        if available is None:
+            error = "Product not found"
+        elif available < line["quantity"]:
+            error = f"Not enough quantity available. Only {available} kg left"
+        else:
+            error = "Batch aborted"
+        results.append(line_result(line["index"], line["product_id"], error=error))
+    return results
+
+def batch_response(mode, results):
+    results.sort(key=lambda r: r["index"])
+    placed = sum(1 for r in results if r["status"] == "placed")
+    if placed == len(results):
+        status = 201
+    elif placed:
+        status = 207
+    else:
+        status = 409
+    return jsonify({
+        "mode": mode,
+        "placed": placed,
+        "failed": len(results) - placed,
+        "results": results
+    }), status
+
+# Stream orders as NDJSON or CSV (?format=, filters: farmer, buyer, status, from, to)
+@orders_bp.route("/export", methods=["GET"], strict_slashes=False)
+@cross_origin()
+@admin_required
+def export_orders():
+    try:
+        query = export_query(request.args, ("farmer", "buyer", "status"))
+        fmt = export_format(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        log.info("Exporting orders", extra={"format": fmt, "filter": query})
+        cursor = mongo.db.orders.find(query).sort(KEYSET_SORT)
+        return stream_export(cursor, serialize_order, ("_id",) + ORDER_FIELDS, fmt, "orders")
+    except Exception as e:
+        log.exception("Error exporting orders")
+        return jsonify({"error": "Failed to export orders"}), 500
+
 # Get all orders (for admin purposes)
 @orders_bp.route("/", methods=["GET"], strict_slashes=False)
-@cross_origin()
+@cross_origin(expose_headers=PAGE_HEADERS)
+@admin_required
 def get_all_orders():
     try:
-        orders = list(mongo.db.orders.find().sort("created_at", -1))
-        print(f"📊 Returning {len(orders)} orders")
-        return jsonify([serialize_order(o) for o in orders])
+        orders, response = list_orders({})
+        if orders is not None:
+            log.debug("Returning orders", extra={"count": len(orders)})
+        return response
     except Exception as e:
-        print("❌ Error fetching all orders:", str(e))
+        log.exception("Error fetching all orders")
         return jsonify({"error": "Failed to fetch orders"}), 500
 
 # Get orders for a buyer
 @orders_bp.route("/buyer/<buyer_email>", methods=["GET"], strict_slashes=False)
-@cross_origin()
+@cross_origin(expose_headers=PAGE_HEADERS)
+@session_required("buyer", email_arg="buyer_email")
 def get_buyer_orders(buyer_email):
     try:
-        print(f"👤 Fetching orders for buyer: {buyer_email}")
-        orders = list(mongo.db.orders.find({"buyer_email": buyer_email}).sort("created_at", -1))
-        print(f"📦 Found {len(orders)} orders for {buyer_email}")
-        return jsonify([serialize_order(o) for o in orders])
+        orders, response = list_orders({"buyer_email": buyer_email})
+        if orders is not None:
+            log.debug("Returning buyer orders", extra={"buyer_email": buyer_email, "count": len(orders)})
+        return response
     except Exception as e:
-        print("❌ Error fetching buyer orders:", str(e))
+        log.exception("Error fetching buyer orders")
         return jsonify({"error": "Failed to fetch buyer orders"}), 500
 
 # Get orders for a farmer (sales)
 @orders_bp.route("/farmer/<farmer_email>", methods=["GET"], strict_slashes=False)
-@cross_origin()
+@cross_origin(expose_headers=PAGE_HEADERS)
+@session_required("farmer", email_arg="farmer_email")
 def get_farmer_orders(farmer_email):
     try:
-        print(f"👨‍🌾 Fetching orders for farmer: {farmer_email}")
-        orders = list(mongo.db.orders.find({"farmer_email": farmer_email}).sort("created_at", -1))
-        print(f"💰 Found {len(orders)} orders for farmer {farmer_email}")
-        return jsonify([serialize_order(o) for o in orders])
+        orders, response = list_orders({"farmer_email": farmer_email})
+        if orders is not None:
+            log.debug("Returning farmer orders", extra={"farmer_email": farmer_email, "count": len(orders)})
+        return response
     except Exception as e:
-        print("❌ Error fetching farmer orders:", str(e))
+        log.exception("Error fetching farmer orders")
         return jsonify({"error": "Failed to fetch farmer orders"}), 500
 
+# Buyers and farmers see their own orders; ADMIN_EMAILS see every order
+def can_view_order(order):
+    claims = g.session
+    return is_admin(claims) or claims.get("email") in (order.get("buyer_email"), order.get("farmer_email"))
+
 # Get specific order by ID
 @orders_bp.route("/<order_id>", methods=["GET"], strict_slashes=False)
 @cross_origin()
+@session_required(always=True)
 def get_order(order_id):
     try:
-        print(f"🔍 Fetching order: {order_id}")
+        log.debug("Fetching order", extra={"order_id": order_id})
         order = mongo.db.orders.find_one({"_id": ObjectId(order_id)})
         if not order:
             return jsonify({"error": "Order not found"}), 404
+        if not can_view_order(order):
+            return jsonify({"error": "Forbidden"}), 403
         return jsonify(serialize_order(order))
     except Exception as e:
-        print("❌ Error fetching order:", str(e))
+        log.exception("Error fetching order")
         return jsonify({"error": "Failed to fetch order"}), 500
 
-# Update order status
+ORDER_STATUSES = ("pending", "confirmed", "shipped", "delivered", "cancelled")
+# Moves PUT /api/orders/<id> and /api/orders/status/bulk allow; delivered and cancelled orders are final
+ORDER_TRANSITIONS = {
+    "pending": ("confirmed", "shipped", "cancelled"),
+    "confirmed": ("shipped", "delivered", "cancelled"),
+    "shipped": ("delivered",),
+    "delivered": (),
+    "cancelled": (),
+}
+
+# Farmers change only their own orders: 403 for someone else's, 404 when there is none
+def order_missing(order_id):
+    if mongo.db.orders.find_one({"_id": ObjectId(order_id)}, {"_id": 1}):
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"error": "Order not found"}), 404
+
+# Update order status: the same ORDER_TRANSITIONS and restocking as the bulk endpoint (see
+# apply_status_change); 409 when the order cannot move to that status
 @orders_bp.route("/<order_id>", methods=["PUT"], strict_slashes=False)
 @cross_origin()
+@session_required("farmer", always=True)
 def update_order(order_id):
     try:
         data = request.get_json()
-        print(f"✏️ Updating order {order_id} with data:", data)
+        log.info("Updating order", extra={"order_id": order_id, "status": data.get("status")})
         
         status = data.get("status")
-        if status not in ["pending", "confirmed", "shipped", "delivered", "cancelled"]:
+        if status not in ORDER_STATUSES:
             return jsonify({"error": "Invalid status"}), 400
 
-        result = mongo.db.orders.update_one(
-            {"_id": ObjectId(order_id)},
-            {"$set": {"status": status}}
-        )
-        
-        if result.matched_count == 0:
-            return jsonify({"error": "Order not found"}), 404
+        def change(session):
+            order = mongo.db.orders.find_one({"_id": ObjectId(order_id), "farmer_email": g.session["email"]},
+                                             BULK_STATUS_PROJECTION, session=session)
+            if not order:
+                return None, []
+            results, restocked = apply_status_change([order], status, session)
+            return results[order["_id"]], restocked
+
+        result, restocked = run_transaction(change)
+        if result is None:
+            return order_missing(order_id)
+        status_changed(result["result"] == "updated", restocked)
+        if result["result"] == "failed":
+            return jsonify({"error": result["error"]}), 409
             
         return jsonify({"message": "Order updated successfully", "status": status})
     except Exception as e:
-        print("❌ Error updating order:", str(e))
+        log.exception("Error updating order")
         return jsonify({"error": "Failed to update order"}), 500
 
+# Order fields a bulk status change reads: the rollup keys plus the product a cancellation restocks
+BULK_STATUS_PROJECTION = {**ROLLUP_ORDER_PROJECTION, "product_id": 1}
+
+# Validate the request's choice of orders: ("ids", [ObjectId...]) for "order_ids", or ("filter",
+# query) for "filter": {status, from, to}, narrowed to orders that can move to `target`
+def parse_bulk_selection(data, target, limit):
+    if data.get("order_ids") is not None:
+        order_ids = data["order_ids"]
+        if not isinstance(order_ids, list) or not order_ids:
+            raise ValueError("order_ids must be a non-empty list")
+        if len(order_ids) > limit:
+            raise ValueError(f"At most {limit} orders can be changed at once")
+        object_ids = []
+        for order_id in order_ids:
+            try:
+                object_ids.append(ObjectId(order_id))
+            except Exception:
+                raise ValueError(f"Invalid order ID format: {order_id}")
+        return "ids", list(dict.fromkeys(object_ids))
+
+    criteria = data.get("filter")
+    if not isinstance(criteria, dict):
+        raise ValueError("Send order_ids or a filter")
+    query = export_query(criteria, ("status",))
+    sources = [status for status, targets in ORDER_TRANSITIONS.items() if target in targets]
+    if "status" in query:
+        if query["status"] not in ORDER_STATUSES:
+            raise ValueError(f"filter.status must be one of {', '.join(ORDER_STATUSES)}")
+        sources = [status for status in sources if status == query["status"]]
+    # A missing status reads as "confirmed"; {"$in": [None]} matches it
+    query["status"] = {"$in": sources + ([None] if "confirmed" in sources else [])}
+    return "filter", query
+
+# The farmer's orders for a parsed selection: ({_id: order}, ids in response order, more left).
+# A filter takes the oldest `limit` matches.
+def select_bulk_orders(selection, farmer_email, limit, session=None):
+    kind, value = selection
+    if kind == "ids":
+        orders = mongo.db.orders.find({"_id": {"$in": value}, "farmer_email": farmer_email},
+                                      BULK_STATUS_PROJECTION, session=session)
+        return {o["_id"]: o for o in orders}, value, False
+    orders = list(mongo.db.orders.find({**value, "farmer_email": farmer_email}, BULK_STATUS_PROJECTION,
+                                       session=session).sort([("created_at", 1), ("_id", 1)]).limit(limit + 1))
+    return {o["_id"]: o for o in orders[:limit]}, [o["_id"] for o in orders[:limit]], len(orders) > limit
+
+def bulk_status_result(order_id, outcome, previous=None, error=None):
+    result = {"order_id": str(order_id), "result": outcome}
+    if previous is not None:
+        result["previous_status"] = previous
+    if error:
+        result["error"] = error
+    return result
+
+# Move orders (read with BULK_STATUS_PROJECTION) to `target`: each valid transition in one bulk_write,
+# and cancelling puts the stock back in the same session. Returns ({_id: result}, restocked product
+# ids); each result is updated, unchanged or failed (see bulk_status_result).
+def apply_status_change(orders, target, session=None):
+    results, changed = {}, []
+    for order in orders:
+        current = order.get("status") or "confirmed"
+        if current == target:
+            results[order["_id"]] = bulk_status_result(order["_id"], "unchanged", current)
+        elif target not in ORDER_TRANSITIONS.get(current, ()):
+            results[order["_id"]] = bulk_status_result(order["_id"], "failed", current,
+                                                       f"Cannot change a {current} order to {target}")
+        else:
+            changed.append(order)
+    if not changed:
+        return results, []
+
+    # Each update only matches while the order still has the status read above; the batch id left
+    # on the order tells which ones did when some did not
+    batch = ObjectId()
+    cancelling = target == "cancelled"
+    requests = []
+    for order in changed:
+        update = {"status": target, "status_batch": batch}
+        if cancelling:
+            update["stock_released"] = True
+        requests.append(UpdateOne({"_id": order["_id"], "status": order.get("status")}, {"$set": update}))
+    result = mongo.db.orders.bulk_write(requests, ordered=False, session=session)
+    if result.matched_count < len(changed):
+        applied = {o["_id"] for o in mongo.db.orders.find(
+            {"_id": {"$in": [o["_id"] for o in changed]}, "status_batch": batch}, {"_id": 1}, session=session)}
+        for order in changed:
+            if order["_id"] not in applied:
+                results[order["_id"]] = bulk_status_result(order["_id"], "failed", order.get("status") or "confirmed",
+                                                           "Order changed while updating; try again")
+        changed = [o for o in changed if o["_id"] in applied]
+
+    # Put cancelled orders' stock back (products deleted since are skipped)
+    restocked = []
+    if cancelling and changed:
+        wanted = {}
+        for order in changed:
+            pid = ObjectId(order["product_id"])
+            wanted[pid] = wanted.get(pid, 0) + order["quantity"]
+        farmers = {p["_id"]: p["farmer_email"] for p in mongo.db.products.find(
+            {"_id": {"$in": list(wanted)}}, {"farmer_email": 1}, session=session)}
+        release_batch(wanted, set(farmers), farmers, session)
+        restocked = list(farmers)
+
+    outbox.record([order_event("order.status_changed", o["_id"], {**o, "status": target},
+                               previous_status=o.get("status") or "confirmed") for o in changed], session)
+    for order in changed:
+        results[order["_id"]] = bulk_status_result(order["_id"], "updated", order.get("status") or "confirmed")
+    return results, restocked
+
+# Once the status changes have committed: wake the outbox drainer, refresh restocked products
+def status_changed(updated, restocked):
+    if updated:
+        outbox.notify()
+    if restocked:
+        invalidate_products(*(str(pid) for pid in restocked))
+        invalidate_search()  # restocked products reappear in in_stock searches
+        stock_events.products_changed(mongo.db.products, restocked)
+
+# ✅ Move many of a farmer's orders to one status (harvest-day dispatch): {"farmer_email", "status",
+# and "order_ids": [...] or "filter": {"status", "from", "to"}}. Every valid transition is applied
+# in one bulk_write; cancelling returns the stock in the same transaction, and each order gets an
+# outcome (updated, unchanged or failed). "more" says a filter matched more than one call handles.
+@orders_bp.route("/status/bulk", methods=["PUT"], strict_slashes=False)
+@cross_origin()
+@session_required("farmer", email_field="farmer_email")
+def bulk_update_order_status():
+    try:
+        data = request.get_json(silent=True) or {}
+        farmer_email = data.get("farmer_email")
+        target = data.get("status")
+        if not farmer_email:
+            return jsonify({"error": "farmer_email is required"}), 400
+        if target not in ORDER_STATUSES:
+            return jsonify({"error": f"status must be one of {', '.join(ORDER_STATUSES)}"}), 400
+        limit = current_app.config["MAX_BULK_STATUS_ORDERS"]
+        try:
+            selection = parse_bulk_selection(data, target, limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        log.info("Bulk order status change", extra={"farmer_email": farmer_email, "status": target,
+                                                     "by": selection[0]})
+
+        def apply(session):
+            orders, order_ids, more = select_bulk_orders(selection, farmer_email, limit, session)
+            results = {order_id: bulk_status_result(order_id, "failed", error="Order not found")
+                       for order_id in order_ids if order_id not in orders}
+            changed, restocked = apply_status_change([orders[i] for i in order_ids if i in orders], target, session)
+            results.update(changed)
+            return order_ids, results, restocked, more
+
+        order_ids, results, restocked, more = run_transaction(apply)
+        updated = sum(r["result"] == "updated" for r in results.values())
+        status_changed(updated, restocked)
+
+        failed = sum(r["result"] == "failed" for r in results.values())
+        log.info("Bulk order status changed", extra={"farmer_email": farmer_email, "status": target,
+                                                     "updated": updated, "failed": failed})
+        status = 200 if not failed else 207 if len(results) > failed else 409
+        return jsonify({
+            "status": target,
+            "updated": updated,
+            "unchanged": len(results) - updated - failed,
+            "failed": failed,
+            "more": more,
+            "results": [results[order_id] for order_id in order_ids]
+        }), status
+    except Exception as e:
+        log.exception("Error changing order statuses")
+        return jsonify({"error": "Failed to update orders"}), 500
+
 # Delete order (with inventory restoration)
 @orders_bp.route("/<order_id>", methods=["DELETE"], strict_slashes=False)
 @cross_origin()
+@session_required("farmer", always=True)
 def delete_order(order_id):
     try:
-        print(f"🗑️ Deleting order: {order_id}")
+        log.info("Deleting order", extra={"order_id": order_id})
         
-        # Get order details first to restore inventory
-        order = mongo.db.orders.find_one({"_id": ObjectId(order_id)})
+        # Delete and get the order back in one step, so a repeated delete cannot restore stock twice;
+        # the restock and the order.deleted event commit with it
+        def remove(session):
+            order = mongo.db.orders.find_one_and_delete({"_id": ObjectId(order_id), "farmer_email": g.session["email"]},
+                                                        session=session)
+            if not order:
+                return None, None
+            # A bulk-cancelled order's stock is already back on the shelf
+            product = None if order.get("stock_released") else release_stock(ObjectId(order["product_id"]),
+                                                                              order["quantity"], session)
+            outbox.record([order_event("order.deleted", order["_id"], order)], session)
+            return order, product
+
+        order, product = run_transaction(remove)
         if not order:
-            return jsonify({"error": "Order not found"}), 404
-        
-        # Restore product quantity
-        mongo.db.products.update_one(
-            {"_id": ObjectId(order["product_id"])},
-            {"$inc": {"quantity": order["quantity"]}}
-        )
-        
-        # Delete order
-        result = mongo.db.orders.delete_one({"_id": ObjectId(order_id)})
-        if result.deleted_count == 0:
-            return jsonify({"error": "Order not found"}), 404
+            return order_missing(order_id)
+        outbox.notify()
+        invalidate_products(order["product_id"])
+        if product:
+            stock_events.product_changed(order["product_id"], product)
+        invalidate_search()  # restocked products reappear in in_stock searches
             
         return jsonify({"message": "Order deleted successfully and inventory restored"})
     except Exception as e:
-        print("❌ Error deleting order:", str(e))
-        return jsonify({"error": "Failed to delete order"}), 500
\ No newline at end of file
+        log.exception("Error deleting order")
+        return jsonify({"error": "Failed to delete order"}), 500
+
+
+# ---- Async ports of the read routes (asyncio serving mode, see aio.py) ----
+
+@async_view(orders_bp, "get_all_orders", expose_headers=PAGE_HEADERS)
+@admin_required
+async def get_all_orders_async():
+    try:
+        _, response = await list_orders_async({})
+        return response
+    except Exception as e:
+        log.exception("Error fetching all orders")
+        return jsonify({"error": "Failed to fetch orders"}), 500
+
+@async_view(orders_bp, "get_buyer_orders", expose_headers=PAGE_HEADERS)
+@session_required("buyer", email_arg="buyer_email")
+async def get_buyer_orders_async(buyer_email):
+    try:
+        _, response = await list_orders_async({"buyer_email": buyer_email})
+        return response
+    except Exception as e:
+        log.exception("Error fetching buyer orders")
+        return jsonify({"error": "Failed to fetch buyer orders"}), 500
+
+@async_view(orders_bp, "get_farmer_orders", expose_headers=PAGE_HEADERS)
+@session_required("farmer", email_arg="farmer_email")
+async def get_farmer_orders_async(farmer_email):
+    try:
+        _, response = await list_orders_async({"farmer_email": farmer_email})
+        return response
+    except Exception as e:
+        log.exception("Error fetching farmer orders")
+        return jsonify({"error": "Failed to fetch farmer orders"}), 500
+
+@async_view(orders_bp, "get_order")
+@session_required(always=True)
+async def get_order_async(order_id):
+    try:
+        order = await amongo.db.orders.find_one({"_id": ObjectId(order_id)})
+        if not order:
+            return jsonify({"error": "Order not found"}), 404
+        if not can_view_order(order):
+            return jsonify({"error": "Forbidden"}), 403
+        return jsonify(serialize_order(order))
+    except Exception as e:
+        log.exception("Error fetching order")
+        return jsonify({"error": "Failed to fetch order"}), 500
@@ -1,10 +1,25 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, send_file, g, current_app
 from flask_cors import cross_origin
-from models import mongo
+from models import mongo, amongo, run_transaction
+from pymongo.errors import DuplicateKeyError
+from pagination import (PAGE_HEADERS, KEYSET_SORT, parse_page_args, fetch_page, fetch_page_async,
+                        set_next_cursor, build_projection, shape_page)
+from exports import export_query, export_format, stream_export
+from imports import import_format, import_mode, import_products as run_import
+from images import store_image, parse_size, open_image, image_url, image_url_builder
+from cache import (catalog_cache, cached_response, cached_response_async, product_tag, list_head_tag, SEARCH_TAG,
+                   invalidate_products, invalidate_new_product, invalidate_search)
+from search import name_prefixes, search_query
+from inventory import stock_status, parse_statuses, apply_inventory, rebuild_inventory
+from sessions import session_required
+from logs import get_logger
+from aio import async_view
+from live import stock_events, event_stream, StreamsBusy
 from bson import ObjectId
 import datetime
 
 products_bp = Blueprint("products", __name__, url_prefix="/api/products")
+log = get_logger("products")
 
 # ✅ ADD HEALTH CHECK TO PRODUCTS BLUEPRINT
 @products_bp.route("/health", methods=["GET"], strict_slashes=False)
@@ -17,28 +32,68 @@ def products_health_check():
         "message": "Products service is running"
     })
 
-# Helper to convert ObjectId to string
-def serialize_product(p):
+PRODUCT_FIELDS = ("name", "price", "quantity", "image", "farmer_email", "farmer_name", "created_at")
+# "image" is served as a URL built from the stored blob reference
+PRODUCT_FIELD_ALIASES = {"image": ("image_id",)}
+
+# Helper to convert ObjectId to string (optionally restricted to the requested fields)
+def serialize_product(p, fields=None):
     if not p:
         return None
-    return {
+    data = {
         "_id": str(p["_id"]),
-        "name": p["name"],
-        "price": p["price"],
-        "quantity": p["quantity"],
-        "image": p.get("image"),
+        "name": p.get("name"),
+        "price": p.get("price"),
+        "quantity": p.get("quantity"),
+        "image": image_url(p["_id"], p.get("image_id")),
         "farmer_email": p.get("farmer_email", ""),
         "farmer_name": p.get("farmer_name", ""),
         "created_at": p["created_at"].isoformat() if p.get("created_at") else datetime.datetime.utcnow().isoformat()
     }
+    if fields is not None:
+        data = {k: v for k, v in data.items() if k == "_id" or k in fields}
+    return data
+
+# A cached page depends on every product it shows; first pages also on newly added products
+def page_cache_tags(products, page, farmer_email=None):
+    tags = [product_tag(p["_id"]) for p in products]
+    if page.cursor is None:
+        tags.append(list_head_tag(farmer_email))
+    return tags
+
+def search_cache_tags(products):
+    return [product_tag(p["_id"]) for p in products] + [SEARCH_TAG]
+
+# What serialize_product writes for fields a legacy document lacks
+PRODUCT_DEFAULTS = {"name": None, "price": None, "quantity": None, "image": None,
+                    "farmer_email": "", "farmer_name": ""}
+
+# A listing page is the projected documents themselves; only the image URL is derived per product
+def shape_products(products, fields):
+    if "image" in fields:
+        build_url = image_url_builder()
+        for p in products:
+            if p.get("image_id"):
+                p["image"] = build_url(p["_id"], p["image_id"])
+    return shape_page(products, fields, {**PRODUCT_DEFAULTS, "created_at": datetime.datetime.utcnow()})
 
-# Add product
+# Low-stock listings also say which status each product is in
+LOW_STOCK_FIELDS = PRODUCT_FIELDS + ("stock_status",)
+
+# Body of a product listing page (shared by the sync views and their async ports)
+def product_page(products, next_token, page, tags):
+    g.cache_tags = tags
+    response = jsonify(shape_products(products, page.fields))
+    return set_next_cursor(response, next_token)
+
+# Add product (for the signed-in farmer only)
 @products_bp.route("/", methods=["POST"], strict_slashes=False)
 @cross_origin()
+@session_required("farmer", email_field="farmer_email", always=True)
 def add_product():
     try:
         data = request.get_json()
-        print("📦 Received product data:", data)
+        log.debug("Received product", extra={"farmer_email": data.get("farmer_email"), "product_name": data.get("name")})
         
         name = data.get("name")
         price = data.get("price")
@@ -54,98 +109,406 @@ def add_product():
             "name": name,
             "price": float(price),
             "quantity": int(quantity),
-            "image": image,
             "farmer_email": farmer_email,
             "farmer_name": farmer_name,
+            "name_prefixes": name_prefixes(name),
             "created_at": datetime.datetime.utcnow()
         }
+        product["stock_status"] = stock_status(product["quantity"])
+
+        # Keep only a reference to the content-addressed blob on the product
+        if image:
+            try:
+                product.update(store_image(image))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
 
-        res = mongo.db.products.insert_one(product)
-        product["_id"] = str(res.inserted_id)
-        print("✅ Product saved successfully:", product["_id"])
+        # The product and the farmer's inventory totals commit together
+        def add(session):
+            res = mongo.db.products.insert_one(product, session=session)
+            apply_inventory(mongo.db, {farmer_email: (1, product["quantity"])}, session)
+            return res.inserted_id
+
+        try:
+            inserted_id = run_transaction(add)
+        except DuplicateKeyError:
+            return duplicate_name(name)
+        product.pop("name_prefixes")
+        product["_id"] = str(inserted_id)
+        invalidate_new_product(farmer_email)
+        log.info("Product saved", extra={"product_id": product["_id"], "farmer_email": farmer_email})
         return jsonify(serialize_product(product)), 201
     except Exception as e:
-        print("❌ Error saving product:", str(e))
+        log.exception("Error saving product")
         return jsonify({"error": "Failed to save product", "details": str(e)}), 500
 
-# Get all products (for buyers to see all products)
+# Get all products (for buyers to see all products), one keyset page at a time
 @products_bp.route("/", methods=["GET"], strict_slashes=False)
-@cross_origin()
+@cross_origin(expose_headers=PAGE_HEADERS)
+@cached_response
 def get_products():
     try:
-        products = list(mongo.db.products.find().sort("created_at", -1))
-        print(f"📊 Returning {len(products)} products")
-        return jsonify([serialize_product(p) for p in products])
+        page = parse_page_args(request.args, PRODUCT_FIELDS, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        products, next_token = fetch_page(mongo.db.products, {}, page, PRODUCT_FIELD_ALIASES)
+        log.debug("Returning products", extra={"count": len(products)})
+        return product_page(products, next_token, page, page_cache_tags(products, page))
     except Exception as e:
-        print("❌ Error fetching products:", str(e))
+        log.exception("Error fetching products")
         return jsonify({"error": "Failed to fetch products"}), 500
 
+# Search the catalog: ?q= (as-you-type prefixes, or whole words with match=text), filters
+# min_price, max_price, farmer, in_stock; sort newest | price_asc | price_desc; keyset pages
+@products_bp.route("/search", methods=["GET"], strict_slashes=False)
+@cross_origin(expose_headers=PAGE_HEADERS)
+@cached_response
+def search_products():
+    try:
+        query, sort = search_query(request.args)
+        page = parse_page_args(request.args, PRODUCT_FIELDS, PRODUCT_FIELDS, sort)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        log.debug("Searching products", extra={"filter": query})
+        products, next_token = fetch_page(mongo.db.products, query, page, PRODUCT_FIELD_ALIASES, sort)
+        return product_page(products, next_token, page, search_cache_tags(products))
+    except Exception as e:
+        log.exception("Error searching products")
+        return jsonify({"error": "Failed to search products"}), 500
+
+# ✅ Low-stock alerts across the catalog: products whose stock_status is in ?status= (default
+# out,low), optionally for one ?farmer=, newest first in keyset pages. Not cached: every sale
+# can move a product in or out of the list.
+@products_bp.route("/low-stock", methods=["GET"], strict_slashes=False)
+@cross_origin(expose_headers=PAGE_HEADERS)
+def low_stock_products():
+    try:
+        statuses = parse_statuses(request.args.get("status"))
+        page = parse_page_args(request.args, LOW_STOCK_FIELDS, LOW_STOCK_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        query = {"stock_status": statuses[0] if len(statuses) == 1 else {"$in": list(statuses)}}
+        if request.args.get("farmer"):
+            query["farmer_email"] = request.args["farmer"]
+        products, next_token = fetch_page(mongo.db.products, query, page, PRODUCT_FIELD_ALIASES)
+        log.debug("Returning low-stock products", extra={"statuses": statuses, "count": len(products)})
+        return set_next_cursor(jsonify(shape_products(products, page.fields)), next_token)
+    except Exception as e:
+        log.exception("Error fetching low-stock products")
+        return jsonify({"error": "Failed to fetch low-stock products"}), 500
+
+# Stream the catalog as NDJSON or CSV (?format=, filters: farmer, from, to)
+@products_bp.route("/export", methods=["GET"], strict_slashes=False)
+@cross_origin()
+def export_products():
+    try:
+        query = export_query(request.args, ("farmer",))
+        fmt = export_format(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        log.info("Exporting products", extra={"format": fmt, "filter": query})
+        projection = build_projection(PRODUCT_FIELDS, PRODUCT_FIELD_ALIASES)
+        cursor = mongo.db.products.find(query, projection).sort(KEYSET_SORT)
+        return stream_export(cursor, serialize_product, ("_id",) + PRODUCT_FIELDS, fmt, "products")
+    except Exception as e:
+        log.exception("Error exporting products")
+        return jsonify({"error": "Failed to export products"}), 500
+
+# ✅ Bulk import a farmer's catalog from a CSV (header row with name, price, quantity) or NDJSON
+# upload. The body is read, validated and written in unordered batches as it arrives, so memory
+# stays flat on large files; ?mode=upsert updates products matched by (farmer_email, name).
+# Answers 201 when every row was written, 207 when some failed (see "errors"), 400 when all did, and
+# 413 when the upload ran past IMPORT_MAX_BYTES (the rows before the limit are written; "truncated").
+@products_bp.route("/farmer/<farmer_email>/import", methods=["POST"], strict_slashes=False)
+@cross_origin()
+@session_required("farmer", email_arg="farmer_email")
+def import_farmer_products(farmer_email):
+    config = current_app.config
+    try:
+        fmt = import_format(request.args, request.mimetype)
+        mode = import_mode(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if request.content_length and request.content_length > config["IMPORT_MAX_BYTES"]:
+        return jsonify({"error": f"Uploads are limited to {config['IMPORT_MAX_BYTES']} bytes"}), 413
+    try:
+        log.info("Importing products", extra={"farmer_email": farmer_email, "format": fmt, "mode": mode})
+        summary = run_import(mongo.db.products, request.stream, fmt, mode, farmer_email,
+                             request.args.get("farmer_name"), config["IMPORT_BATCH_SIZE"],
+                             config["IMPORT_MAX_ERRORS"], config["IMPORT_MAX_LINE_BYTES"], config["IMPORT_MAX_BYTES"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        log.exception("Error importing products")
+        return jsonify({"error": "Failed to import products"}), 500
+
+    if summary["inserted"]:
+        invalidate_new_product(farmer_email)
+    if summary["updated"]:
+        # Upserts don't report which products they matched: drop every cached page
+        catalog_cache.clear()
+    if summary["inserted"] or summary["updated"]:
+        # Upserts don't report the quantities they replaced: recount this farmer's inventory
+        rebuild_inventory(mongo.db, farmer_email)
+        stock_events.catalog_changed()
+    log.info("Products imported", extra={"farmer_email": farmer_email, **{k: summary[k] for k in
+                                          ("rows", "inserted", "updated", "failed", "truncated")}})
+    written = summary["inserted"] + summary["updated"]
+    if summary["truncated"]:
+        status = 413
+    else:
+        status = 201 if not summary["failed"] else 207 if written else 400
+    return jsonify(summary), status
+
+# ✅ Live stock: a Server-Sent Events stream of new quantities/prices and deletions (?ids= limits it to
+# some products). Reconnecting clients send Last-Event-ID and get what they missed, or a "reset"
+# event telling them to refetch.
+@products_bp.route("/stream", methods=["GET"], strict_slashes=False)
+@cross_origin()
+def stream_products():
+    product_ids = {i.strip() for i in request.args.get("ids", "").split(",") if i.strip()} or None
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        subscription, reset = stock_events.subscribe(last_event_id, product_ids)
+    except StreamsBusy as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    response = Response(event_stream(subscription, reset, stock_events.heartbeat, stock_events.max_seconds),
+                        mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
+
 # Get products by specific farmer (for farmer's dashboard)
 @products_bp.route("/farmer/<farmer_email>", methods=["GET"], strict_slashes=False)
-@cross_origin()
+@cross_origin(expose_headers=PAGE_HEADERS)
+@cached_response
 def get_farmer_products(farmer_email):
     try:
-        print(f"👨‍🌾 Fetching products for farmer: {farmer_email}")
-        products = list(mongo.db.products.find({"farmer_email": farmer_email}).sort("created_at", -1))
-        print(f"📊 Found {len(products)} products for {farmer_email}")
-        return jsonify([serialize_product(p) for p in products])
+        page = parse_page_args(request.args, PRODUCT_FIELDS, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        products, next_token = fetch_page(mongo.db.products, {"farmer_email": farmer_email}, page, PRODUCT_FIELD_ALIASES)
+        log.debug("Returning farmer products", extra={"farmer_email": farmer_email, "count": len(products)})
+        return product_page(products, next_token, page, page_cache_tags(products, page, farmer_email))
     except Exception as e:
-        print("❌ Error fetching farmer products:", str(e))
+        log.exception("Error fetching farmer products")
         return jsonify({"error": "Failed to fetch farmer products"}), 500
 
+def product_response(product_id, product):
+    if not product:
+        return jsonify({"error": "Product not found"}), 404
+    g.cache_tags = [product_tag(product_id)]
+    return jsonify(serialize_product(product))
+
 # Get single product by ID
 @products_bp.route("/<product_id>", methods=["GET"], strict_slashes=False)
 @cross_origin()
+@cached_response
 def get_product(product_id):
     try:
-        print(f"🔍 Fetching product: {product_id}")
-        product = mongo.db.products.find_one({"_id": ObjectId(product_id)})
-        if not product:
-            return jsonify({"error": "Product not found"}), 404
-        return jsonify(serialize_product(product))
+        log.debug("Fetching product", extra={"product_id": product_id})
+        product = mongo.db.products.find_one({"_id": ObjectId(product_id)},
+                                             build_projection(PRODUCT_FIELDS, PRODUCT_FIELD_ALIASES))
+        return product_response(product_id, product)
     except Exception as e:
-        print("❌ Error fetching product:", str(e))
+        log.exception("Error fetching product")
         return jsonify({"error": "Failed to fetch product"}), 500
 
+# Farmers change only their own products: 403 for someone else's, 404 when there is none
+def product_missing(product_id):
+    if mongo.db.products.find_one({"_id": ObjectId(product_id)}, {"_id": 1}):
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"error": "Product not found"}), 404
+
+# The unique (farmer_email, name) index: a farmer lists each product name once
+def duplicate_name(name):
+    return jsonify({"error": f"You already have a product named {name!r}"}), 409
+
 # Delete product
 @products_bp.route("/<product_id>", methods=["DELETE"], strict_slashes=False)
 @cross_origin()
+@session_required("farmer", always=True)
 def delete_product(product_id):
     try:
-        print(f"🗑️ Deleting product: {product_id}")
-        result = mongo.db.products.delete_one({"_id": ObjectId(product_id)})
-        if result.deleted_count == 0:
-            return jsonify({"error": "Product not found"}), 404
+        log.info("Deleting product", extra={"product_id": product_id})
+        def remove(session):
+            product = mongo.db.products.find_one_and_delete({"_id": ObjectId(product_id),
+                                                             "farmer_email": g.session["email"]},
+                                                            projection={"farmer_email": 1, "quantity": 1},
+                                                            session=session)
+            if product:
+                apply_inventory(mongo.db, {product["farmer_email"]: (-1, -product.get("quantity", 0))}, session)
+            return product
+
+        if not run_transaction(remove):
+            return product_missing(product_id)
+        invalidate_products(product_id)
+        stock_events.product_deleted(product_id)
         return jsonify({"message": "Product deleted successfully"})
     except Exception as e:
-        print("❌ Error deleting product:", str(e))
+        log.exception("Error deleting product")
         return jsonify({"error": "Failed to delete product"}), 500
 
 # Update product
 @products_bp.route("/<product_id>", methods=["PUT"], strict_slashes=False)
 @cross_origin()
+@session_required("farmer", always=True)
 def update_product(product_id):
     try:
         data = request.get_json()
-        print(f"✏️ Updating product {product_id} with data:", data)
+        log.info("Updating product", extra={"product_id": product_id, "fields": sorted(data)})
         
         update_data = {
             "name": data.get("name"),
             "price": float(data.get("price")),
             "quantity": int(data.get("quantity")),
+            "name_prefixes": name_prefixes(data.get("name")),
         }
+        update_data["stock_status"] = stock_status(update_data["quantity"])
+        update = {"$set": update_data}
         if "image" in data and data["image"]:
-            update_data["image"] = data["image"]
+            try:
+                update_data.update(store_image(data["image"]))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            update["$unset"] = {"image": ""}
 
-        result = mongo.db.products.update_one(
-            {"_id": ObjectId(product_id)}, 
-            {"$set": update_data}
-        )
-        
-        if result.matched_count == 0:
-            return jsonify({"error": "Product not found"}), 404
+        # The farmer's stock total moves by the difference, in the same transaction
+        def change(session):
+            previous = mongo.db.products.find_one_and_update(
+                {"_id": ObjectId(product_id), "farmer_email": g.session["email"]},
+                update,
+                projection={"farmer_email": 1, "quantity": 1},
+                session=session
+            )
+            if previous:
+                delta = update_data["quantity"] - previous.get("quantity", 0)
+                apply_inventory(mongo.db, {previous["farmer_email"]: (0, delta)}, session)
+            return previous
+
+        try:
+            changed = run_transaction(change)
+        except DuplicateKeyError:
+            return duplicate_name(update_data["name"])
+        if not changed:
+            return product_missing(product_id)
+        invalidate_products(product_id)
+        invalidate_search()
+        stock_events.product_changed(product_id, update_data)
             
         return jsonify({"message": "Product updated successfully"})
     except Exception as e:
-        print("❌ Error updating product:", str(e))
-        return jsonify({"error": "Failed to update product"}), 500
\ No newline at end of file
+        log.exception("Error updating product")
+        return jsonify({"error": "Failed to update product"}), 500
+
+# Serve a product image (original or fixed-size thumbnail) with a strong ETag
+@products_bp.route("/<product_id>/image", methods=["GET"], strict_slashes=False)
+@cross_origin()
+def get_product_image(product_id):
+    try:
+        size = parse_size(request.args.get("size"))
+        product_object_id = ObjectId(product_id)
+    except Exception as e:
+        return jsonify({"error": str(e) or "Invalid request"}), 400
+
+    try:
+        product = mongo.db.products.find_one(
+            {"_id": product_object_id},
+            {"image_id": 1, "image_type": 1}
+        )
+        if not product or not product.get("image_id"):
+            return jsonify({"error": "Image not found"}), 404
+
+        image_id = product["image_id"]
+        path, mimetype, served_size = open_image(image_id, product.get("image_type"), size)
+        if not path:
+            return jsonify({"error": "Image not found"}), 404
+
+        # Blobs are content-addressed, so a URL pinned to the hash (?v=) never changes
+        pinned = request.args.get("v") == image_id[:16]
+        response = send_file(
+            path,
+            mimetype=mimetype,
+            etag=f"{image_id}-{served_size}",
+            conditional=True,
+            max_age=31536000 if pinned else 0,
+        )
+        if pinned:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+    except Exception as e:
+        log.exception("Error serving product image")
+        return jsonify({"error": "Failed to fetch product image"}), 500
+
+# ✅ Catalog cache counters (for tuning size and TTL)
+@products_bp.route("/cache-stats", methods=["GET"], strict_slashes=False)
+@cross_origin()
+def catalog_cache_stats():
+    return jsonify(catalog_cache.stats())
+
+
+# ---- Async ports of the read routes (asyncio serving mode, see aio.py) ----
+
+@async_view(products_bp, "get_products", expose_headers=PAGE_HEADERS)
+@cached_response_async
+async def get_products_async():
+    try:
+        page = parse_page_args(request.args, PRODUCT_FIELDS, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        products, next_token = await fetch_page_async(amongo.db.products, {}, page, PRODUCT_FIELD_ALIASES)
+        return product_page(products, next_token, page, page_cache_tags(products, page))
+    except Exception as e:
+        log.exception("Error fetching products")
+        return jsonify({"error": "Failed to fetch products"}), 500
+
+@async_view(products_bp, "search_products", expose_headers=PAGE_HEADERS)
+@cached_response_async
+async def search_products_async():
+    try:
+        query, sort = search_query(request.args)
+        page = parse_page_args(request.args, PRODUCT_FIELDS, PRODUCT_FIELDS, sort)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        products, next_token = await fetch_page_async(amongo.db.products, query, page, PRODUCT_FIELD_ALIASES, sort)
+        return product_page(products, next_token, page, search_cache_tags(products))
+    except Exception as e:
+        log.exception("Error searching products")
+        return jsonify({"error": "Failed to search products"}), 500
+
+@async_view(products_bp, "get_farmer_products", expose_headers=PAGE_HEADERS)
+@cached_response_async
+async def get_farmer_products_async(farmer_email):
+    try:
+        page = parse_page_args(request.args, PRODUCT_FIELDS, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        products, next_token = await fetch_page_async(amongo.db.products, {"farmer_email": farmer_email}, page,
+                                                      PRODUCT_FIELD_ALIASES)
+        return product_page(products, next_token, page, page_cache_tags(products, page, farmer_email))
+    except Exception as e:
+        log.exception("Error fetching farmer products")
+        return jsonify({"error": "Failed to fetch farmer products"}), 500
+
+@async_view(products_bp, "get_product")
+@cached_response_async
+async def get_product_async(product_id):
+    try:
+        product = await amongo.db.products.find_one({"_id": ObjectId(product_id)},
+                                                    build_projection(PRODUCT_FIELDS, PRODUCT_FIELD_ALIASES))
+        return product_response(product_id, product)
+    except Exception as e:
+        log.exception("Error fetching product")
+        return jsonify({"error": "Failed to fetch product"}), 500
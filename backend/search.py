@@ -0,0 +1,87 @@
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pagination import KEYSET_SORT
+import re
+
+# Autocomplete: every product stores the lowercased prefixes of each word of its name
+# ("Red Tomato" -> r, re, red, t, to, ...), so a typed prefix is one equality on a multikey index.
+MAX_PREFIX_LENGTH = 15
+WORD = re.compile(r"\w+")
+
+# ?sort= values for GET /api/products/search; every sort ends on _id so keyset pages are stable
+SEARCH_SORTS = {
+    "newest": KEYSET_SORT,
+    "price_asc": [("price", ASCENDING), ("_id", ASCENDING)],
+    "price_desc": [("price", DESCENDING), ("_id", DESCENDING)],
+}
+# ?match=prefix (as-you-type, default) or ?match=text (whole words, stemmed, via the text index)
+MATCH_MODES = ("prefix", "text")
+
+
+def search_terms(text):
+    return [w[:MAX_PREFIX_LENGTH] for w in WORD.findall((text or "").lower())]
+
+
+def name_prefixes(name):
+    prefixes = set()
+    for word in search_terms(name):
+        prefixes.update(word[:n] for n in range(1, len(word) + 1))
+    return sorted(prefixes)
+
+
+def _parse_price(args, name):
+    try:
+        price = float(args[name])
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if price < 0:
+        raise ValueError(f"{name} must not be negative")
+    return price
+
+
+# Build (query, sort) from ?q=&match=&min_price=&max_price=&farmer=&in_stock=&sort=
+def search_query(args):
+    sort_name = args.get("sort") or "newest"
+    if sort_name not in SEARCH_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SEARCH_SORTS)}")
+    match = args.get("match") or "prefix"
+    if match not in MATCH_MODES:
+        raise ValueError(f"match must be one of {', '.join(MATCH_MODES)}")
+
+    query = {}
+    q = (args.get("q") or "").strip()
+    if q and match == "text":
+        query["$text"] = {"$search": q}
+    elif q:
+        terms = search_terms(q)
+        if terms:
+            query["name_prefixes"] = {"$all": terms} if len(terms) > 1 else terms[0]
+
+    price = {}
+    if args.get("min_price"):
+        price["$gte"] = _parse_price(args, "min_price")
+    if args.get("max_price"):
+        price["$lte"] = _parse_price(args, "max_price")
+    if price:
+        query["price"] = price
+
+    if args.get("farmer"):
+        query["farmer_email"] = args["farmer"]
+    if args.get("in_stock", "").lower() in ("1", "true", "yes"):
+        query["quantity"] = {"$gt": 0}
+
+    return query, SEARCH_SORTS[sort_name]
+
+
+# Backfill name_prefixes on products stored before search existed; returns how many were updated
+def backfill_name_prefixes(products, batch_size=500):
+    updated = 0
+    requests = []
+    for product in products.find({"name_prefixes": {"$exists": False}}, {"name": 1}):
+        requests.append(UpdateOne({"_id": product["_id"]},
+                                  {"$set": {"name_prefixes": name_prefixes(product.get("name"))}}))
+        if len(requests) >= batch_size:
+            updated += products.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        updated += products.bulk_write(requests, ordered=False).modified_count
+    return updated
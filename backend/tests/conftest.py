@@ -0,0 +1,63 @@
+"""Shared fixtures: the app on a scratch database.
+
+Runs on an in-process mongomock stand-in by default; set MONGO_TEST_URI to a scratch database on a
+real mongod (it is dropped afterwards) to run the same tests against the server.
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_URI = os.environ.get("MONGO_TEST_URI")
+
+
+# mongod applies each single-document update atomically; mongomock's find-and-modify is a read then a
+# write, so concurrent tests serialize it to get the server's guarantee
+def _atomic_mongomock(monkeypatch):
+    from mongomock.collection import Collection
+    lock = threading.RLock()
+    find_and_modify = Collection._find_and_modify
+
+    def locked(self, *args, **kwargs):
+        with lock:
+            return find_and_modify(self, *args, **kwargs)
+    monkeypatch.setattr(Collection, "_find_and_modify", locked)
+
+
+# Tests override this fixture to change settings for their module
+@pytest.fixture
+def app_config():
+    return {}
+
+
+@pytest.fixture
+def app(monkeypatch, app_config):
+    if not TEST_URI:
+        pytest.importorskip("mongomock")
+    from app import create_app
+    from models import mongo
+    app = create_app({
+        "TESTING": True,
+        "MONGO_URI": TEST_URI or "mongodb://localhost:27017/farm2home_test",
+        "CREATE_INDEXES_ON_STARTUP": bool(TEST_URI),
+        "OUTBOX_WORKER_THREAD": False,
+        "LIVE_CHANGE_STREAMS": False,
+        "LOG_LEVEL": "WARNING",
+        **app_config,
+    })
+    if not TEST_URI:
+        from bench.common import connect
+        _atomic_mongomock(monkeypatch)
+        mongo.use_client(connect(in_process=True).client)
+    yield app
+    mongo.db.client.drop_database(mongo.db.name)
+    mongo.reset()
+
+
+@pytest.fixture
+def db(app):
+    from models import mongo
+    return mongo.db
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+from bench.fake_market_upstream import FakeUpstream
+
+TTL = 0.5
+PATH = "/api/market-prices?commodity=Onion&state=Karnataka"
+
+
+@pytest.fixture
+def upstream():
+    upstream = FakeUpstream().start()
+    yield upstream
+    upstream.stop()
+
+
+@pytest.fixture
+def app_config(upstream):
+    return {
+        "MARKET_PRICES_API_URL": upstream.url,
+        "MARKET_PRICES_API_KEY": "test-key",
+        "MARKET_PRICES_TTL": TTL,
+        "MARKET_PRICES_RETRY_AFTER": 60,
+    }
+
+
+def get(app, path=PATH):
+    response = app.test_client().get(path)
+    return response.status_code, response.headers.get("X-Cache"), response.get_json()
+
+
+def test_concurrent_lookups_share_one_upstream_call(app, upstream):
+    upstream.delay = 0.3
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        answers = list(pool.map(lambda _: get(app), range(10)))
+
+    assert upstream.calls == 1
+    assert [status for status, _, _ in answers] == [200] * 10
+    assert sorted(state for _, state, _ in answers) == ["COALESCED"] * 9 + ["MISS"]
+    assert len({str(body["records"]) for _, _, body in answers}) == 1
+
+
+def test_answers_are_cached_until_the_ttl_expires(app, upstream):
+    assert get(app)[1] == "MISS"
+    assert get(app)[1] == "HIT"
+    assert get(app, "/api/market-prices?state=Karnataka&commodity= Onion")[1] == "HIT"
+    assert upstream.calls == 1
+
+    time.sleep(TTL + 0.1)
+    assert get(app)[1] == "MISS"
+    assert upstream.calls == 2
+
+
+def test_stale_answer_served_while_upstream_fails(app, upstream):
+    status, _, fresh = get(app)
+    assert status == 200
+    upstream.failing = True
+    time.sleep(TTL + 0.1)
+
+    status, state, body = get(app)
+    assert (status, state, body["stale"]) == (200, "STALE", True)
+    assert body["records"] == fresh["records"]
+    assert upstream.calls == 2
+
+    # Within MARKET_PRICES_RETRY_AFTER the failed upstream is not asked again
+    assert get(app)[1] == "STALE"
+    assert upstream.calls == 2
+
+    # Nothing cached for these filters: the failure surfaces
+    assert get(app, "/api/market-prices?commodity=Potato")[0] == 502
+
+
+@pytest.mark.parametrize("app_config", [{"MARKET_PRICES_API_KEY": ""}])
+def test_unconfigured_service_answers_503(app, upstream):
+    status, _, body = get(app)
+    assert status == 503
+    assert "not configured" in body["error"]
+    assert upstream.calls == 0
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+import datetime
+
+STOCK = 20
+ORDERS = 100
+WORKERS = 16
+
+
+def seed_product(db, quantity=STOCK):
+    return str(db.products.insert_one({
+        "name": "Test Tomatoes",
+        "price": 40.0,
+        "quantity": quantity,
+        "stock_status": "good",
+        "farmer_email": "farmer@example.com",
+        "farmer_name": "Test Farmer",
+        "created_at": datetime.datetime.utcnow(),
+    }).inserted_id)
+
+
+def place_in_parallel(app, path, bodies):
+    def post(body):
+        return app.test_client().post(path, json=body).status_code
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        return list(pool.map(post, bodies))
+
+
+def test_parallel_orders_never_oversell(app, db):
+    product_id = seed_product(db)
+    statuses = place_in_parallel(app, "/api/orders", [
+        {"product_id": product_id, "buyer_email": f"buyer{i}@example.com", "quantity": 1} for i in range(ORDERS)
+    ])
+
+    product = db.products.find_one({"farmer_email": "farmer@example.com"})
+    assert product["quantity"] >= 0
+    assert statuses.count(201) == STOCK
+    assert statuses.count(400) == ORDERS - STOCK
+    assert db.orders.count_documents({"product_id": product_id}) == STOCK
+    assert product["quantity"] == 0
+    assert product["stock_status"] == "out"
+
+
+def test_parallel_batches_never_oversell(app, db):
+    first, second = seed_product(db), seed_product(db, quantity=STOCK // 2)
+    statuses = place_in_parallel(app, "/api/orders/batch", [
+        {"buyer_email": f"buyer{i}@example.com", "mode": "best_effort",
+         "items": [{"product_id": first, "quantity": 1}, {"product_id": second, "quantity": 1}]}
+        for i in range(ORDERS)
+    ])
+
+    assert set(statuses) <= {201, 207, 409}
+    for product_id, stock in ((first, STOCK), (second, STOCK // 2)):
+        quantity = db.products.find_one({"_id": ObjectId(product_id)})["quantity"]
+        assert quantity == 0
+        assert db.orders.count_documents({"product_id": product_id}) == stock
@@ -0,0 +1,47 @@
+from logs import get_logger
+import datetime
+import os
+import threading
+
+log = get_logger("workers")
+
+
+# Readiness of this worker process: it has its own Mongo client and the deployment answered a ping.
+# Gunicorn's post_worker_init hook calls warm_up(); other servers warm up on the first readiness probe.
+class WorkerState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.started_at = datetime.datetime.utcnow()
+        self.ready = False
+        self.error = None
+        self.checked_at = None
+
+    def warm_up(self, mongo):
+        with self._lock:
+            if self.pid != os.getpid():
+                self._reset()
+            try:
+                mongo.cx.admin.command("ping")
+                self.ready, self.error = True, None
+            except Exception as e:
+                self.ready, self.error = False, str(e)
+                log.warning("Worker not ready", extra={"pid": self.pid, "error": self.error})
+            self.checked_at = datetime.datetime.utcnow()
+        return self.ready
+
+    def status(self):
+        current = self.pid == os.getpid()
+        return {
+            "pid": os.getpid(),
+            "ready": self.ready and current,
+            "started_at": self.started_at.isoformat() if current else None,
+            "checked_at": self.checked_at.isoformat() if current and self.checked_at else None,
+            "error": self.error if current else None,
+        }
+
+
+worker_state = WorkerState()
@@ -0,0 +1,50 @@
+// Authorization header for the logged-in user's session token (if any)
+export function authHeaders() {
+  const user = JSON.parse(localStorage.getItem("ib_user") || "null");
+  return user && user.token ? { Authorization: `Bearer ${user.token}` } : {};
+}
+
+// One page of a keyset-paginated list endpoint: { items, next }, where `next` is the X-Next-Cursor
+// to pass back as `after` for the following page (null on the last page)
+export async function fetchPage(url, { limit = 50, fields, after = null, signal } = {}) {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (fields) params.set("fields", fields.join(","));
+  if (after) params.set("next", after);
+
+  const separator = url.includes("?") ? "&" : "?";
+  const res = await fetch(`${url}${separator}${params}`, { headers: authHeaders(), signal });
+  if (!res.ok) throw new Error(`Request failed with status ${res.status}`);
+
+  return { items: await res.json(), next: res.headers.get("X-Next-Cursor") };
+}
+
+// Walk a keyset-paginated list endpoint, following the X-Next-Cursor header until the last page
+// (from the first page, or from the page after an earlier `after` cursor)
+export async function fetchAllPages(url, { limit = 200, fields, after = null } = {}) {
+  const items = [];
+  let next = after;
+
+  do {
+    const page = await fetchPage(url, { limit, fields, after: next });
+    items.push(...page.items);
+    next = page.next;
+  } while (next);
+
+  return items;
+}
+
+// Farmer dashboard sections in one request; the remaining sales pages (if any) follow orders_next
+export async function fetchDashboard(email, sections) {
+  const params = sections ? `?sections=${sections.join(",")}` : "";
+  const res = await fetch(`http://localhost:5000/api/farmer/${email}/dashboard${params}`, { headers: authHeaders() });
+  if (!res.ok) throw new Error(`Request failed with status ${res.status}`);
+  const dashboard = await res.json();
+  if (dashboard.orders_next) {
+    const rest = await fetchAllPages(`http://localhost:5000/api/orders/farmer/${email}`, { after: dashboard.orders_next });
+    dashboard.orders = dashboard.orders.concat(rest);
+  }
+  return dashboard;
+}
+
+// Product fields rendered by the catalog and farmer dashboard (list pages omit the image by default)
+export const PRODUCT_CARD_FIELDS = ["name", "price", "quantity", "image", "farmer_email", "farmer_name", "created_at"];
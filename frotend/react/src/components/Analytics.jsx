@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from "react";
 import { Line, Bar, Doughnut } from "react-chartjs-2";
 import { Chart as ChartJS, LineElement, BarElement, ArcElement, CategoryScale, LinearScale, PointElement, Tooltip, Legend } from "chart.js";
+import { authHeaders } from "../api";
 
 ChartJS.register(LineElement, BarElement, ArcElement, CategoryScale, LinearScale, PointElement, Tooltip, Legend);
 
@@ -22,7 +23,7 @@ export default function Analytics() {
   const fetchAnalyticsData = async (email) => {
     try {
       setLoading(true);
-      const response = await fetch(`http://localhost:5000/api/analytics/farmer/${email}`);
+      const response = await fetch(`http://localhost:5000/api/analytics/farmer/${email}`, { headers: authHeaders() });
       
       if (response.ok) {
         const data = await response.json();
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import axios from "axios";
+import { authHeaders } from "../api";
 import { FaSave, FaPhone, FaMapMarker, FaBuilding, FaEdit } from "react-icons/fa";
 
 // API configuration
@@ -24,7 +25,7 @@ export default function BuyerProfile({ user, onLogout, notifications }) {
     setLoading(true);
 
     axios
-      .get(`${API_BASE_URL}/api/buyer/${user.email}`)
+      .get(`${API_BASE_URL}/api/buyer/${user.email}`, { headers: authHeaders() })
       .then((res) => {
         const data = res.data;
         setProfile({
@@ -87,9 +88,9 @@ export default function BuyerProfile({ user, onLogout, notifications }) {
     
     setIsSaving(true);
     try {
-      await axios.post(`${API_BASE_URL}/api/buyer`, profile);
+      await axios.post(`${API_BASE_URL}/api/buyer`, profile, { headers: authHeaders() });
 
-      const res = await axios.get(`${API_BASE_URL}/api/buyer/${user.email}`);
+      const res = await axios.get(`${API_BASE_URL}/api/buyer/${user.email}`, { headers: authHeaders() });
       const updatedData = res.data;
       setProfile({
         name: updatedData.name || "",
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import axios from "axios";
+import { authHeaders } from "../api";
 import { FaSave, FaPhone, FaMapMarker, FaSeedling, FaChartArea, FaCalendarAlt, FaEdit } from "react-icons/fa";
 
 // API configuration
@@ -25,7 +26,7 @@ export default function FarmerProfile({ user, onLogout, notifications }) {
     setLoading(true);
 
     axios
-      .get(`${API_BASE_URL}/api/farmer/${user.email}`)
+      .get(`${API_BASE_URL}/api/farmer/${user.email}`, { headers: authHeaders() })
       .then((res) => {
         const data = res.data;
         setProfile({
@@ -100,9 +101,9 @@ export default function FarmerProfile({ user, onLogout, notifications }) {
       await axios.post(`${API_BASE_URL}/api/farmer`, {
         ...profile,
         crops: cropsArray
-      });
+      }, { headers: authHeaders() });
 
-      const res = await axios.get(`${API_BASE_URL}/api/farmer/${user.email}`);
+      const res = await axios.get(`${API_BASE_URL}/api/farmer/${user.email}`, { headers: authHeaders() });
       const updatedData = res.data;
       setProfile({
         name: updatedData.name || "",
@@ -33,7 +33,8 @@ export default function Login({ onLogin }) {
         return;
       }
 
-      const user = data.user;
+      // Keep the signed session token with the user; api.js sends it as a Bearer header
+      const user = { ...data.user, token: data.token };
       localStorage.setItem("ib_user", JSON.stringify(user));
       onLogin && onLogin(user);
 
@@ -12,21 +12,24 @@ export default function MarketPrices() {
   const [prices, setPrices] = useState([]);
   const [totalRevenue, setTotalRevenue] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [stale, setStale] = useState(false);
 
-  const apiKey = "579b464db66ec23bdd000001cdd3946e44ce4aad7209ff7b23ac571b";
-  const baseUrl = "https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070";
+  // data.gov.in is reached through the backend, which caches and shares identical lookups
+  const fetchRecords = async (filters) => {
+    const res = await fetch(`http://localhost:5000/api/market-prices?${new URLSearchParams(filters)}`);
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.error || `Request failed with status ${res.status}`);
+    setStale(data.stale);
+    return data.records;
+  };
 
   const fetchStates = async (crop) => {
     setState(""); setMarket(""); setMarkets([]); setPrices([]); setTotalRevenue(null);
     if (!crop) return;
     setLoading(true);
     try {
-      const res = await fetch(`${baseUrl}?api-key=${apiKey}&format=json&limit=100&filters[commodity]=${crop}`);
-      const data = await res.json();
-      if (data.records) {
-        const uniqueStates = [...new Set(data.records.map((r) => r.state))];
-        setStates(uniqueStates);
-      }
+      const records = await fetchRecords({ commodity: crop, limit: 100 });
+      setStates([...new Set(records.map((r) => r.state))]);
     } catch (err) {
       console.error(err); alert("Failed to fetch states.");
     } finally { setLoading(false); }
@@ -37,12 +40,8 @@ export default function MarketPrices() {
     if (!crop || !stateName) return;
     setLoading(true);
     try {
-      const res = await fetch(`${baseUrl}?api-key=${apiKey}&format=json&limit=100&filters[commodity]=${crop}&filters[state]=${stateName}`);
-      const data = await res.json();
-      if (data.records) {
-        const uniqueMarkets = [...new Set(data.records.map((r) => `${r.market} (${r.arrivals_in_qtl} qtl)`))];
-        setMarkets(uniqueMarkets);
-      }
+      const records = await fetchRecords({ commodity: crop, state: stateName, limit: 100 });
+      setMarkets([...new Set(records.map((r) => `${r.market} (${r.arrivals_in_qtl} qtl)`))]);
     } catch (err) {
       console.error(err); alert("Failed to fetch markets.");
     } finally { setLoading(false); }
@@ -55,13 +54,12 @@ export default function MarketPrices() {
     setLoading(true);
     try {
       const marketName = market.split(" (")[0];
-      const res = await fetch(`${baseUrl}?api-key=${apiKey}&format=json&limit=10&filters[commodity]=${commodity}&filters[state]=${state}&filters[market]=${marketName}`);
-      const data = await res.json();
-      if (!data.records || data.records.length === 0) {
+      const records = await fetchRecords({ commodity, state, market: marketName, limit: 10 });
+      if (records.length === 0) {
         alert("No prices found!"); setPrices([]); setTotalRevenue(null); return;
       }
-      setPrices(data.records);
-      const latestPrice = parseInt(data.records[0]["modal_price"]);
+      setPrices(records);
+      const latestPrice = parseInt(records[0]["modal_price"]);
       setTotalRevenue(latestPrice * quantity);
     } catch (err) {
       console.error(err); alert("Failed to fetch prices.");
@@ -117,6 +115,7 @@ export default function MarketPrices() {
         {prices.length > 0 && (
           <div className="table-container">
             <h3>Market Prices for {commodity} in {market}, {state}</h3>
+            {stale && <p className="stale-note">Price service is unavailable; showing the last prices we fetched.</p>}
             <table>
               <thead>
                 <tr>
@@ -159,6 +158,7 @@ export default function MarketPrices() {
         th, td { padding: 14px; border: 1px solid #ddd; text-align: center; font-size: 15px; transition: background 0.3s; }
         th { background: linear-gradient(90deg, #93c5fd, #60a5fa); color: #1e3a8a; }
         tr:hover { background: linear-gradient(90deg, #bfdbfe, #93c5fd); }
+        .stale-note { text-align: center; color: #b45309; font-weight: 600; }
         .revenue { margin-top: 25px; text-align: center; font-size: 22px; font-weight: 700; color: #1e40af; animation: bounce 1.5s infinite; }
         @keyframes fadeIn { from { opacity: 0; transform: translateY(20px); } to { opacity: 1; transform: translateY(0); } }
         @keyframes bounce { 0%, 100% { transform: translateY(0); } 50% { transform: translateY(-8px); } }
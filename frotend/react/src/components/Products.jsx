@@ -1,6 +1,13 @@
-import React, { useState, useEffect, useMemo } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { FaHeart, FaRegHeart } from "react-icons/fa";
+import { fetchPage, PRODUCT_CARD_FIELDS } from "../api";
+
+// Sort options -> /api/products/search ?sort= values
+const SEARCH_SORTS = { latest: "newest", priceLow: "price_asc", priceHigh: "price_desc" };
+// Products per page, and how long typing must pause before the search runs
+const PAGE_SIZE = 48;
+const SEARCH_DEBOUNCE_MS = 300;
 
 export default function Products({ buyerName = "Buyer", onLogout }) {
   const navigate = useNavigate();
@@ -8,109 +15,130 @@ export default function Products({ buyerName = "Buyer", onLogout }) {
   const [cart, setCart] = useState(JSON.parse(localStorage.getItem("ib_cart") || "[]"));
   const [favorites, setFavorites] = useState(JSON.parse(localStorage.getItem("ib_favorites") || "[]"));
   const [search, setSearch] = useState("");
+  const [query, setQuery] = useState("");
   const [sortBy, setSortBy] = useState("latest");
   const [refresh, setRefresh] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // The request in flight; a new search (or unmount) aborts it so stale pages never land
+  const requestRef = useRef(null);
 
-  // Fetch products from backend
+  // Search once typing pauses
   useEffect(() => {
-    fetch("http://localhost:5000/api/products/")
-      .then(res => res.json())
-      .then(data => {
-        console.log("📦 Products loaded:", data.length, "products");
-        setProducts(data);
+    const timer = setTimeout(() => setQuery(search.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  const searchUrl = () => {
+    const params = new URLSearchParams({ sort: SEARCH_SORTS[sortBy] });
+    if (query) params.set("q", query);
+    return `http://localhost:5000/api/products/search?${params}`;
+  };
+
+  // Start a request, aborting whichever one it replaces
+  const startRequest = () => {
+    if (requestRef.current) requestRef.current.abort();
+    requestRef.current = new AbortController();
+    return requestRef.current.signal;
+  };
+
+  // Fetch the first page from the backend (search and sort run server-side)
+  useEffect(() => {
+    const signal = startRequest();
+    setLoadingMore(false);
+    fetchPage(searchUrl(), { limit: PAGE_SIZE, fields: PRODUCT_CARD_FIELDS, signal })
+      .then(({ items, next }) => {
+        console.log("📦 Products loaded:", items.length, "products");
+        setProducts(items);
+        setNextCursor(next);
+      })
+      .catch(err => {
+        if (err.name !== "AbortError") console.error("Error fetching products:", err);
+      });
+    return () => requestRef.current && requestRef.current.abort();
+  }, [refresh, query, sortBy]);
+
+  // Append the next page, following X-Next-Cursor
+  const loadMore = () => {
+    if (!nextCursor || loadingMore) return;
+    const signal = startRequest();
+    setLoadingMore(true);
+    fetchPage(searchUrl(), { limit: PAGE_SIZE, fields: PRODUCT_CARD_FIELDS, after: nextCursor, signal })
+      .then(({ items, next }) => {
+        setProducts(prev => prev.concat(items.filter(item => !prev.some(p => p._id === item._id))));
+        setNextCursor(next);
+        setLoadingMore(false);
       })
-      .catch(err => console.error("Error fetching products:", err));
-  }, [refresh]);
+      .catch(err => {
+        if (err.name === "AbortError") return;
+        console.error("Error fetching products:", err);
+        setLoadingMore(false);
+      });
+  };
 
-  // REAL-TIME UPDATES: Refresh products every 5 seconds
+  // REAL-TIME UPDATES: the backend pushes stock/price changes over Server-Sent Events
   useEffect(() => {
-    const interval = setInterval(() => {
-      console.log("🔄 Auto-refreshing products...");
-      setRefresh(prev => prev + 1);
-    }, 5000);
+    const stream = new EventSource("http://localhost:5000/api/products/stream");
+    const applyChange = (event) => {
+      const { product_id, quantity, price } = JSON.parse(event.data);
+      setProducts(prev => prev.map(p => p._id !== product_id ? p : {
+        ...p,
+        ...(quantity !== undefined && { quantity }),
+        ...(price !== undefined && { price }),
+      }));
+    };
+    const removeProduct = (event) => {
+      const { product_id } = JSON.parse(event.data);
+      setProducts(prev => prev.filter(p => p._id !== product_id));
+    };
+    // Missed too much (reconnected to another server, or fell behind): reload the list once
+    const reload = () => setRefresh(prev => prev + 1);
+
+    stream.addEventListener("stock", applyChange);
+    stream.addEventListener("deleted", removeProduct);
+    stream.addEventListener("reset", reload);
 
     // Also refresh when page becomes visible
     const handleVisibilityChange = () => {
       if (!document.hidden) {
         console.log("👀 Page visible, refreshing products...");
-        setRefresh(prev => prev + 1);
+        reload();
       }
     };
 
     document.addEventListener('visibilitychange', handleVisibilityChange);
     
     return () => {
-      clearInterval(interval);
+      stream.close();
       document.removeEventListener('visibilitychange', handleVisibilityChange);
     };
   }, []);
 
-  // Add to cart with real-time stock validation - FIXED VERSION
-  const addToCart = async (product) => {
-    console.log("🛒 Adding to cart:", product.name, "Initial stock:", product.quantity);
-    
-    try {
-      // Get fresh product data from API
-      const freshResponse = await fetch(`http://localhost:5000/api/products/${product._id}`);
-      const freshProduct = await freshResponse.json();
-      
-      console.log("🔄 Fresh stock for", freshProduct.name, ":", freshProduct.quantity);
-      
-      if (freshProduct.quantity === 0) {
-        alert("❌ This product is out of stock!");
-        setRefresh(prev => prev + 1);
-        return;
-      }
-      
-      // Check cart quantity vs available stock
-      const cartQuantity = cart.filter(item => item._id === product._id).length;
-      if (cartQuantity >= freshProduct.quantity) {
-        alert(`⚠️ Only ${freshProduct.quantity} kg available! You already have ${cartQuantity} in cart.`);
-        setRefresh(prev => prev + 1);
-        return;
-      }
-      
-      // Add to cart with fresh data - INCLUDING FARMER_EMAIL
-      const cartItem = {
-        ...freshProduct,
-        qty: 1,
-        farmer_email: freshProduct.farmer_email // FIXED: Ensure farmer_email is included
-      };
-      
-      const nextCart = [...cart, cartItem];
-      setCart(nextCart);
-      localStorage.setItem("ib_cart", JSON.stringify(nextCart));
-      
-      console.log("✅ Added to cart. Stock now:", freshProduct.quantity - 1);
-      console.log("📧 Farmer email in cart:", freshProduct.farmer_email); // Debug log
-      setRefresh(prev => prev + 1);
-      
-    } catch (error) {
-      console.error("❌ Error fetching fresh product:", error);
-      // Fallback to original validation
-      if (product.quantity === 0) {
-        alert("❌ This product is out of stock!");
-        return;
-      }
-      
-      const cartQuantity = cart.filter(item => item._id === product._id).length;
-      if (cartQuantity >= product.quantity) {
-        alert(`⚠️ Only ${product.quantity} kg available! You already have ${cartQuantity} in cart.`);
-        return;
-      }
-      
-      // Fallback cart item with farmer_email
-      const cartItem = {
-        ...product,
-        qty: 1,
-        farmer_email: product.farmer_email // FIXED: Ensure farmer_email is included
-      };
-      
-      const nextCart = [...cart, cartItem];
-      setCart(nextCart);
-      localStorage.setItem("ib_cart", JSON.stringify(nextCart));
-      setRefresh(prev => prev + 1);
+  // Add to cart, checked against the live stock pushed by the stream
+  const addToCart = (product) => {
+    console.log("🛒 Adding to cart:", product.name, "Stock:", product.quantity);
+
+    if (product.quantity === 0) {
+      alert("❌ This product is out of stock!");
+      return;
     }
+
+    // Check cart quantity vs available stock
+    const cartQuantity = cart.filter(item => item._id === product._id).length;
+    if (cartQuantity >= product.quantity) {
+      alert(`⚠️ Only ${product.quantity} kg available! You already have ${cartQuantity} in cart.`);
+      return;
+    }
+
+    const cartItem = {
+      ...product,
+      qty: 1,
+      farmer_email: product.farmer_email // FIXED: Ensure farmer_email is included
+    };
+
+    const nextCart = [...cart, cartItem];
+    setCart(nextCart);
+    localStorage.setItem("ib_cart", JSON.stringify(nextCart));
   };
 
   // Toggle favorite
@@ -122,16 +150,8 @@ export default function Products({ buyerName = "Buyer", onLogout }) {
     localStorage.setItem("ib_favorites", JSON.stringify(nextFav));
   };
 
-  // Filter + sort products
-  const displayedProducts = useMemo(() => {
-    let filtered = products.filter(p => p.name.toLowerCase().includes(search.toLowerCase()));
-    
-    if (sortBy === "priceLow") filtered.sort((a, b) => a.price - b.price);
-    if (sortBy === "priceHigh") filtered.sort((a, b) => b.price - a.price);
-    if (sortBy === "latest") filtered.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
-    
-    return filtered;
-  }, [products, search, sortBy]);
+  // Already filtered and sorted by /api/products/search
+  const displayedProducts = products;
 
   // Get stock status
   const getStockStatus = (quantity) => {
@@ -180,7 +200,7 @@ export default function Products({ buyerName = "Buyer", onLogout }) {
                   🔄
                 </div>
                 
-                <img src={p.image} alt={p.name} loading="lazy" />
+                <img src={p.image ? `${p.image}&size=320` : p.image} alt={p.name} loading="lazy" />
                 
                 <div className="product-info">
                   <h3>{p.name}</h3>
@@ -229,6 +249,14 @@ export default function Products({ buyerName = "Buyer", onLogout }) {
         )}
       </div>
 
+      {nextCursor && (
+        <div className="load-more">
+          <button onClick={loadMore} disabled={loadingMore} className="load-more-btn">
+            {loadingMore ? "Loading..." : "Load more products"}
+          </button>
+        </div>
+      )}
+
       {/* Cart Summary */}
       <div className="cart-summary">
         <button onClick={() => navigate("/cart")} className="go-to-cart-btn">
@@ -440,6 +468,32 @@ export default function Products({ buyerName = "Buyer", onLogout }) {
           transform: scale(1.3) rotate(10deg); 
         }
 
+        .load-more {
+          text-align: center;
+          margin-top: 30px;
+        }
+
+        .load-more-btn {
+          padding: 12px 28px;
+          border: 2px solid #2563eb;
+          border-radius: 12px;
+          background: #fff;
+          color: #2563eb;
+          cursor: pointer;
+          font-weight: 600;
+          font-size: 16px;
+          transition: all 0.3s;
+        }
+
+        .load-more-btn:hover:not(:disabled) {
+          background: #eff6ff;
+        }
+
+        .load-more-btn:disabled {
+          opacity: 0.6;
+          cursor: wait;
+        }
+
         .cart-summary { 
           text-align: center; 
           margin-top: 40px; 
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { authHeaders, fetchAllPages, fetchDashboard, PRODUCT_CARD_FIELDS } from "../api";
 
 export default function SellProducts({ user, onLogout }) {
   const [name, setName] = useState("");
@@ -38,9 +39,9 @@ export default function SellProducts({ user, onLogout }) {
       const currentUser = getCurrentUser();
       if (currentUser && currentUser.email) {
         console.log("🔍 Fetching products for farmer:", currentUser.email);
-        const response = await axios.get(`${API_URL}/farmer/${currentUser.email}`);
-        console.log("✅ Products fetched:", response.data);
-        setProducts(response.data);
+        const myProducts = await fetchAllPages(`${API_URL}/farmer/${currentUser.email}`, { fields: PRODUCT_CARD_FIELDS });
+        console.log("✅ Products fetched:", myProducts);
+        setProducts(myProducts);
         setError("");
       } else {
         setError("User not found. Please login again.");
@@ -56,20 +57,33 @@ export default function SellProducts({ user, onLogout }) {
     try {
       const currentUser = getCurrentUser();
       if (currentUser && currentUser.email) {
-        const response = await axios.get(`${ORDERS_API_URL}/farmer/${currentUser.email}`);
-        setOrders(response.data);
+        setOrders(await fetchAllPages(`${ORDERS_API_URL}/farmer/${currentUser.email}`));
       }
     } catch (err) {
       console.error("Error fetching orders:", err);
     }
   };
 
+  // First load: products and sales in one dashboard request
+  const fetchDashboardData = async (email) => {
+    try {
+      const dashboard = await fetchDashboard(email, ["products", "orders"]);
+      setProducts(dashboard.products);
+      setOrders(dashboard.orders);
+      setError("");
+    } catch (err) {
+      console.error("❌ Error fetching dashboard:", err);
+      setError("Failed to fetch your products");
+    }
+  };
+
   useEffect(() => {
     const currentUser = getCurrentUser();
-    if (currentUser) {
+    if (currentUser && currentUser.email) {
       console.log("👤 Current user:", currentUser);
-      fetchMyProducts();
-      fetchMyOrders();
+      fetchDashboardData(currentUser.email);
+    } else if (currentUser) {
+      setError("User not found. Please login again.");
     } else {
       setError("Please login to access this page");
     }
@@ -138,9 +152,9 @@ export default function SellProducts({ user, onLogout }) {
 
       let response;
       if (editingId) {
-        response = await axios.put(`${API_URL}/${editingId}`, payload);
+        response = await axios.put(`${API_URL}/${editingId}`, payload, { headers: authHeaders() });
       } else {
-        response = await axios.post(API_URL, payload);
+        response = await axios.post(API_URL, payload, { headers: authHeaders() });
       }
 
       console.log("✅ Product saved successfully:", response.data);
@@ -168,7 +182,7 @@ export default function SellProducts({ user, onLogout }) {
     if (!window.confirm("Are you sure you want to delete this product?")) return;
     
     try {
-      await axios.delete(`${API_URL}/${id}`);
+      await axios.delete(`${API_URL}/${id}`, { headers: authHeaders() });
       await fetchMyProducts();
     } catch (err) {
       console.error("Error deleting product:", err);